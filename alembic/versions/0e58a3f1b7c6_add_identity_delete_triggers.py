@@ -0,0 +1,59 @@
+"""Add identity delete triggers
+
+Revision ID: 0e58a3f1b7c6
+Revises: c71f5e0a2d94
+Create Date: 2025-10-01 09:27:14.550382
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0e58a3f1b7c6"
+down_revision: str | Sequence[str] | None = "c71f5e0a2d94"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# table -> column holding the Discord id cached for that table
+IDENTITY_TABLES = {
+    "users": "discord_user_id",
+    "guilds": "discord_guild_id",
+    "channels": "discord_channel_id",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Row triggers also fire for rows removed by ON DELETE CASCADE, so deleting
+    # a guild invalidates its channels too. The "db" origin keeps listeners in
+    # every process, including the deleting one, from skipping the payload.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_identity_deleted() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify(
+                'identity_invalidation',
+                'db|' || TG_TABLE_NAME || ':' || (to_jsonb(OLD) ->> TG_ARGV[0])
+            );
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    for table, column in IDENTITY_TABLES.items():
+        op.execute(
+            f"""
+            CREATE TRIGGER trg_{table}_identity_deleted
+            AFTER DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION notify_identity_deleted('{column}');
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in IDENTITY_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_identity_deleted ON {table};")
+    op.execute("DROP FUNCTION IF EXISTS notify_identity_deleted();")
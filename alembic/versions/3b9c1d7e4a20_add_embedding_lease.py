@@ -0,0 +1,50 @@
+"""Add embedding lease
+
+Revision ID: 3b9c1d7e4a20
+Revises: e6d11e3541ad
+Create Date: 2025-09-24 10:12:41.318204
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3b9c1d7e4a20"
+down_revision: str | Sequence[str] | None = "e6d11e3541ad"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "messages",
+        sa.Column("embedding_leased_until", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.add_column(
+        "messages",
+        sa.Column("embedding_lease_owner", sa.String(), nullable=True),
+    )
+    # Keeps the claim query off a full scan once most rows are embedded
+    op.create_index(
+        "ix_messages_embedding_pending",
+        "messages",
+        ["created_at"],
+        unique=False,
+        postgresql_where=sa.text("embedding IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_messages_embedding_pending",
+        table_name="messages",
+        postgresql_where=sa.text("embedding IS NULL"),
+    )
+    op.drop_column("messages", "embedding_lease_owner")
+    op.drop_column("messages", "embedding_leased_until")
@@ -0,0 +1,103 @@
+"""Unique discord ids
+
+Revision ID: 5a2f7c9e1d38
+Revises: 0e58a3f1b7c6
+Create Date: 2025-10-03 14:52:09.117640
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5a2f7c9e1d38"
+down_revision: str | Sequence[str] | None = "0e58a3f1b7c6"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# Tables whose primary key carried a redundant second index
+PK_INDEXED_TABLES = (
+    "users",
+    "guilds",
+    "channels",
+    "agents",
+    "messages",
+    "embedding_cache",
+)
+
+
+def _duplicates(table: str, discord_id_column: str) -> str:
+    """Rows sharing a discord id with an older row, paired with that oldest row."""
+    return f"""
+        SELECT id, keeper_id FROM (
+            SELECT id, first_value(id) OVER (
+                PARTITION BY {discord_id_column} ORDER BY created_at, id
+            ) AS keeper_id
+            FROM {table}
+        ) ranked
+        WHERE id <> keeper_id
+    """
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Collapse duplicates left behind by racing get-or-creates onto the oldest
+    # row, re-pointing children first so nothing cascades away.
+    guild_duplicates = _duplicates("guilds", "discord_guild_id")
+    for child in ("channels", "agents"):
+        op.execute(
+            f"""
+            UPDATE {child} SET guild_id = d.keeper_id
+            FROM ({guild_duplicates}) d WHERE {child}.guild_id = d.id
+            """
+        )
+    op.execute(
+        f"DELETE FROM guilds WHERE id IN (SELECT id FROM ({guild_duplicates}) d)"
+    )
+
+    channel_duplicates = _duplicates("channels", "discord_channel_id")
+    op.execute(
+        f"""
+        UPDATE messages SET channel_id = d.keeper_id
+        FROM ({channel_duplicates}) d WHERE messages.channel_id = d.id
+        """
+    )
+    op.execute(
+        f"DELETE FROM channels WHERE id IN (SELECT id FROM ({channel_duplicates}) d)"
+    )
+
+    op.execute(
+        """
+        DELETE FROM messages a USING messages b
+        WHERE a.discord_message_id = b.discord_message_id
+          AND (a.created_at, a.id) > (b.created_at, b.id)
+        """
+    )
+
+    op.create_unique_constraint(
+        op.f("uq_guilds_discord_guild_id"), "guilds", ["discord_guild_id"]
+    )
+    op.create_unique_constraint(
+        op.f("uq_channels_discord_channel_id"), "channels", ["discord_channel_id"]
+    )
+    op.create_unique_constraint(
+        op.f("uq_messages_discord_message_id"), "messages", ["discord_message_id"]
+    )
+
+    for table in PK_INDEXED_TABLES:
+        op.drop_index(op.f(f"ix_{table}_id"), table_name=table)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in PK_INDEXED_TABLES:
+        op.create_index(op.f(f"ix_{table}_id"), table, ["id"], unique=False)
+
+    op.drop_constraint(
+        op.f("uq_messages_discord_message_id"), "messages", type_="unique"
+    )
+    op.drop_constraint(
+        op.f("uq_channels_discord_channel_id"), "channels", type_="unique"
+    )
+    op.drop_constraint(op.f("uq_guilds_discord_guild_id"), "guilds", type_="unique")
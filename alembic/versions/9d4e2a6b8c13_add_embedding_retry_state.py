@@ -0,0 +1,81 @@
+"""Add embedding retry state
+
+Revision ID: 9d4e2a6b8c13
+Revises: 3b9c1d7e4a20
+Create Date: 2025-09-26 16:41:07.902115
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9d4e2a6b8c13"
+down_revision: str | Sequence[str] | None = "3b9c1d7e4a20"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "messages",
+        sa.Column(
+            "embedding_attempts", sa.Integer(), server_default="0", nullable=False
+        ),
+    )
+    op.add_column(
+        "messages", sa.Column("embedding_last_error", sa.Text(), nullable=True)
+    )
+    op.add_column(
+        "messages",
+        sa.Column(
+            "embedding_next_attempt_at", sa.DateTime(timezone=True), nullable=True
+        ),
+    )
+    op.add_column(
+        "messages",
+        sa.Column(
+            "embedding_dead_lettered_at", sa.DateTime(timezone=True), nullable=True
+        ),
+    )
+    # Dead-lettered rows no longer belong to the pending set
+    op.drop_index(
+        "ix_messages_embedding_pending",
+        table_name="messages",
+        postgresql_where=sa.text("embedding IS NULL"),
+    )
+    op.create_index(
+        "ix_messages_embedding_pending",
+        "messages",
+        ["created_at"],
+        unique=False,
+        postgresql_where=sa.text(
+            "embedding IS NULL AND embedding_dead_lettered_at IS NULL"
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_messages_embedding_pending",
+        table_name="messages",
+        postgresql_where=sa.text(
+            "embedding IS NULL AND embedding_dead_lettered_at IS NULL"
+        ),
+    )
+    op.create_index(
+        "ix_messages_embedding_pending",
+        "messages",
+        ["created_at"],
+        unique=False,
+        postgresql_where=sa.text("embedding IS NULL"),
+    )
+    op.drop_column("messages", "embedding_dead_lettered_at")
+    op.drop_column("messages", "embedding_next_attempt_at")
+    op.drop_column("messages", "embedding_last_error")
+    op.drop_column("messages", "embedding_attempts")
@@ -0,0 +1,46 @@
+"""Add message full-text search
+
+Revision ID: a83f5c1e7b42
+Revises: f19b6e3a8d57
+Create Date: 2025-10-05 11:37:48.209615
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a83f5c1e7b42"
+down_revision: str | Sequence[str] | None = "f19b6e3a8d57"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "messages",
+        sa.Column(
+            "content_tsv",
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('simple', content)", persisted=True),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        op.f("ix_messages_content_tsv"),
+        "messages",
+        ["content_tsv"],
+        unique=False,
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_messages_content_tsv"), table_name="messages")
+    op.drop_column("messages", "content_tsv")
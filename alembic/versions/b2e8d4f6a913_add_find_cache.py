@@ -0,0 +1,86 @@
+"""Add find cache
+
+Revision ID: b2e8d4f6a913
+Revises: 5a2f7c9e1d38
+Create Date: 2025-10-02 14:21:37.118204
+
+"""
+
+from collections.abc import Sequence
+
+import pgvector
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b2e8d4f6a913"
+down_revision: str | Sequence[str] | None = "5a2f7c9e1d38"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "find_cache",
+        sa.Column("guild_id", sa.UUID(), nullable=False),
+        sa.Column("query_hash", sa.String(length=64), nullable=False),
+        sa.Column(
+            "query_embedding",
+            pgvector.sqlalchemy.vector.VECTOR(dim=768),
+            nullable=False,
+        ),
+        sa.Column("summary", sa.Text(), nullable=False),
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(
+            ["guild_id"],
+            ["guilds.id"],
+            name=op.f("fk_find_cache_guild_id_guilds"),
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_find_cache")),
+    )
+    op.create_index(
+        op.f("ix_find_cache_guild_id_query_hash"),
+        "find_cache",
+        ["guild_id", "query_hash"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_find_cache_guild_id_created_at"),
+        "find_cache",
+        ["guild_id", "created_at"],
+        unique=False,
+    )
+    # Counting the messages that landed in a guild since an answer was cached
+    op.create_index(
+        op.f("ix_messages_channel_id_created_at"),
+        "messages",
+        ["channel_id", "created_at"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_channels_guild_id"), "channels", ["guild_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_channels_guild_id"), table_name="channels")
+    op.drop_index(op.f("ix_messages_channel_id_created_at"), table_name="messages")
+    op.drop_index(op.f("ix_find_cache_guild_id_created_at"), table_name="find_cache")
+    op.drop_index(op.f("ix_find_cache_guild_id_query_hash"), table_name="find_cache")
+    op.drop_table("find_cache")
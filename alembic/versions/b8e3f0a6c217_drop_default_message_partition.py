@@ -0,0 +1,67 @@
+"""Drop default message partition
+
+Revision ID: b8e3f0a6c217
+Revises: c5d92b7e4f08
+Create Date: 2025-10-09 10:27:51.204387
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b8e3f0a6c217"
+down_revision: str | Sequence[str] | None = "c5d92b7e4f08"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# Every stored column; content_tsv is generated
+COPIED_COLUMNS = (
+    "id, created_at, updated_at, discord_message_id, discord_user_id, content, "
+    "content_hash, embedding, embedding_leased_until, embedding_lease_owner, "
+    "embedding_attempts, embedding_last_error, embedding_next_attempt_at, "
+    "embedding_dead_lettered_at, channel_id, guild_id, user_id"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A default partition rules out DETACH PARTITION CONCURRENTLY, which
+    # retention uses. Its rows move to monthly partitions created for them.
+    # Without it, a row outside the existing months (backfilled history,
+    # clock skew, maintenance fallen behind) has nowhere to go, so the
+    # ingestion path creates the missing month's partition before inserting
+    # (src.utils.partitions.ensure_months) instead of keeping a catch-all.
+    op.execute("ALTER TABLE messages DETACH PARTITION messages_default")
+    op.execute(
+        """
+        DO $$
+        DECLARE
+            month timestamp;
+        BEGIN
+            FOR month IN
+                SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC')
+                FROM messages_default
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF messages '
+                    'FOR VALUES FROM (%L) TO (%L)',
+                    'messages_p' || to_char(month, 'YYYY_MM'),
+                    month AT TIME ZONE 'UTC',
+                    (month + interval '1 month') AT TIME ZONE 'UTC'
+                );
+            END LOOP;
+        END $$
+        """
+    )
+    op.execute(
+        f"INSERT INTO messages ({COPIED_COLUMNS}) "
+        f"SELECT {COPIED_COLUMNS} FROM messages_default"
+    )
+    op.drop_table("messages_default")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("CREATE TABLE messages_default PARTITION OF messages DEFAULT")
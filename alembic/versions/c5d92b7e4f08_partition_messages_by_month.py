@@ -0,0 +1,222 @@
+"""Partition messages by month
+
+Revision ID: c5d92b7e4f08
+Revises: a83f5c1e7b42
+Create Date: 2025-10-06 15:12:40.583916
+
+"""
+
+from collections.abc import Sequence
+
+import pgvector
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c5d92b7e4f08"
+down_revision: str | Sequence[str] | None = "a83f5c1e7b42"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# Every stored column; content_tsv is generated
+COPIED_COLUMNS = (
+    "id, created_at, updated_at, discord_message_id, discord_user_id, content, "
+    "content_hash, embedding, embedding_leased_until, embedding_lease_owner, "
+    "embedding_attempts, embedding_last_error, embedding_next_attempt_at, "
+    "embedding_dead_lettered_at, channel_id, guild_id, user_id"
+)
+
+SECONDARY_INDEXES = (
+    "ix_messages_channel_id_created_at",
+    "ix_messages_guild_id_created_at",
+    "ix_messages_content_tsv",
+    "ix_messages_embedding_pending",
+)
+
+# Created at runtime by the vector index manager before this revision
+LEGACY_VECTOR_INDEXES = ("ix_messages_embedding_ann", "ix_messages_embedding_ann_build")
+
+
+def _columns() -> list[sa.Column]:
+    return [
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("discord_message_id", sa.String(), nullable=False),
+        sa.Column("discord_user_id", sa.String(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("content_hash", sa.String(length=64), nullable=True),
+        sa.Column(
+            "content_tsv",
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('simple', content)", persisted=True),
+            nullable=True,
+        ),
+        sa.Column(
+            "embedding", pgvector.sqlalchemy.vector.VECTOR(dim=768), nullable=True
+        ),
+        sa.Column("embedding_leased_until", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("embedding_lease_owner", sa.String(), nullable=True),
+        sa.Column(
+            "embedding_attempts", sa.Integer(), server_default="0", nullable=False
+        ),
+        sa.Column("embedding_last_error", sa.Text(), nullable=True),
+        sa.Column(
+            "embedding_next_attempt_at", sa.DateTime(timezone=True), nullable=True
+        ),
+        sa.Column(
+            "embedding_dead_lettered_at", sa.DateTime(timezone=True), nullable=True
+        ),
+        sa.Column("channel_id", sa.UUID(), nullable=False),
+        sa.Column("guild_id", sa.UUID(), nullable=False),
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["channel_id"],
+            ["channels.id"],
+            name=op.f("fk_messages_channel_id_channels"),
+            ondelete="CASCADE",
+        ),
+        sa.ForeignKeyConstraint(
+            ["guild_id"],
+            ["guilds.id"],
+            name=op.f("fk_messages_guild_id_guilds"),
+            ondelete="CASCADE",
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+            name=op.f("fk_messages_user_id_users"),
+            ondelete="CASCADE",
+        ),
+    ]
+
+
+def _create_secondary_indexes() -> None:
+    op.create_index(
+        op.f("ix_messages_channel_id_created_at"),
+        "messages",
+        ["channel_id", "created_at"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_messages_guild_id_created_at"),
+        "messages",
+        ["guild_id", "created_at"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_messages_content_tsv"),
+        "messages",
+        ["content_tsv"],
+        unique=False,
+        postgresql_using="gin",
+    )
+    op.create_index(
+        "ix_messages_embedding_pending",
+        "messages",
+        ["created_at"],
+        unique=False,
+        postgresql_where=sa.text(
+            "embedding IS NULL AND embedding_dead_lettered_at IS NULL"
+        ),
+    )
+
+
+def _set_aside(table: str) -> None:
+    """Rename ``messages`` to ``table``, freeing the names of its indexes."""
+    op.rename_table("messages", table)
+    for index in (*SECONDARY_INDEXES, *LEGACY_VECTOR_INDEXES):
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+    op.execute(f"ALTER TABLE {table} DROP CONSTRAINT uq_messages_discord_message_id")
+    op.execute(f"ALTER TABLE {table} RENAME CONSTRAINT pk_messages TO pk_{table}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rewrites the whole table; run it in a maintenance window on large ones
+    _set_aside("messages_unpartitioned")
+
+    # The partition key has to be part of the primary key and unique keys
+    op.create_table(
+        "messages",
+        *_columns(),
+        sa.PrimaryKeyConstraint("id", "created_at", name=op.f("pk_messages")),
+        sa.UniqueConstraint(
+            "discord_message_id",
+            "created_at",
+            name=op.f("uq_messages_discord_message_id"),
+        ),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+
+    # One partition per month from the oldest message up to three months
+    # ahead; the bot keeps creating upcoming ones from then on
+    op.execute(
+        """
+        DO $$
+        DECLARE
+            month timestamp;
+        BEGIN
+            FOR month IN
+                SELECT generate_series(
+                    date_trunc('month', coalesce(
+                        (SELECT min(created_at) FROM messages_unpartitioned), now()
+                    ) AT TIME ZONE 'UTC'),
+                    date_trunc('month', now() AT TIME ZONE 'UTC') + interval '3 months',
+                    interval '1 month'
+                )
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+                    'messages_p' || to_char(month, 'YYYY_MM'),
+                    month AT TIME ZONE 'UTC',
+                    (month + interval '1 month') AT TIME ZONE 'UTC'
+                );
+            END LOOP;
+        END $$
+        """
+    )
+    op.execute("CREATE TABLE messages_default PARTITION OF messages DEFAULT")
+
+    op.execute(
+        f"INSERT INTO messages ({COPIED_COLUMNS}) "
+        f"SELECT {COPIED_COLUMNS} FROM messages_unpartitioned"
+    )
+    op.drop_table("messages_unpartitioned")
+    _create_secondary_indexes()
+
+    op.add_column("guilds", sa.Column("retention_days", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("guilds", "retention_days")
+
+    _set_aside("messages_partitioned")
+    op.create_table(
+        "messages",
+        *_columns(),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_messages")),
+        sa.UniqueConstraint(
+            "discord_message_id", name=op.f("uq_messages_discord_message_id")
+        ),
+    )
+    op.execute(
+        f"INSERT INTO messages ({COPIED_COLUMNS}) "
+        f"SELECT {COPIED_COLUMNS} FROM messages_partitioned"
+    )
+    # Takes the partitions with it
+    op.drop_table("messages_partitioned")
+    _create_secondary_indexes()
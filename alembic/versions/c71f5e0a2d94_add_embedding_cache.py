@@ -0,0 +1,61 @@
+"""Add embedding cache
+
+Revision ID: c71f5e0a2d94
+Revises: 9d4e2a6b8c13
+Create Date: 2025-09-29 11:03:52.664719
+
+"""
+
+from collections.abc import Sequence
+
+import pgvector
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c71f5e0a2d94"
+down_revision: str | Sequence[str] | None = "9d4e2a6b8c13"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "embedding_cache",
+        sa.Column("content_hash", sa.String(length=64), nullable=False),
+        sa.Column(
+            "embedding", pgvector.sqlalchemy.vector.VECTOR(dim=768), nullable=False
+        ),
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_embedding_cache")),
+        sa.UniqueConstraint(
+            "content_hash", name=op.f("uq_embedding_cache_content_hash")
+        ),
+    )
+    op.create_index(
+        op.f("ix_embedding_cache_id"), "embedding_cache", ["id"], unique=False
+    )
+    op.add_column(
+        "messages", sa.Column("content_hash", sa.String(length=64), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("messages", "content_hash")
+    op.drop_index(op.f("ix_embedding_cache_id"), table_name="embedding_cache")
+    op.drop_table("embedding_cache")
@@ -0,0 +1,70 @@
+"""Scope messages by guild
+
+Revision ID: d4a7c2e9f160
+Revises: b2e8d4f6a913
+Create Date: 2025-10-03 10:08:52.406817
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d4a7c2e9f160"
+down_revision: str | Sequence[str] | None = "b2e8d4f6a913"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("messages", sa.Column("guild_id", sa.UUID(), nullable=True))
+    op.execute(
+        """
+        UPDATE messages
+        SET guild_id = channels.guild_id
+        FROM channels
+        WHERE channels.id = messages.channel_id
+        """
+    )
+    op.alter_column("messages", "guild_id", nullable=False)
+    op.create_foreign_key(
+        op.f("fk_messages_guild_id_guilds"),
+        "messages",
+        "guilds",
+        ["guild_id"],
+        ["id"],
+        ondelete="CASCADE",
+    )
+    op.create_index(
+        op.f("ix_messages_guild_id_created_at"),
+        "messages",
+        ["guild_id", "created_at"],
+        unique=False,
+    )
+
+    op.add_column("find_cache", sa.Column("channel_id", sa.UUID(), nullable=True))
+    op.create_foreign_key(
+        op.f("fk_find_cache_channel_id_channels"),
+        "find_cache",
+        "channels",
+        ["channel_id"],
+        ["id"],
+        ondelete="CASCADE",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint(
+        op.f("fk_find_cache_channel_id_channels"), "find_cache", type_="foreignkey"
+    )
+    op.drop_column("find_cache", "channel_id")
+    op.drop_index(op.f("ix_messages_guild_id_created_at"), table_name="messages")
+    op.drop_constraint(
+        op.f("fk_messages_guild_id_guilds"), "messages", type_="foreignkey"
+    )
+    op.drop_column("messages", "guild_id")
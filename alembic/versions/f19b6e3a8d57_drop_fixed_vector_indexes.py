@@ -0,0 +1,47 @@
+"""Drop fixed vector indexes
+
+Revision ID: f19b6e3a8d57
+Revises: d4a7c2e9f160
+Create Date: 2025-10-04 16:42:09.731524
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f19b6e3a8d57"
+down_revision: str | Sequence[str] | None = "d4a7c2e9f160"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built on an empty table with a fixed lists=100, and nothing searches by
+    # L2 distance. The vector index manager builds a fitting index at startup.
+    op.drop_index("ix_messages_embedding_vector_l2", table_name="messages")
+    op.drop_index("ix_messages_embedding_vector_cosine", table_name="messages")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        "ix_messages_embedding_vector_cosine",
+        "messages",
+        ["embedding"],
+        unique=False,
+        postgresql_using="ivfflat",
+        postgresql_with={"lists": 100},
+        postgresql_ops={"embedding": "vector_cosine_ops"},
+    )
+    op.create_index(
+        "ix_messages_embedding_vector_l2",
+        "messages",
+        ["embedding"],
+        unique=False,
+        postgresql_using="ivfflat",
+        postgresql_with={"lists": 100},
+        postgresql_ops={"embedding": "vector_l2_ops"},
+    )
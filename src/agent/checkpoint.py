@@ -0,0 +1,276 @@
+import asyncio
+from collections import OrderedDict
+import time
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+import psycopg
+
+from src.core.config import settings
+from src.core.database import libpq_dsn
+from src.core.logging import logger
+from src.core.metrics import metrics
+
+
+def conversation_thread_id(user_id: str | None, ctx=None) -> str:
+    """Thread key for a user's conversation in one channel of one guild."""
+    guild = getattr(ctx, "guild", None)
+    channel = getattr(ctx, "channel", None)
+    return ":".join(
+        [
+            str(guild.id) if guild else "dm",
+            str(channel.id) if channel else "unknown",
+            user_id or "unknown",
+        ]
+    )
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """In-memory checkpointer with a memory budget.
+
+    Only the latest checkpoint of each thread and namespace is kept, and the
+    checkpoints of subgraph runs are dropped when the thread's next
+    invocation starts; nothing here time-travels or resumes old runs. Whole
+    threads are evicted least recently used first once there are more than
+    ``max_threads`` of them or their serialized size exceeds ``max_bytes``,
+    and after ``ttl`` seconds without use.
+    """
+
+    def __init__(
+        self,
+        max_threads: int = settings.AGENT_MAX_THREADS,
+        max_bytes: int = settings.AGENT_MAX_CHECKPOINT_BYTES,
+        ttl: float = settings.AGENT_THREAD_TTL_SECONDS,
+    ):
+        super().__init__()
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # thread_id -> last use, least recently used first
+        self._threads: OrderedDict[str, float] = OrderedDict()
+        self._versions: dict[tuple[str, str], ChannelVersions] = {}
+        self._sizes: dict[tuple[str, str], int] = {}
+        self._total_bytes = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    @property
+    def thread_count(self) -> int:
+        # Not __len__: LangGraph tests checkpointers for truthiness
+        return len(self._threads)
+
+    def _touch(self, thread_id: str) -> None:
+        self._threads[thread_id] = time.monotonic()
+        self._threads.move_to_end(thread_id)
+
+    def _measure(self, thread_id: str, checkpoint_ns: str) -> None:
+        key = (thread_id, checkpoint_ns)
+        size = 0
+        for checkpoint_id, (checkpoint, metadata, _) in self.storage[thread_id][
+            checkpoint_ns
+        ].items():
+            size += len(checkpoint[1]) + len(metadata[1])
+            for _, _, (_, value), _ in self.writes.get(
+                (thread_id, checkpoint_ns, checkpoint_id), {}
+            ).values():
+                size += len(value)
+        for channel, version in self._versions.get(key, {}).items():
+            if blob := self.blobs.get((thread_id, checkpoint_ns, channel, version)):
+                size += len(blob[1])
+
+        self._total_bytes += size - self._sizes.get(key, 0)
+        self._sizes[key] = size
+
+    def _forget_namespace(self, thread_id: str, checkpoint_ns: str) -> None:
+        for checkpoint_id in self.storage[thread_id].pop(checkpoint_ns, {}):
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+        for channel, version in self._versions.pop(
+            (thread_id, checkpoint_ns), {}
+        ).items():
+            self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+        self._total_bytes -= self._sizes.pop((thread_id, checkpoint_ns), 0)
+
+    def _prune(
+        self, thread_id: str, checkpoint_ns: str, checkpoint: Checkpoint
+    ) -> None:
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        for checkpoint_id in [id for id in checkpoints if id != checkpoint["id"]]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+        # Blobs of channel versions the kept checkpoint no longer points to
+        key = (thread_id, checkpoint_ns)
+        versions = dict(checkpoint["channel_versions"])
+        for channel, version in self._versions.get(key, {}).items():
+            if versions.get(channel) != version:
+                self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+        self._versions[key] = versions
+
+    def _evict(self, current_thread_id: str) -> None:
+        expired_before = time.monotonic() - self.ttl
+        while self._threads:
+            thread_id, last_used = next(iter(self._threads.items()))
+            if thread_id == current_thread_id:
+                break
+            if (
+                len(self._threads) <= self.max_threads
+                and self._total_bytes <= self.max_bytes
+                and last_used > expired_before
+            ):
+                break
+            self.delete_thread(thread_id)
+            metrics.increment("agent_threads_evicted")
+
+    def evict_expired(self) -> None:
+        self._evict(current_thread_id="")
+        metrics.set_gauge("agent_checkpoint_threads", self.thread_count)
+        metrics.set_gauge("agent_checkpoint_bytes", self._total_bytes)
+
+    def get_tuple(self, config: RunnableConfig):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_tuple = super().get_tuple(config)
+        if checkpoint_tuple is not None:
+            self._touch(thread_id)
+        elif thread_id not in self._threads:
+            # The base class leaves empty entries behind for unknown threads
+            self.storage.pop(thread_id, None)
+        return checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+
+        if not checkpoint_ns and metadata.get("source") == "input":
+            # A new invocation; the subgraph runs of earlier ones are over
+            for namespace in [ns for ns in self.storage.get(thread_id, {}) if ns]:
+                self._forget_namespace(thread_id, namespace)
+
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        self._prune(thread_id, checkpoint_ns, checkpoint)
+        self._measure(thread_id, checkpoint_ns)
+        self._touch(thread_id)
+        self._evict(thread_id)
+        return next_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes,
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        super().put_writes(config, writes, task_id, task_path)
+        thread_id = config["configurable"]["thread_id"]
+        self._measure(thread_id, config["configurable"].get("checkpoint_ns", ""))
+        self._touch(thread_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        # Walks this thread's own entries instead of every stored write and
+        # blob like the base class does
+        for checkpoint_ns in list(self.storage.get(thread_id, {})):
+            self._forget_namespace(thread_id, checkpoint_ns)
+        self.storage.pop(thread_id, None)
+        self._threads.pop(thread_id, None)
+
+
+_checkpointer: BaseCheckpointSaver | None = None
+_postgres_connection: psycopg.AsyncConnection | None = None
+_checkpointer_lock = asyncio.Lock()
+
+
+async def get_checkpointer() -> BaseCheckpointSaver:
+    """Return the process-wide checkpointer, creating it on first use.
+
+    ``AGENT_CHECKPOINTER=postgres`` persists conversations across restarts
+    and needs the optional ``langgraph-checkpoint-postgres`` package.
+    """
+    global _checkpointer, _postgres_connection
+
+    async with _checkpointer_lock:
+        if _checkpointer is not None:
+            return _checkpointer
+
+        if settings.AGENT_CHECKPOINTER == "postgres":
+            try:
+                from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+                from psycopg.rows import dict_row
+            except ImportError as e:
+                raise RuntimeError(
+                    "AGENT_CHECKPOINTER=postgres requires the "
+                    "langgraph-checkpoint-postgres package"
+                ) from e
+
+            _postgres_connection = await psycopg.AsyncConnection.connect(
+                libpq_dsn(), autocommit=True, prepare_threshold=0, row_factory=dict_row
+            )
+            saver = AsyncPostgresSaver(_postgres_connection)
+            await saver.setup()
+            _checkpointer = saver
+            logger.info("Persisting agent conversations to Postgres")
+        else:
+            _checkpointer = BoundedMemorySaver()
+
+        return _checkpointer
+
+
+async def close_checkpointer() -> None:
+    global _checkpointer, _postgres_connection
+
+    if _postgres_connection is not None:
+        await _postgres_connection.close()
+        _postgres_connection = None
+    _checkpointer = None
+
+
+async def _prune_postgres_threads(saver: BaseCheckpointSaver, ttl: float) -> None:
+    async with await psycopg.AsyncConnection.connect(
+        libpq_dsn(), autocommit=True
+    ) as conn:
+        cursor = await conn.execute(
+            """
+            SELECT thread_id FROM checkpoints
+            WHERE checkpoint_ns = ''
+            GROUP BY thread_id
+            HAVING max((checkpoint ->> 'ts')::timestamptz)
+                < now() - make_interval(secs => %s)
+            """,
+            (ttl,),
+        )
+        thread_ids = [row[0] for row in await cursor.fetchall()]
+
+    for thread_id in thread_ids:
+        await saver.adelete_thread(thread_id)
+    if thread_ids:
+        metrics.increment("agent_threads_evicted", len(thread_ids))
+        logger.info(f"Deleted {len(thread_ids)} idle agent conversations")
+
+
+async def run_checkpoint_pruner(
+    interval: float = settings.AGENT_CHECKPOINT_PRUNE_SECONDS,
+    ttl: float = settings.AGENT_THREAD_TTL_SECONDS,
+) -> None:
+    """Periodically drop conversations idle for longer than ``ttl``."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            saver = await get_checkpointer()
+            if isinstance(saver, BoundedMemorySaver):
+                saver.evict_expired()
+            else:
+                await _prune_postgres_threads(saver, ttl)
+        except Exception as e:
+            logger.exception(f"Error pruning agent conversations: {e}")
@@ -0,0 +1,108 @@
+from langchain_core.language_models.chat_models import (
+    BaseChatModel,
+)
+from langchain_core.messages import AnyMessage, HumanMessage, RemoveMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+from src.core import logger
+from src.core.config import settings
+from src.core.metrics import metrics
+
+SUMMARY_PROMPT = """
+You maintain a running summary of a Discord conversation between a user and an assistant.
+Update the summary with the new messages below. Keep facts, decisions, open questions and user preferences; drop small talk.
+Answer with the updated summary only, in at most {max_words} words.
+
+Current summary:
+{summary}
+
+New messages:
+{transcript}
+"""
+
+
+def split_turns(messages: list[AnyMessage]) -> list[list[AnyMessage]]:
+    """Group messages into turns, each starting at a user message.
+
+    Tool calls and their results always stay within the turn that made them.
+    """
+    turns: list[list[AnyMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _transcript(messages: list[AnyMessage]) -> str:
+    lines = []
+    for message in messages:
+        text = message.text()
+        if text:
+            lines.append(f"{message.type}: {text}")
+    return "\n".join(lines)
+
+
+class ContextCompactor:
+    """Graph node that keeps the conversation sent to the model bounded.
+
+    Once a thread holds more than ``max_turns`` turns, everything but the
+    last ``keep_turns`` is folded into the rolling ``summary`` and removed
+    from the state. Older turns are folded as well while the remaining
+    messages exceed ``token_budget`` (estimated), though the current turn
+    is always kept.
+    """
+
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        keep_turns: int = settings.AGENT_CONTEXT_KEEP_TURNS,
+        max_turns: int = settings.AGENT_CONTEXT_MAX_TURNS,
+        token_budget: int = settings.AGENT_CONTEXT_TOKEN_BUDGET,
+        summary_words: int = 200,
+    ):
+        self.llm = llm
+        self.keep_turns = keep_turns
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summary_words = summary_words
+
+    async def _summarize(self, summary: str, messages: list[AnyMessage]) -> str:
+        response = await self.llm.ainvoke(
+            SUMMARY_PROMPT.format(
+                max_words=self.summary_words,
+                summary=summary or "(empty)",
+                transcript=_transcript(messages),
+            )
+        )
+        return response.text()
+
+    async def __call__(self, state: dict) -> dict:
+        turns = split_turns(state["messages"])
+
+        keep = len(turns)
+        if keep > self.max_turns:
+            keep = self.keep_turns
+        while keep > 1 and (
+            count_tokens_approximately([m for turn in turns[-keep:] for m in turn])
+            > self.token_budget
+        ):
+            keep -= 1
+
+        folded = [m for turn in turns[:-keep] for m in turn]
+        if not folded:
+            return {}
+
+        logger.info(f"Compacting {len(turns) - keep} turns into the summary")
+        summary = state.get("summary") or ""
+        try:
+            summary = await self._summarize(summary, folded)
+        except Exception as e:
+            # Still drop the turns, the prompt has to stay within budget
+            logger.error(f"Error summarizing conversation: {e}")
+
+        metrics.increment("agent_turns_compacted", len(turns) - keep)
+        return {
+            "summary": summary,
+            "messages": [RemoveMessage(id=m.id) for m in folded],
+        }
@@ -1,3 +1,4 @@
+from langchain.tools import BaseTool
 from langchain_core.language_models.chat_models import (
     BaseChatModel,
 )
@@ -5,6 +6,7 @@ from langchain_core.language_models.chat_models import (
 from src.agent.graph import AgentGraph
 from src.agent.tools import (
     GetChannelInfo,
+    GetRecentMessages,
     GetServerInfo,
     GetUserInfo,
     ReactToMessage,
@@ -15,33 +17,38 @@ from src.core.llm import get_llm
 
 LLM = get_llm()
 
+# Compiled agents keyed by the identity of their llm and extra tools. The
+# agent holds references to both, so the ids can't be reused while cached.
+_agents: dict[tuple[int, ...], AgentGraph] = {}
 
-def build_base_tools(message_ctx=None, command_ctx=None) -> list[object]:
+
+def build_base_tools() -> list[BaseTool]:
     base_tools = [
         SendMessage,
         GetChannelInfo,
+        GetRecentMessages,
         GetUserInfo,
         GetServerInfo,
         ReactToMessage,
     ]
-    tools = []
-    tools.extend(
-        tool(message_ctx=message_ctx, command_ctx=command_ctx) for tool in base_tools
-    )
+    tools: list[BaseTool] = [tool() for tool in base_tools]
+    tools.append(google_search)
     return tools
 
 
 def create_agent(
     llm: BaseChatModel = LLM,
-    tools: list[object] = [],
-    message_ctx=None,
-    command_ctx=None,
-):
-    base_tools = build_base_tools(message_ctx=message_ctx, command_ctx=command_ctx)
-    tools.extend(base_tools)
-    tools.extend([google_search])
-    agent = AgentGraph(
-        llm=llm,
-        tools=tools,  # type: ignore
-    )
+    tools: list[BaseTool] | None = None,
+) -> AgentGraph:
+    """Return the agent for ``llm`` and ``tools``, compiling it on first use.
+
+    The Discord context is passed to ``AgentGraph.ainvoke`` instead, so one
+    compiled graph serves every message and command.
+    """
+    tools = tools or []
+    key = (id(llm), *map(id, tools))
+    agent = _agents.get(key)
+    if agent is None:
+        agent = AgentGraph(llm=llm, tools=[*tools, *build_base_tools()])
+        _agents[key] = agent
     return agent
@@ -1,4 +1,5 @@
-from contextlib import redirect_stdout
+import asyncio
+from contextlib import redirect_stdout, suppress
 import io
 from typing import Annotated, Literal, NotRequired, TypedDict
 
@@ -6,8 +7,9 @@ from langchain.tools import BaseTool
 from langchain_core.language_models.chat_models import (
     BaseChatModel,
 )
+from langchain_core.messages import AIMessageChunk, AnyMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
-from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.constants import END, START
 from langgraph.graph import StateGraph
 from langgraph.graph.message import add_messages
@@ -15,11 +17,19 @@ from langgraph.managed import RemainingSteps
 from langgraph.prebuilt import create_react_agent
 from pydantic import BaseModel
 
-from src.agent.prompts import BASE_INSTRUCTION
+from src.agent.checkpoint import conversation_thread_id, get_checkpointer
+from src.agent.compaction import ContextCompactor
+from src.agent.moderation import content_filter
+from src.agent.prompts import BASE_INSTRUCTION, STREAMING_INSTRUCTION
+from src.agent.reply_stream import ReplyStream
+from src.agent.side_effects import SideEffectBuffer
 from src.core import logger
+from src.core.config import settings
 from src.core.llm import get_llm
+from src.core.metrics import metrics
 
 CUSTOM_AGENT_INSTRUCTION = ""
+DEFAULT_ADMIN_INSTRUCTION = "You are an assistant on a Discord server."
 
 
 class AgentState(TypedDict):
@@ -28,119 +38,242 @@ class AgentState(TypedDict):
     user_request: str
     validation_approved: bool
     validation_feedback: str | None
+    speculated: NotRequired[bool]
+    summary: NotRequired[str]
     messages: Annotated[list, add_messages]
     remaining_steps: NotRequired[RemainingSteps]
 
 
+class ValidationResult(BaseModel):
+    is_valid: bool
+    reason: str | None
+
+
 class AgentGraph:
+    """Validate-then-execute agent, compiled once and shared by every mention.
+
+    Nothing about a single invocation is baked into the graph: the admin
+    instruction is read from the state when the executor builds its prompt,
+    and the Discord message or command context reaches the tools through
+    ``config["configurable"]``.
+    """
+
     def __init__(
         self,
         tools: list[BaseTool],
         llm: BaseChatModel | None = None,
+        speculative: bool = settings.AGENT_SPECULATIVE_EXECUTION,
     ):
         self.llm = llm or get_llm()
-        self.compiled_graph = StateGraph(AgentState)  # Will be set in _build_graph
+        self.speculative = speculative
         self.tools = tools
-        self._builder = StateGraph(AgentState)
         self.tools_dict = {t.name: t for t in tools}
-        self.executor_agent = None
+        self.validation_llm = self.llm.with_structured_output(ValidationResult)
+        self.compactor = ContextCompactor(self.llm)
+        self.executor_agent = self._get_agent()
+        self.compiled_graph = None
 
-    async def _build_graph(self, state: AgentState):
-        executor_graph = await self._get_agent(state)
+    async def _get_compiled_graph(self):
+        # Compiled on first use, once the shared checkpointer can be opened
+        if self.compiled_graph is None:
+            self.compiled_graph = self._build_graph(await get_checkpointer())
+        return self.compiled_graph
+
+    def _build_graph(self, checkpointer: BaseCheckpointSaver):
+        builder = StateGraph(AgentState)
 
         # NODES
-        self._builder.add_node(node="validate_task", action=self._validate_task)
-        self._builder.add_node(node="execute_task", action=executor_graph)
+        builder.add_node(node="compact_context", action=self.compactor)
+        builder.add_node(node="validate_task", action=self._validate_task)
+        builder.add_node(node="execute_task", action=self.executor_agent)
 
         # EDGES
-        self._builder.add_edge(start_key=START, end_key="validate_task")
-        self._builder.add_conditional_edges(
+        builder.add_edge(start_key=START, end_key="compact_context")
+        builder.add_edge(start_key="compact_context", end_key="validate_task")
+        builder.add_conditional_edges(
             source="validate_task",
             path=self._handle_validation,
-            path_map={"success": "execute_task", "failure": END},
+            path_map={"success": "execute_task", "failure": END, "executed": END},
         )
-        self._builder.add_edge(start_key="execute_task", end_key=END)
+        builder.add_edge(start_key="execute_task", end_key=END)
 
-        checkpointer = InMemorySaver()
-        self.compiled_graph = self._builder.compile(checkpointer=checkpointer)
-        # self.compiled_graph.get_graph().draw_mermaid_png(output_file_path="graph.png")
+        # builder.compile(...).get_graph().draw_mermaid_png(output_file_path="graph.png")
+        return builder.compile(checkpointer=checkpointer)
 
-    async def _validate_task(self, state: AgentState) -> dict:
+    async def _validate_task(self, state: AgentState, config: RunnableConfig) -> dict:
         logger.info("--------📝 validating task--------")
         logger.info(f"User request: {state['user_request']}")
 
-        class ValidationResult(BaseModel):
-            is_valid: bool
-            reason: str | None
+        # Clear-cut requests are settled locally, only ambiguous ones reach
+        # the LLM
+        verdict = content_filter.classify(state["user_request"])
+        logger.info(f"Local moderation verdict: {verdict}")
+        if verdict.decision != "review":
+            return {
+                "validation_approved": verdict.decision == "allow",
+                "validation_feedback": verdict.reason,
+            }
+
+        if self.speculative:
+            return await self._speculate(state, config)
 
-        structured_llm = self.llm.with_structured_output(ValidationResult)
+        is_valid, reason = await self._llm_validate(state)
+        return {
+            "validation_approved": is_valid,
+            "validation_feedback": reason,
+        }
+
+    async def _llm_validate(self, state: AgentState) -> tuple[bool, str | None]:
         VALIDATION_PROMPT = f"You are an expert at determining and rejecting requests that have curses in them. Tell me if this prompt is suitable to be validated or not {state['user_request']}"
 
         is_valid = False
         reason = "Validation error"
 
         try:
-            response = await structured_llm.ainvoke(VALIDATION_PROMPT)
+            response = await self.validation_llm.ainvoke(VALIDATION_PROMPT)
             logger.info(f"Validation result: {response}, type: {response}")
             is_valid = response.is_valid
             reason = response.reason
+            content_filter.record(state["user_request"], is_valid, reason)
         except Exception as e:
             logger.error(f"Error during validation: {e}")
 
         logger.warning(f"is_valid: {is_valid}, reason: {reason}")
-
-        return {
-            "validation_approved": is_valid,
-            "validation_feedback": reason,
+        return is_valid, reason
+
+    async def _speculate(self, state: AgentState, config: RunnableConfig) -> dict:
+        """Run the LLM validation and the executor side by side.
+
+        The executor's Discord side effects are held in a buffer that is
+        committed once validation approves; on rejection the executor is
+        cancelled and nothing it did becomes visible.
+        """
+        side_effects = SideEffectBuffer()
+        # The streamed reply is a side effect too and waits for the verdict
+        reply_stream: ReplyStream | None = config.get("configurable", {}).get(
+            "reply_stream"
+        )
+        if reply_stream is not None:
+            reply_stream.hold()
+            await side_effects.run(reply_stream.release)
+
+        executor_config: RunnableConfig = {
+            **config,
+            "configurable": {
+                **config.get("configurable", {}),
+                "side_effects": side_effects,
+            },
         }
+        execution = asyncio.create_task(
+            self.executor_agent.ainvoke(state, config=executor_config)
+        )
 
-    async def _get_agent(self, state: AgentState):
-        prompt = BASE_INSTRUCTION.format(
-            admin_instruction=state.get(
-                "instruction", "You are an assistant on a Discord server."
-            )
+        try:
+            is_valid, reason = await self._llm_validate(state)
+        except BaseException:
+            execution.cancel()
+            raise
+        validation = {"validation_approved": is_valid, "validation_feedback": reason}
+
+        if not is_valid:
+            execution.cancel()
+            with suppress(asyncio.CancelledError, Exception):
+                await execution
+            side_effects.discard()
+            if reply_stream is not None:
+                reply_stream.discard()
+            metrics.increment("agent_speculation_discarded")
+            return validation
+
+        await side_effects.commit()
+        metrics.increment("agent_speculation_committed")
+        result = await execution
+        return {**validation, "speculated": True, "messages": result["messages"]}
+
+    def _build_prompt(
+        self, state: AgentState, config: RunnableConfig
+    ) -> list[AnyMessage]:
+        streaming = config.get("configurable", {}).get("reply_stream") is not None
+        instruction = STREAMING_INSTRUCTION if streaming else BASE_INSTRUCTION
+        prompt = instruction.format(
+            admin_instruction=state.get("instruction") or DEFAULT_ADMIN_INSTRUCTION
         )
-        logger.info(f"Agent prompt: {prompt}")
-        if self.executor_agent:
-            return self.executor_agent
+        if summary := state.get("summary"):
+            prompt += f"\nSummary of the earlier conversation:\n{summary}\n"
         logger.info("--------📝 executing task--------")
-        checkpointer = InMemorySaver()
-        self.executor_agent = create_react_agent(
+        logger.info(f"Agent prompt: {prompt}")
+        return [SystemMessage(content=prompt), *state["messages"]]
+
+    def _get_agent(self):
+        # The parent graph's checkpointer is inherited by the executor
+        return create_react_agent(
             model=self.llm,
             tools=self.tools,
             name="executor_agent",
             state_schema=AgentState,
-            prompt=prompt,
-            checkpointer=checkpointer,
+            prompt=self._build_prompt,
         )
 
-        return self.executor_agent
-
     async def _handle_validation(
         self, state: AgentState
-    ) -> Literal["success", "failure"]:
+    ) -> Literal["success", "failure", "executed"]:
         logger.info("--------📝 handling validation--------")
         logger.debug(f"validation approved? = {state.get('validation_approved')} ")
-        if state.get("validation_approved"):
-            return "success"
-        return "failure"
-
-    async def _alog_executor_stream(self, stream):
-        async for s in stream:
-            messages = s[-1]["messages"]
-
-            if len(messages) > 0:
-                message = messages[-1]
-
-                if isinstance(message, tuple):
-                    logger.debug(message)
-
-                else:
-                    with io.StringIO() as buf, redirect_stdout(buf):
-                        message.pretty_print()
-                        pretty_output = buf.getvalue()
-
-                    logger.debug(f"{pretty_output}")
+        if not state.get("validation_approved"):
+            return "failure"
+        if state.get("speculated"):
+            return "executed"
+        return "success"
+
+    def _log_state(self, state: dict):
+        messages = state["messages"]
+
+        if len(messages) > 0:
+            message = messages[-1]
+
+            if isinstance(message, tuple):
+                logger.debug(message)
+
+            else:
+                with io.StringIO() as buf, redirect_stdout(buf):
+                    message.pretty_print()
+                    pretty_output = buf.getvalue()
+
+                logger.debug(f"{pretty_output}")
+
+    async def _alog_executor_stream(self, stream, reply_stream: ReplyStream | None):
+        turn_id = None
+        tool_turn = False
+        async for _, mode, payload in stream:
+            if mode == "values":
+                self._log_state(payload)
+                continue
+
+            # Tokens of the executor's model calls; validation calls are
+            # made from other nodes
+            chunk, metadata = payload
+            if (
+                reply_stream is None
+                or metadata.get("langgraph_node") != "agent"
+                or not isinstance(chunk, AIMessageChunk)
+            ):
+                continue
+
+            # Chunks of one model call share an id
+            if chunk.id != turn_id:
+                turn_id = chunk.id
+                tool_turn = False
+                reply_stream.start_turn()
+            if tool_turn:
+                continue
+            if chunk.tool_call_chunks:
+                # Whatever the model said before calling a tool isn't the answer
+                tool_turn = True
+                reply_stream.retract_turn()
+                continue
+            text = chunk.text()
+            if text:
+                reply_stream.feed(text)
 
     async def ainvoke(
         self,
@@ -148,6 +281,9 @@ class AgentGraph:
         instruction: str = CUSTOM_AGENT_INSTRUCTION,
         config: RunnableConfig | None = None,
         user_id: str | None = None,
+        message_ctx=None,
+        command_ctx=None,
+        stream_reply: bool = settings.AGENT_STREAM_REPLIES,
     ):
         initial_state = AgentState(
             instruction=instruction,
@@ -155,26 +291,39 @@ class AgentGraph:
             user_request=user_request,
             validation_approved=False,
             validation_feedback=None,
+            speculated=False,
             messages=[{"content": user_request, "role": "user"}],
             remaining_steps=10,
         )
 
-        await self._build_graph(state=initial_state)
-
-        # Generate a thread config if none provided
-        if config is None:
-            config = {"configurable": {"thread_id": f"user_{user_id or 'unknown'}"}}
-
-        # Ensure compiled_graph is available
-        if self.compiled_graph is None:
-            raise RuntimeError("Graph not compiled properly")
-
+        # Per-invocation values ride along in the config; the graph is shared
+        config = config or {}
+        configurable = {
+            "thread_id": conversation_thread_id(user_id, message_ctx or command_ctx),
+            **config.get("configurable", {}),
+            "message_ctx": message_ctx,
+            "command_ctx": command_ctx,
+        }
+        reply_stream = None
+        channel = getattr(message_ctx or command_ctx, "channel", None)
+        if stream_reply and channel is not None:
+            reply_stream = ReplyStream(channel)
+            configurable["reply_stream"] = reply_stream
+        config = {**config, "configurable": configurable}
+
+        compiled_graph = await self._get_compiled_graph()
         await self._alog_executor_stream(
-            stream=self.compiled_graph.astream(
-                input=initial_state, config=config, stream_mode="values", subgraphs=True
-            )
+            stream=compiled_graph.astream(
+                input=initial_state,
+                config=config,
+                stream_mode=["values", "messages"],
+                subgraphs=True,
+            ),
+            reply_stream=reply_stream,
         )
+        if reply_stream is not None:
+            await reply_stream.finish()
 
-        graph_state = await self.compiled_graph.aget_state(config)
+        graph_state = await compiled_graph.aget_state(config)
 
         return graph_state.values.get("messages")[-1].content
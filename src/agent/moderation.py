@@ -0,0 +1,290 @@
+from collections import deque
+from collections.abc import Iterable, Iterator
+import re
+from typing import Literal, NamedTuple
+import unicodedata
+
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.utils.cache import TTLCache
+
+Decision = Literal["allow", "block", "review"]
+
+# Blocked outright as whole words; found inside a word ("shiitake",
+# "bastardized") or only after collapsing repeated letters ("fuuuck")
+# they are left to the LLM validator
+STRONG_TERMS = (
+    "fuck",
+    "motherfuck",
+    "shit",
+    "bullshit",
+    "horseshit",
+    "bitch",
+    "cunt",
+    "asshole",
+    "dumbass",
+    "jackass",
+    "bastard",
+    "wanker",
+    "twat",
+    "whore",
+    "slut",
+    "dickhead",
+    "cocksucker",
+    "faggot",
+    "nigger",
+)
+
+# Inflections of the strong terms that are blocked as whole words too
+STRONG_INFLECTIONS = (
+    "fucks",
+    "fucked",
+    "fucker",
+    "fuckers",
+    "fucking",
+    "fuckin",
+    "motherfucker",
+    "motherfuckers",
+    "motherfucking",
+    "shits",
+    "shitty",
+    "shitting",
+    "bullshitting",
+    "bitches",
+    "bitching",
+    "bitchy",
+    "cunts",
+    "assholes",
+    "dumbasses",
+    "jackasses",
+    "bastards",
+    "wankers",
+    "wanking",
+    "twats",
+    "whores",
+    "sluts",
+    "slutty",
+    "dickheads",
+    "cocksuckers",
+    "faggots",
+    "niggers",
+)
+
+# Only suspicious as whole words, and even then often innocent ("Dick",
+# "cock" a gun), so they are left to the LLM validator
+WEAK_TERMS = (
+    "dick",
+    "cock",
+    "prick",
+    "piss",
+    "pissed",
+    "crap",
+    "damn",
+    "bollocks",
+    "retard",
+    "tits",
+)
+
+_LEETSPEAK = str.maketrans(
+    {
+        "0": "o",
+        "1": "i",
+        "3": "e",
+        "4": "a",
+        "5": "s",
+        "7": "t",
+        "8": "b",
+        "9": "g",
+        "@": "a",
+        "$": "s",
+        "!": "i",
+        "|": "l",
+        "+": "t",
+    }
+)
+_EDGE_PUNCTUATION = ".,!?;:'\"()[]{}<>~-_"
+_MASK_CHARACTERS = frozenset("*#%")
+_NON_LETTERS = re.compile(r"[^a-z]+")
+_REPEATS = re.compile(r"(.)\1+")
+
+
+class AhoCorasick:
+    """Finds every occurrence of a fixed set of patterns in one pass over a text."""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[tuple[str, ...]] = [()]
+
+        for pattern in patterns:
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = next_state
+            self._output[state] += (pattern,)
+
+        # Breadth-first, so a state's failure target is complete before it
+        # is used to resolve the failure links one level deeper
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def finditer(self, text: str) -> Iterator[tuple[int, str]]:
+        """Yield ``(start, pattern)`` for every match, overlapping ones included."""
+        state = 0
+        for end, char in enumerate(text, start=1):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern in self._output[state]:
+                yield end - len(pattern), pattern
+
+
+def _normalize_token(token: str) -> str:
+    token = token.translate(_LEETSPEAK)
+    return _NON_LETTERS.sub("", token)
+
+
+def _collapse_repeats(text: str) -> str:
+    # "fuuuuck" and "fuck" look the same once letter runs are collapsed,
+    # but so do "shiitake" and "shitake"
+    return _REPEATS.sub(r"\1", text)
+
+
+def normalize_request(text: str) -> tuple[str, bool]:
+    """Undo common obfuscation and return ``(normalized_text, was_masked)``.
+
+    Accents are stripped, leetspeak is mapped back to letters, punctuation
+    inside words is dropped ("f.u.c.k") and single letters separated by
+    spaces are rejoined ("f u c k"). ``was_masked`` reports words with
+    letters hidden behind ``*``/``#``/``%``, which no lexicon can match.
+    """
+    text = unicodedata.normalize("NFKD", text).casefold()
+    text = "".join(char for char in text if not unicodedata.combining(char))
+
+    masked = False
+    words: list[str] = []
+    letters: list[str] = []
+    for raw in text.split():
+        raw = raw.strip(_EDGE_PUNCTUATION)
+        masked = masked or any(char in _MASK_CHARACTERS for char in raw.strip("*#%"))
+        token = _normalize_token(raw)
+        if len(token) == 1:
+            letters.append(token)
+            continue
+        if letters:
+            words.append("".join(letters))
+            letters = []
+        if token:
+            words.append(token)
+    if letters:
+        words.append("".join(letters))
+
+    return " ".join(words), masked
+
+
+class ModerationVerdict(NamedTuple):
+    decision: Decision
+    reason: str | None
+
+
+class ContentFilter:
+    """Local first pass of request validation.
+
+    A request containing a strong profanity, or one of its listed
+    inflections, as a whole word is blocked and one without any lexicon
+    hit is allowed, both without calling the LLM. Everything in between
+    (weak terms, strong terms inside words, across spaces or behind
+    repeated letters, masked words) is returned as ``review`` for the LLM
+    validator, whose ruling can be stored with ``record``. Verdicts are
+    cached on the normalized text, so rephrasings that normalize alike
+    share one entry.
+    """
+
+    def __init__(
+        self,
+        strong_terms: Iterable[str] = STRONG_TERMS,
+        strong_inflections: Iterable[str] = STRONG_INFLECTIONS,
+        weak_terms: Iterable[str] = WEAK_TERMS,
+        cache_size: int = settings.MODERATION_CACHE_SIZE,
+        cache_ttl: float = settings.MODERATION_CACHE_TTL_SECONDS,
+    ):
+        strong_terms = [_normalize_token(term) for term in strong_terms]
+        self._blocked = frozenset(
+            strong_terms + [_normalize_token(term) for term in strong_inflections]
+        )
+        # Matched against the text with repeated letters collapsed
+        self._strong = frozenset(_collapse_repeats(term) for term in strong_terms)
+        self._weak = frozenset(
+            _collapse_repeats(_normalize_token(term)) for term in weak_terms
+        )
+        self._matcher = AhoCorasick(self._strong | self._weak)
+        self._verdicts: TTLCache[tuple[str, bool], ModerationVerdict] = TTLCache(
+            cache_size, cache_ttl
+        )
+
+    def _scan(self, text: str, masked: bool) -> ModerationVerdict:
+        words = text.split()
+        for word in words:
+            if word in self._blocked:
+                return ModerationVerdict("block", f"Contains profanity: {word}")
+
+        review_reason = "Masked word" if masked else None
+        collapsed = " ".join(_collapse_repeats(word) for word in words)
+        for start, term in self._matcher.finditer(collapsed):
+            end = start + len(term)
+            at_word_start = start == 0 or collapsed[start - 1] == " "
+            at_word_end = end == len(collapsed) or collapsed[end] == " "
+            if term in self._strong or (at_word_start and at_word_end):
+                review_reason = review_reason or f"Possible profanity: {term}"
+                break
+
+        if review_reason is None:
+            # Catch profanity split across words ("fu ck"); a match here can
+            # as well be two innocent words touching, so only flag it
+            squashed = collapsed.replace(" ", "")
+            for _, term in self._matcher.finditer(squashed):
+                if term in self._strong:
+                    review_reason = f"Possible profanity: {term}"
+                    break
+
+        if review_reason is not None:
+            return ModerationVerdict("review", review_reason)
+        return ModerationVerdict("allow", None)
+
+    def classify(self, request: str) -> ModerationVerdict:
+        key = normalize_request(request)
+        verdict = self._verdicts.get(key)
+        if verdict is not None:
+            metrics.increment("moderation_cache_hits")
+        else:
+            verdict = self._scan(*key)
+            # Reviews are cached once the LLM has ruled on them
+            if verdict.decision != "review":
+                self._verdicts.set(key, verdict)
+
+        metrics.increment(f"moderation_{verdict.decision}")
+        return verdict
+
+    def record(self, request: str, is_valid: bool, reason: str | None) -> None:
+        """Cache the LLM validator's ruling on a request sent for review."""
+        self._verdicts.set(
+            normalize_request(request),
+            ModerationVerdict("allow" if is_valid else "block", reason),
+        )
+
+
+content_filter = ContentFilter()
@@ -0,0 +1,144 @@
+import asyncio
+
+import discord
+from discord.abc import Messageable
+
+from src.core.config import settings
+from src.core.logging import logger
+from src.utils.recent_messages import recent_messages
+
+DISCORD_MESSAGE_LIMIT = 2000
+CURSOR = " ▌"
+
+
+def split_reply(text: str, limit: int) -> list[str]:
+    """Split ``text`` into chunks of at most ``limit`` characters.
+
+    Chunks end at the last newline or space within the first ``limit + 1``
+    characters, a separator right at the limit being dropped, and at the
+    limit itself otherwise. Cuts aren't guaranteed to stay put as the text
+    changes; ``ReplyStream`` edits the posted chunks whenever one moves.
+    """
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit + 1)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, limit + 1)
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip("\n ")
+    chunks.append(text)
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+class ReplyStream:
+    """Posts the agent's reply while it is being generated.
+
+    The first text is posted as soon as it arrives, later text is added by
+    editing that message at most once per ``edit_interval`` to stay clear of
+    Discord's edit rate limit. Past 2000 characters the reply continues in
+    follow-up messages. A held stream only collects text until ``release``;
+    a discarded one never posts anything. The text of a model turn that
+    ends in a tool call is narration rather than answer, and is taken back
+    with ``retract_turn``.
+    """
+
+    def __init__(
+        self,
+        channel: Messageable,
+        edit_interval: float = settings.REPLY_EDIT_INTERVAL_SECONDS,
+    ):
+        self.channel = channel
+        self.edit_interval = edit_interval
+        self.text = ""
+        self._turn_start = 0
+        self._held = False
+        self._discarded = False
+        self._messages: list[discord.Message] = []
+        self._shown: list[str] = []
+        self._lock = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+
+    def feed(self, text: str) -> None:
+        self.text += text
+        self._schedule()
+
+    def start_turn(self) -> None:
+        self._turn_start = len(self.text)
+
+    def retract_turn(self) -> None:
+        """Drop the text fed since ``start_turn``, unposting what was shown."""
+        self.text = self.text[: self._turn_start]
+        self._schedule()
+
+    def hold(self) -> None:
+        self._held = True
+
+    async def release(self) -> None:
+        self._held = False
+        self._schedule()
+
+    def discard(self) -> None:
+        self._discarded = True
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        # Keep the abandoned reply out of the agent's view of the channel
+        for message in self._messages:
+            recent_messages.remove(message.id)
+
+    async def finish(self) -> None:
+        """Post the complete reply, without the typing cursor."""
+        if self._held or self._discarded:
+            return
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        await self._flush(final=True)
+        # The buffer recorded the first chunk as it was posted, cursor included
+        for message, shown in zip(self._messages, self._shown):
+            recent_messages.update(message.id, shown)
+
+    def _schedule(self) -> None:
+        if self._held or self._discarded:
+            return
+        # Empty text only needs a flush to take back what was posted
+        if not self.text.strip() and not self._messages:
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        # The first chunk goes out right away; edits are coalesced, and
+        # repeated while text arrives faster than they can be made
+        while True:
+            if self._messages:
+                await asyncio.sleep(self.edit_interval)
+            length = len(self.text)
+            # Shielded so ``finish`` can't cancel a send halfway and lose
+            # track of the posted message
+            await asyncio.shield(self._flush(final=False))
+            if len(self.text) == length or self._held or self._discarded:
+                return
+
+    async def _flush(self, final: bool) -> None:
+        async with self._lock:
+            chunks = split_reply(self.text, DISCORD_MESSAGE_LIMIT - len(CURSOR))
+            if chunks and not final:
+                chunks[-1] += CURSOR
+
+            try:
+                for i, chunk in enumerate(chunks):
+                    if i < len(self._messages):
+                        if self._shown[i] != chunk:
+                            await self._messages[i].edit(content=chunk)
+                            self._shown[i] = chunk
+                    else:
+                        self._messages.append(await self.channel.send(chunk))
+                        self._shown.append(chunk)
+                # Left over from a retracted turn
+                while len(self._messages) > len(chunks):
+                    await self._messages[-1].delete()
+                    self._messages.pop()
+                    self._shown.pop()
+            except discord.HTTPException as e:
+                logger.error(f"Error streaming reply: {e}")
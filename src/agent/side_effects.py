@@ -0,0 +1,55 @@
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+
+from src.core.logging import logger
+
+Effect = Callable[[], Awaitable[Any]]
+
+
+class SideEffectBuffer:
+    """Holds back the Discord side effects of a speculative executor run.
+
+    Effects are queued until ``commit`` replays them in order, including
+    those queued during the replay; any effect arriving after the commit
+    runs straight away. ``discard`` drops them when
+    validation rejects the request. A queued effect that fails on commit is
+    logged, since the tool that queued it has already reported success.
+    """
+
+    def __init__(self):
+        self._effects: list[Effect] = []
+        self._committed = False
+
+    def __len__(self) -> int:
+        return len(self._effects)
+
+    async def run(self, effect: Effect) -> None:
+        if self._committed:
+            await effect()
+        else:
+            self._effects.append(effect)
+
+    async def commit(self) -> None:
+        # Effects queued while replaying go to the back of the queue, and
+        # only an empty queue lets later effects run straight away
+        while self._effects:
+            effect = self._effects.pop(0)
+            try:
+                await effect()
+            except Exception as e:
+                logger.exception(f"Error committing buffered side effect: {e}")
+        self._committed = True
+
+    def discard(self) -> None:
+        self._effects.clear()
+
+
+async def run_side_effect(config: RunnableConfig, effect: Effect) -> None:
+    """Run ``effect`` now, or through the invocation's buffer while speculating."""
+    buffer: SideEffectBuffer | None = config.get("configurable", {}).get("side_effects")
+    if buffer is None:
+        await effect()
+    else:
+        await buffer.run(effect)
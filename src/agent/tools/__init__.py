@@ -1,4 +1,5 @@
 from .get_channel_info import GetChannelInfo
+from .get_recent_messages import GetRecentMessages
 from .get_server_info import GetServerInfo
 from .get_user_info import GetUserInfo
 from .react_to_message import ReactToMessage
@@ -8,6 +9,7 @@ from .send_message import SendMessage
 __all__ = [
     "SendMessage",
     "GetChannelInfo",
+    "GetRecentMessages",
     "GetUserInfo",
     "GetServerInfo",
     "ReactToMessage",
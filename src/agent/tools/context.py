@@ -0,0 +1,24 @@
+from typing import NamedTuple
+
+from discord import Message as DiscordMessageContext
+from discord.ext.commands import Context as DiscordCommandContext
+from langchain_core.runnables import RunnableConfig
+
+
+class DiscordContext(NamedTuple):
+    message_ctx: DiscordMessageContext | None
+    command_ctx: DiscordCommandContext | None
+
+
+def get_discord_context(config: RunnableConfig) -> DiscordContext:
+    """Read the Discord context of the current invocation from ``config``.
+
+    Tools are shared by every invocation of the compiled graph, so the message
+    or command that triggered the agent travels in ``config["configurable"]``
+    rather than on the tool instances.
+    """
+    configurable = config.get("configurable", {})
+    return DiscordContext(
+        message_ctx=configurable.get("message_ctx"),
+        command_ctx=configurable.get("command_ctx"),
+    )
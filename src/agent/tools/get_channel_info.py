@@ -1,9 +1,10 @@
 import asyncio
 
 import discord
-from discord import Message as DiscordMessageContext
-from discord.ext.commands import Context as DiscordCommandContext
 from langchain.tools.base import BaseTool
+from langchain_core.runnables import RunnableConfig, ensure_config
+
+from src.agent.tools.context import get_discord_context
 
 
 class GetChannelInfo(BaseTool):
@@ -12,27 +13,27 @@ class GetChannelInfo(BaseTool):
     Input should be either empty for current channel or a channel ID/name."""
     return_direct: bool = False
 
-    message_ctx: DiscordMessageContext | None = None
-    command_ctx: DiscordCommandContext | None = None
-
     def _run(self, channel_identifier: str = "") -> str:
-        return asyncio.run(self._arun(channel_identifier))
+        return asyncio.run(self._arun(channel_identifier, config=ensure_config()))
 
-    async def _arun(self, channel_identifier: str = "") -> str:
+    async def _arun(
+        self, channel_identifier: str = "", *, config: RunnableConfig
+    ) -> str:
         """Async version - Get information about a Discord channel."""
+        message_ctx, command_ctx = get_discord_context(config)
         try:
             channel = None
 
             if not channel_identifier:
                 # Get current channel
-                if self.message_ctx and hasattr(self.message_ctx, "channel"):
-                    channel = self.message_ctx.channel
-                elif self.command_ctx and hasattr(self.command_ctx, "channel"):
-                    channel = self.command_ctx.channel
+                if message_ctx and hasattr(message_ctx, "channel"):
+                    channel = message_ctx.channel
+                elif command_ctx and hasattr(command_ctx, "channel"):
+                    channel = command_ctx.channel
             else:
                 # Try to get channel by ID or name
-                if self.message_ctx and hasattr(self.message_ctx, "guild"):
-                    guild = self.message_ctx.guild
+                if message_ctx and hasattr(message_ctx, "guild"):
+                    guild = message_ctx.guild
                     if channel_identifier.isdigit():
                         channel = guild.get_channel(int(channel_identifier))
                     else:
@@ -0,0 +1,39 @@
+import asyncio
+
+from langchain.tools.base import BaseTool
+from langchain_core.runnables import RunnableConfig, ensure_config
+
+from src.agent.tools.context import get_discord_context
+from src.utils.recent_messages import recent_messages
+
+
+class GetRecentMessages(BaseTool):
+    name: str = "get_recent_messages"
+    description: str = """Get the latest messages of the current Discord channel, oldest first.
+    Use it to understand what the conversation is about before asking for clarification.
+    Input is the number of messages to return; leave it empty for all that are available."""
+    return_direct: bool = False
+
+    def _run(self, limit: str = "") -> str:
+        return asyncio.run(self._arun(limit, config=ensure_config()))
+
+    async def _arun(self, limit: str = "", *, config: RunnableConfig) -> str:
+        """Async version - Get the latest messages of the current channel."""
+        message_ctx, command_ctx = get_discord_context(config)
+        context = message_ctx or command_ctx
+        if not context or not hasattr(context, "channel"):
+            return "Error: No channel context available"
+
+        # Served from memory; no database or Discord API request
+        messages = recent_messages.get(
+            context.channel.id, int(limit) if limit.strip().isdigit() else None
+        )
+        if not messages:
+            return "No recent messages in this channel"
+
+        lines = [
+            f"[{message.created_at:%Y-%m-%d %H:%M}] "
+            f"{message.author}{' (bot)' if message.is_bot else ''}: {message.content}"
+            for message in messages
+        ]
+        return "**Recent messages:**\n" + "\n".join(lines)
@@ -1,9 +1,10 @@
 import asyncio
 
 import discord
-from discord import Message as DiscordMessageContext
-from discord.ext.commands import Context as DiscordCommandContext
 from langchain.tools.base import BaseTool
+from langchain_core.runnables import RunnableConfig, ensure_config
+
+from src.agent.tools.context import get_discord_context
 
 
 class GetServerInfo(BaseTool):
@@ -12,22 +13,20 @@ class GetServerInfo(BaseTool):
     No input required - gets info about the current server."""
     return_direct: bool = False
 
-    message_ctx: DiscordMessageContext | None = None
-    command_ctx: DiscordCommandContext | None = None
-
     def _run(self, input_str: str = "") -> str:
-        return asyncio.run(self._arun(input_str))
+        return asyncio.run(self._arun(input_str, config=ensure_config()))
 
-    async def _arun(self, input_str: str = "") -> str:
+    async def _arun(self, input_str: str = "", *, config: RunnableConfig) -> str:
         """Async version - Get information about the Discord server."""
+        message_ctx, command_ctx = get_discord_context(config)
         try:
             guild = None
 
             # Get guild context
-            if self.message_ctx and hasattr(self.message_ctx, "guild"):
-                guild = self.message_ctx.guild
-            elif self.command_ctx and hasattr(self.command_ctx, "guild"):
-                guild = self.command_ctx.guild
+            if message_ctx and hasattr(message_ctx, "guild"):
+                guild = message_ctx.guild
+            elif command_ctx and hasattr(command_ctx, "guild"):
+                guild = command_ctx.guild
 
             if not guild:
                 return "Error: No guild context available (this might be a DM)"
@@ -1,9 +1,10 @@
 import asyncio
 
 import discord
-from discord import Message as DiscordMessageContext
-from discord.ext.commands import Context as DiscordCommandContext
 from langchain.tools.base import BaseTool
+from langchain_core.runnables import RunnableConfig, ensure_config
+
+from src.agent.tools.context import get_discord_context
 
 
 class GetUserInfo(BaseTool):
@@ -12,23 +13,21 @@ class GetUserInfo(BaseTool):
     Input should be a user mention (@user), user ID, or username."""
     return_direct: bool = False
 
-    message_ctx: DiscordMessageContext | None = None
-    command_ctx: DiscordCommandContext | None = None
-
     def _run(self, user_identifier: str) -> str:
-        return asyncio.run(self._arun(user_identifier))
+        return asyncio.run(self._arun(user_identifier, config=ensure_config()))
 
-    async def _arun(self, user_identifier: str) -> str:
+    async def _arun(self, user_identifier: str, config: RunnableConfig) -> str:
         """Async version - Get information about a Discord user."""
+        message_ctx, command_ctx = get_discord_context(config)
         try:
             user = None
             guild = None
 
             # Get guild context
-            if self.message_ctx and hasattr(self.message_ctx, "guild"):
-                guild = self.message_ctx.guild
-            elif self.command_ctx and hasattr(self.command_ctx, "guild"):
-                guild = self.command_ctx.guild
+            if message_ctx and hasattr(message_ctx, "guild"):
+                guild = message_ctx.guild
+            elif command_ctx and hasattr(command_ctx, "guild"):
+                guild = command_ctx.guild
 
             if not guild:
                 return "Error: No guild context available"
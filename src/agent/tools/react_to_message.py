@@ -1,9 +1,11 @@
 import asyncio
 
 import discord
-from discord import Message as DiscordMessageContext
-from discord.ext.commands import Context as DiscordCommandContext
 from langchain.tools.base import BaseTool
+from langchain_core.runnables import RunnableConfig, ensure_config
+
+from src.agent.side_effects import run_side_effect
+from src.agent.tools.context import get_discord_context
 
 
 class ReactToMessage(BaseTool):
@@ -13,14 +15,12 @@ class ReactToMessage(BaseTool):
     Example: '👍' or '👍:1234567890123456789'"""
     return_direct: bool = False
 
-    message_ctx: DiscordMessageContext | None = None
-    command_ctx: DiscordCommandContext | None = None
-
     def _run(self, reaction_input: str) -> str:
-        return asyncio.run(self._arun(reaction_input))
+        return asyncio.run(self._arun(reaction_input, config=ensure_config()))
 
-    async def _arun(self, reaction_input: str) -> str:
+    async def _arun(self, reaction_input: str, config: RunnableConfig) -> str:
         """Async version - Add a reaction emoji to a message."""
+        message_ctx, command_ctx = get_discord_context(config)
         try:
             # Parse input
             if ":" in reaction_input:
@@ -38,12 +38,10 @@ class ReactToMessage(BaseTool):
             if message_id:
                 # Try to get specific message by ID
                 if message_id.isdigit():
-                    if self.message_ctx and hasattr(self.message_ctx, "channel"):
+                    if message_ctx and hasattr(message_ctx, "channel"):
                         try:
-                            target_message = (
-                                await self.message_ctx.channel.fetch_message(
-                                    int(message_id)
-                                )
+                            target_message = await message_ctx.channel.fetch_message(
+                                int(message_id)
                             )
                         except discord.NotFound:
                             return f"Error: Message with ID {message_id} not found"
@@ -53,10 +51,10 @@ class ReactToMessage(BaseTool):
                     return f"Error: Invalid message ID '{message_id}'"
             else:
                 # React to the current message (the one that triggered the bot)
-                if self.message_ctx:
-                    target_message = self.message_ctx
-                elif self.command_ctx and hasattr(self.command_ctx, "message"):
-                    target_message = self.command_ctx.message
+                if message_ctx:
+                    target_message = message_ctx
+                elif command_ctx and hasattr(command_ctx, "message"):
+                    target_message = command_ctx.message
                 else:
                     return "Error: No message context available"
 
@@ -64,7 +62,7 @@ class ReactToMessage(BaseTool):
                 return "Error: Could not find target message"
 
             # Add the reaction
-            await target_message.add_reaction(emoji)
+            await run_side_effect(config, lambda: target_message.add_reaction(emoji))
 
             return f"Successfully reacted with {emoji} to message"
 
@@ -1,8 +1,10 @@
 import asyncio
 
-from discord import Message as DiscordMessageContext
-from discord.ext.commands import Context as DiscordCommandContext
 from langchain.tools.base import BaseTool
+from langchain_core.runnables import RunnableConfig, ensure_config
+
+from src.agent.side_effects import run_side_effect
+from src.agent.tools.context import get_discord_context
 
 
 class SendMessage(BaseTool):
@@ -12,21 +14,19 @@ class SendMessage(BaseTool):
     Use this tool to respond to users or send information to the current channel."""
     return_direct: bool = False
 
-    message_ctx: DiscordMessageContext | None = None
-    command_ctx: DiscordCommandContext | None = None
-
     def _run(self, content: str) -> str:
-        return asyncio.run(self._arun(content))
+        return asyncio.run(self._arun(content, config=ensure_config()))
 
-    async def _arun(self, content: str) -> str:
+    async def _arun(self, content: str, config: RunnableConfig) -> str:
         """Async version - Send a message to the Discord channel."""
+        message_ctx, command_ctx = get_discord_context(config)
         try:
-            if self.message_ctx and hasattr(self.message_ctx, "channel"):
-                await self.message_ctx.channel.send(content)
+            if message_ctx and hasattr(message_ctx, "channel"):
+                await run_side_effect(config, lambda: message_ctx.channel.send(content))
                 return f"Message sent successfully: {content}"
-            elif self.command_ctx and hasattr(self.command_ctx, "send"):
+            elif command_ctx and hasattr(command_ctx, "send"):
                 # Send via command context
-                await self.command_ctx.send(content)
+                await run_side_effect(config, lambda: command_ctx.send(content))
                 return f"Message sent successfully: {content}"
             else:
                 return "Error: No valid Discord context available to send message"
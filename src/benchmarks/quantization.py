@@ -0,0 +1,173 @@
+"""Index size and recall of compact vector representations with exact re-ranking.
+
+    python -m src.benchmarks.quantization --rows 100000 --queries 200
+
+Builds an HNSW index over full-precision, ``halfvec`` and binary-quantized
+embeddings of the same synthetic corpus as ``src.benchmarks.vector_index``.
+Each query takes ``k * factor`` candidates from the index and re-ranks them
+by their exact cosine distance, like ``/find`` does, reporting the index
+size saved against the full-precision index next to recall@k and p50/p99
+latency for every re-rank factor. The scratch table is dropped afterwards.
+"""
+
+import argparse
+import time
+from typing import NamedTuple
+
+import numpy as np
+from pgvector.psycopg import register_vector
+import psycopg
+from psycopg import sql
+
+from src.benchmarks.vector_index import (
+    TABLE,
+    build_index,
+    exact_top_k,
+    load_corpus,
+    percentile,
+    recall_at_k,
+    synthetic_corpus,
+    synthetic_queries,
+)
+from src.core.database import libpq_dsn
+from src.utils.vector_index import Quantization
+
+# The ordering each index answers; must match index_element
+APPROXIMATE_DISTANCE: dict[Quantization, str] = {
+    "none": "embedding <=> %(query)s",
+    "halfvec": "embedding::halfvec({dim}) <=> %(query)s::vector::halfvec({dim})",
+    "binary": (
+        "binary_quantize(embedding)::bit({dim}) "
+        "<~> binary_quantize(%(query)s::vector)::bit({dim})"
+    ),
+}
+
+
+class Result(NamedTuple):
+    quantization: str
+    factor: int
+    index_mb: float
+    saved: float
+    recall: float
+    p50_ms: float
+    p99_ms: float
+
+
+def rerank_search(
+    conn: psycopg.Connection,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    quantization: Quantization,
+    factor: int,
+    ef_search: int,
+) -> tuple[float, float, float]:
+    """Run every query once; returns recall@k, p50 and p99 latency in ms."""
+    k = truth.shape[1]
+    candidates = k * factor
+    # HNSW returns at most ef_search rows
+    conn.execute(
+        "SELECT set_config('hnsw.ef_search', %s, false)",
+        (str(max(ef_search, candidates)),),
+    )
+
+    dim = queries.shape[1]
+    stmt = sql.SQL(
+        "WITH candidates AS MATERIALIZED ("
+        "SELECT id, embedding FROM {} ORDER BY {} LIMIT %(candidates)s) "
+        "SELECT id FROM candidates ORDER BY embedding <=> %(query)s LIMIT %(k)s"
+    ).format(
+        sql.Identifier(TABLE),
+        sql.SQL(APPROXIMATE_DISTANCE[quantization].format(dim=dim)),
+    )
+    found, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        rows = conn.execute(
+            stmt, {"query": query, "candidates": candidates, "k": k}
+        ).fetchall()
+        latencies.append((time.perf_counter() - started) * 1000)
+        found.append([row[0] for row in rows])
+    return (
+        recall_at_k(found, truth),
+        percentile(latencies, 50),
+        percentile(latencies, 99),
+    )
+
+
+def run(args: argparse.Namespace) -> list[Result]:
+    rng = np.random.default_rng(args.seed)
+    corpus = synthetic_corpus(args.rows, args.dim, args.clusters, rng)
+    queries = synthetic_queries(corpus, args.queries, rng)
+    truth = exact_top_k(corpus, queries, args.k)
+
+    results = []
+    full_mb = None
+    with psycopg.connect(libpq_dsn(), autocommit=True) as conn:
+        register_vector(conn)
+        conn.execute(
+            sql.SQL("SET maintenance_work_mem = {}").format(
+                sql.Literal(args.maintenance_work_mem)
+            )
+        )
+        try:
+            load_corpus(conn, corpus)
+            options = {"m": args.m, "ef_construction": args.ef_construction}
+            for quantization in args.quantizations:
+                _, index_mb = build_index(conn, "hnsw", options, quantization, args.dim)
+                if quantization == "none":
+                    full_mb = index_mb
+                # Without a full-precision baseline there is nothing to compare to
+                saved = 1 - index_mb / full_mb if full_mb else float("nan")
+                for factor in args.factors:
+                    recall, p50, p99 = rerank_search(
+                        conn, queries, truth, quantization, factor, args.ef_search
+                    )
+                    results.append(
+                        Result(quantization, factor, index_mb, saved, recall, p50, p99)
+                    )
+        finally:
+            conn.execute(
+                sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(TABLE))
+            )
+
+    return results
+
+
+def print_results(results: list[Result], k: int) -> None:
+    print(
+        f"{'quantization':<12}  {'factor':>6}  {'index MB':>8}  {'saved':>6}  "
+        f"{f'recall@{k}':>9}  {'p50 ms':>7}  {'p99 ms':>7}"
+    )
+    for r in results:
+        print(
+            f"{r.quantization:<12}  {r.factor:>6}  {r.index_mb:>8.1f}  "
+            f"{r.saved:>6.0%}  {r.recall:>9.3f}  {r.p50_ms:>7.2f}  {r.p99_ms:>7.2f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument(
+        "--quantizations",
+        nargs="+",
+        choices=list(APPROXIMATE_DISTANCE),
+        default=list(APPROXIMATE_DISTANCE),
+    )
+    parser.add_argument("--factors", type=int, nargs="+", default=[1, 2, 5, 10])
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--ef-search", type=int, default=100)
+    parser.add_argument("--maintenance-work-mem", default="1GB")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print_results(run(args), args.k)
+
+
+if __name__ == "__main__":
+    main()
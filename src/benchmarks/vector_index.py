@@ -0,0 +1,251 @@
+"""Recall and latency of vector index configurations on a synthetic corpus.
+
+    python -m src.benchmarks.vector_index --rows 100000 --queries 200
+
+Loads clustered, normalized random vectors into a scratch table of the
+``DATABASE_URL`` database, builds each index configuration in turn and
+reports recall@k against exact search together with p50/p99 query latency.
+The scratch table is dropped afterwards.
+"""
+
+import argparse
+import math
+import time
+from typing import NamedTuple
+
+import numpy as np
+from pgvector.psycopg import register_vector
+import psycopg
+from psycopg import sql
+
+from src.core.database import libpq_dsn
+from src.utils.vector_index import Quantization, index_element, plan_index
+
+TABLE = "bench_vector_index"
+
+
+class Result(NamedTuple):
+    config: str
+    build_seconds: float
+    index_mb: float
+    recall: float
+    p50_ms: float
+    p99_ms: float
+
+
+def synthetic_corpus(
+    rows: int, dim: int, clusters: int, rng: np.random.Generator
+) -> np.ndarray:
+    """Unit vectors around ``clusters`` centers, like topic-heavy chat embeddings."""
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    vectors = centers[rng.integers(clusters, size=rows)]
+    vectors += 0.5 * rng.standard_normal((rows, dim), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def synthetic_queries(
+    corpus: np.ndarray, count: int, rng: np.random.Generator
+) -> np.ndarray:
+    """Perturbed corpus vectors, so queries land where the data is."""
+    queries = corpus[rng.integers(len(corpus), size=count)].copy()
+    queries += 0.1 * rng.standard_normal(queries.shape, dtype=np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Ids of the ``k`` nearest rows by cosine distance for each query."""
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+
+def recall_at_k(found: list[list[int]], truth: np.ndarray) -> float:
+    hits = sum(len(set(ids) & set(expected)) for ids, expected in zip(found, truth))
+    return hits / truth.size
+
+
+def percentile(values: list[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else math.nan
+
+
+def load_corpus(conn: psycopg.Connection, corpus: np.ndarray) -> None:
+    conn.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(TABLE)))
+    conn.execute(
+        sql.SQL(
+            "CREATE UNLOGGED TABLE {} (id integer PRIMARY KEY, embedding vector({}))"
+        ).format(sql.Identifier(TABLE), sql.Literal(corpus.shape[1]))
+    )
+    with conn.cursor().copy(
+        sql.SQL("COPY {} (id, embedding) FROM STDIN WITH (FORMAT BINARY)").format(
+            sql.Identifier(TABLE)
+        )
+    ) as copy:
+        copy.set_types(["int4", "vector"])
+        for i, vector in enumerate(corpus):
+            copy.write_row((i, vector))
+    conn.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(TABLE)))
+
+
+def search(
+    conn: psycopg.Connection,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    scan_settings: dict[str, str],
+) -> tuple[float, float, float]:
+    """Run every query once; returns recall@k, p50 and p99 latency in ms."""
+    for key, value in scan_settings.items():
+        conn.execute("SELECT set_config(%s, %s, false)", (key, value))
+
+    stmt = sql.SQL("SELECT id FROM {} ORDER BY embedding <=> %s LIMIT %s").format(
+        sql.Identifier(TABLE)
+    )
+    k = truth.shape[1]
+    found, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        rows = conn.execute(stmt, (query, k)).fetchall()
+        latencies.append((time.perf_counter() - started) * 1000)
+        found.append([row[0] for row in rows])
+    return (
+        recall_at_k(found, truth),
+        percentile(latencies, 50),
+        percentile(latencies, 99),
+    )
+
+
+def build_index(
+    conn: psycopg.Connection,
+    method: str,
+    options: dict[str, int],
+    quantization: Quantization = "none",
+    dim: int = 768,
+) -> tuple[float, float]:
+    """Build the index, returning the build time in seconds and its size in MB."""
+    conn.execute(
+        sql.SQL("DROP INDEX IF EXISTS {}").format(sql.Identifier(f"{TABLE}_ann"))
+    )
+    started = time.perf_counter()
+    conn.execute(
+        sql.SQL("CREATE INDEX {} ON {} USING {} ({}) WITH ({})").format(
+            sql.Identifier(f"{TABLE}_ann"),
+            sql.Identifier(TABLE),
+            sql.SQL(method),
+            index_element(quantization, dim),
+            sql.SQL(", ").join(
+                sql.SQL("{} = {}").format(sql.SQL(key), sql.Literal(value))
+                for key, value in options.items()
+            ),
+        )
+    )
+    elapsed = time.perf_counter() - started
+    (size,) = conn.execute(
+        "SELECT pg_relation_size(%s::regclass)", (f"{TABLE}_ann",)
+    ).fetchone()
+    return elapsed, size / 2**20
+
+
+def run(args: argparse.Namespace) -> list[Result]:
+    rng = np.random.default_rng(args.seed)
+    corpus = synthetic_corpus(args.rows, args.dim, args.clusters, rng)
+    queries = synthetic_queries(corpus, args.queries, rng)
+    truth = exact_top_k(corpus, queries, args.k)
+
+    results = []
+    with psycopg.connect(libpq_dsn(), autocommit=True) as conn:
+        register_vector(conn)
+        conn.execute(
+            sql.SQL("SET maintenance_work_mem = {}").format(
+                sql.Literal(args.maintenance_work_mem)
+            )
+        )
+        try:
+            load_corpus(conn, corpus)
+
+            recall, p50, p99 = search(conn, queries, truth, {})
+            results.append(Result("exact (no index)", 0, 0, recall, p50, p99))
+
+            planned = plan_index(args.rows)
+            lists = planned.options.get("lists") or max(args.rows // 1000, 10)
+            if "ivfflat" in args.methods:
+                build_seconds, index_mb = build_index(conn, "ivfflat", {"lists": lists})
+                probes = args.probes or sorted(
+                    {1, math.ceil(math.sqrt(lists)), 2 * math.ceil(math.sqrt(lists))}
+                )
+                for probe in probes:
+                    recall, p50, p99 = search(
+                        conn, queries, truth, {"ivfflat.probes": str(probe)}
+                    )
+                    results.append(
+                        Result(
+                            f"ivfflat lists={lists} probes={probe}",
+                            build_seconds,
+                            index_mb,
+                            recall,
+                            p50,
+                            p99,
+                        )
+                    )
+
+            if "hnsw" in args.methods:
+                options = {"m": args.m, "ef_construction": args.ef_construction}
+                build_seconds, index_mb = build_index(conn, "hnsw", options)
+                for ef_search in args.ef_search:
+                    recall, p50, p99 = search(
+                        conn, queries, truth, {"hnsw.ef_search": str(ef_search)}
+                    )
+                    results.append(
+                        Result(
+                            f"hnsw m={args.m} ef_construction={args.ef_construction} "
+                            f"ef_search={ef_search}",
+                            build_seconds,
+                            index_mb,
+                            recall,
+                            p50,
+                            p99,
+                        )
+                    )
+        finally:
+            conn.execute(
+                sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(TABLE))
+            )
+
+    return results
+
+
+def print_results(results: list[Result], k: int) -> None:
+    width = max(len(r.config) for r in results)
+    print(
+        f"{'config':<{width}}  {'build s':>8}  {'index MB':>8}  "
+        f"{f'recall@{k}':>9}  {'p50 ms':>7}  {'p99 ms':>7}"
+    )
+    for r in results:
+        print(
+            f"{r.config:<{width}}  {r.build_seconds:>8.1f}  {r.index_mb:>8.1f}  "
+            f"{r.recall:>9.3f}  {r.p50_ms:>7.2f}  {r.p99_ms:>7.2f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument(
+        "--methods", nargs="+", choices=["ivfflat", "hnsw"], default=["ivfflat", "hnsw"]
+    )
+    parser.add_argument("--probes", type=int, nargs="*", default=[])
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[40, 100, 200])
+    parser.add_argument("--maintenance-work-mem", default="1GB")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print_results(run(args), args.k)
+
+
+if __name__ == "__main__":
+    main()
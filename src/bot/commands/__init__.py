@@ -1 +1 @@
-from . import find, instruction
+from . import find, instruction, requeue, retention
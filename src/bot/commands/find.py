@@ -1,13 +1,23 @@
+from datetime import UTC, datetime, timedelta
+import re
+
 from discord.ext.commands import Context
 from pydantic import BaseModel
 
 from src.bot.bot import bot
 from src.core import logger
+from src.core.database import AsyncSessionLocal
 from src.core.llm import get_llm
-from src.utils.embedding import find_similar_messages
+from src.utils.find_cache import lookup_answer, store_answer
+from src.utils.identity import resolve_channel_id, resolve_guild_id
+from src.utils.search import search_messages
 
 llm = get_llm()
 
+# "/find 3d query" only searches the messages of the last three days
+WINDOW_PATTERN = re.compile(r"^(\d+)([hdw])\s+")
+WINDOW_UNITS = {"h": "hours", "d": "days", "w": "weeks"}
+
 
 class SearchResult(BaseModel):
     summary: str
@@ -18,7 +28,45 @@ async def find(ctx: Context, *, query: str):
     """Search command that responds with the search query."""
     logger.info(f"Search command invoked with query: {query}")
 
-    similar_messages = await find_similar_messages(query)
+    if not ctx.guild:
+        await ctx.send("❌ /find only searches the messages of a server.")
+        return
+
+    # "/find #channel query" limits the search to that channel
+    scope_channel = None
+    if ctx.message.channel_mentions:
+        scope_channel = ctx.message.channel_mentions[0]
+        query = query.replace(scope_channel.mention, "").strip()
+
+    since = None
+    if match := WINDOW_PATTERN.match(query):
+        amount, unit = match.groups()
+        since = datetime.now(UTC) - timedelta(**{WINDOW_UNITS[unit]: int(amount)})
+        query = query[match.end() :]
+
+    async with AsyncSessionLocal() as session:
+        guild_id = await resolve_guild_id(session, str(ctx.guild.id))
+        channel_id = (
+            await resolve_channel_id(session, str(scope_channel.id))
+            if scope_channel
+            else None
+        )
+    if guild_id is None or (scope_channel and channel_id is None):
+        await ctx.send("I don't know")
+        return
+
+    # Answers over a window relative to now aren't reusable later
+    query_embedding = None
+    if since is None:
+        cached = await lookup_answer(guild_id, query, channel_id)
+        if cached.summary is not None:
+            await ctx.send(cached.summary)
+            return
+        query_embedding = cached.query_embedding
+
+    similar_messages = await search_messages(
+        query, guild_id, channel_id, query_embedding=query_embedding, since=since
+    )
     similar_messages_txt = [msg.content for msg in similar_messages]
 
     structured_llm = llm.with_structured_output(SearchResult)
@@ -37,3 +85,12 @@ async def find(ctx: Context, *, query: str):
     )
 
     await ctx.send(response.summary)  # type: ignore
+
+    if query_embedding is not None:
+        await store_answer(
+            guild_id,
+            query,
+            query_embedding,
+            response.summary,  # type: ignore
+            channel_id=channel_id,
+        )
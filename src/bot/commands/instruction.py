@@ -5,6 +5,8 @@ from src.bot.bot import bot
 from src.core import logger
 from src.core.database import AsyncSessionLocal
 from src.models import Agent, Channel
+from src.utils.identity import resolve_channel_id
+from src.utils.instruction import announce_instruction_change, instruction_cache
 
 
 @bot.command()
@@ -22,13 +24,15 @@ async def instruction(ctx: Context, *, prompt: str):
             logger.error("Error sending DM to guild owner: {}", e)
         return
 
+    cache_key = (str(ctx.guild.id), str(ctx.channel.id))
+
     # Get channel from database
     async with AsyncSessionLocal() as session:
         try:
-            result = await session.execute(
-                select(Channel).where(Channel.discord_channel_id == str(ctx.channel.id))
+            db_channel_id = await resolve_channel_id(session, str(ctx.channel.id))
+            db_channel = (
+                await session.get(Channel, db_channel_id) if db_channel_id else None
             )
-            db_channel = result.scalar_one_or_none()
 
             if not db_channel:
                 await ctx.send(
@@ -45,7 +49,9 @@ async def instruction(ctx: Context, *, prompt: str):
 
                 if db_agent:
                     db_agent.instruction = prompt
+                    await announce_instruction_change(session, *cache_key)
                     await session.commit()
+                    instruction_cache.invalidate(*cache_key)
                     await session.refresh(db_agent)
 
                     try:
@@ -70,7 +76,9 @@ async def instruction(ctx: Context, *, prompt: str):
                         "❌ Error: Agent reference is invalid. Creating new agent..."
                     )
                     db_channel.agent_id = None
+                    await announce_instruction_change(session, *cache_key)
                     await session.commit()
+                    instruction_cache.invalidate(*cache_key)
             else:
                 db_agent = Agent(
                     instruction=prompt,
@@ -83,7 +91,9 @@ async def instruction(ctx: Context, *, prompt: str):
 
                 # Update channel with new agent
                 db_channel.agent_id = db_agent.id
+                await announce_instruction_change(session, *cache_key)
                 await session.commit()
+                instruction_cache.invalidate(*cache_key)
                 await session.refresh(db_channel)
                 await session.refresh(db_agent)
 
@@ -0,0 +1,25 @@
+from discord.ext.commands import Context
+
+from src.bot.bot import bot
+from src.core import logger
+from src.utils.embedding import requeue_dead_letters
+
+
+@bot.command()
+async def requeue(ctx: Context):
+    """Operator command that re-queues dead-lettered messages for embedding."""
+    if not await bot.is_owner(ctx.author):
+        await ctx.send(
+            f"{ctx.author.mention}, you are not authorized to use this command 😒."
+        )
+        return
+
+    try:
+        requeued = await requeue_dead_letters()
+    except Exception as e:
+        logger.exception(f"Error re-queuing dead-lettered embeddings: {e}")
+        await ctx.send("❌ An error occurred while re-queuing. Please try again.")
+        return
+
+    logger.info(f"Re-queued {requeued} dead-lettered messages for embedding")
+    await ctx.send(f"✅ Re-queued {requeued} dead-lettered messages for embedding.")
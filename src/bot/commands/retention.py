@@ -0,0 +1,58 @@
+from discord.ext.commands import Context
+
+from src.bot.bot import bot
+from src.core import logger
+from src.core.config import settings
+from src.core.database import AsyncSessionLocal
+from src.models import Guild
+from src.utils.identity import resolve_guild_id
+
+
+def _describe(days: int | None) -> str:
+    return f"{days} days" if days is not None else "forever"
+
+
+@bot.command()
+async def retention(ctx: Context, days: str | None = None):
+    """Owner command that shows or sets how long this server's messages are kept."""
+    if not ctx.guild:
+        await ctx.send("❌ Retention can only be set for a server.")
+        return
+    if ctx.author != ctx.guild.owner:
+        await ctx.send(
+            f"{ctx.author.mention}, you are not authorized to use this command 😒."
+        )
+        return
+
+    if days is not None and days != "default" and not (days.isdigit() and int(days)):
+        await ctx.send("❌ Usage: `/retention [<days>|default]`")
+        return
+
+    async with AsyncSessionLocal() as session:
+        try:
+            guild_id = await resolve_guild_id(session, str(ctx.guild.id))
+            db_guild = await session.get(Guild, guild_id) if guild_id else None
+            if not db_guild:
+                await ctx.send(
+                    "❌ Server not found in database. Please make sure the bot has joined this server properly."
+                )
+                return
+
+            if days is not None:
+                db_guild.retention_days = None if days == "default" else int(days)
+                await session.commit()
+                logger.info(f"Set message retention of guild {ctx.guild.id} to {days}")
+        except Exception as e:
+            await session.rollback()
+            logger.exception(f"Error managing retention for guild {ctx.guild.id}: {e}")
+            await ctx.send(
+                "❌ An error occurred while saving the retention. Please try again."
+            )
+            return
+
+    effective = (
+        db_guild.retention_days
+        if db_guild.retention_days is not None
+        else settings.MESSAGE_RETENTION_DAYS
+    )
+    await ctx.send(f"🗄️ Messages of this server are kept {_describe(effective)}.")
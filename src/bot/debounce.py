@@ -0,0 +1,105 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+from discord import Message as DiscordMessageContext
+
+from src.core.config import settings
+from src.core.logging import logger
+from src.core.metrics import metrics
+
+Dispatch = Callable[[DiscordMessageContext, str], Awaitable[None]]
+
+
+@dataclass
+class _Burst:
+    started_at: float
+    message: DiscordMessageContext
+    parts: list[str] = field(default_factory=list)
+    timer: asyncio.TimerHandle | None = None
+
+
+class MentionDebouncer:
+    """Merges a burst of messages from one user in one channel into one request.
+
+    A mention opens a window of ``window`` seconds; further mentions and
+    plain follow-up lines from the same user in that channel are appended
+    and restart the window, up to ``max_delay`` seconds after the first
+    mention. When the window closes the merged text is dispatched once,
+    with the latest message as the context to reply to.
+    """
+
+    def __init__(
+        self,
+        dispatch: Dispatch,
+        window: float = settings.MENTION_DEBOUNCE_SECONDS,
+        max_delay: float = settings.MENTION_DEBOUNCE_MAX_SECONDS,
+    ):
+        self.dispatch = dispatch
+        self.window = window
+        self.max_delay = max_delay
+        self._bursts: dict[tuple[int, int], _Burst] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    @staticmethod
+    def _key(message: DiscordMessageContext) -> tuple[int, int]:
+        return message.channel.id, message.author.id
+
+    async def add_mention(self, message: DiscordMessageContext, text: str) -> None:
+        if self.window <= 0:
+            await self.dispatch(message, text)
+            return
+
+        loop = asyncio.get_running_loop()
+        burst = self._bursts.get(self._key(message))
+        if burst is None:
+            burst = self._bursts[self._key(message)] = _Burst(loop.time(), message)
+        self._append(burst, message, text)
+
+    def add_follow_up(self, message: DiscordMessageContext, text: str) -> bool:
+        """Append a message without a mention to an open burst, if there is one."""
+        burst = self._bursts.get(self._key(message))
+        if burst is None:
+            return False
+        self._append(burst, message, text)
+        return True
+
+    def _append(self, burst: _Burst, message: DiscordMessageContext, text: str):
+        if burst.parts:
+            metrics.increment("mentions_coalesced")
+        burst.parts.append(text)
+        burst.message = message
+
+        loop = asyncio.get_running_loop()
+        if burst.timer is not None:
+            burst.timer.cancel()
+        delay = min(self.window, burst.started_at + self.max_delay - loop.time())
+        burst.timer = loop.call_later(max(delay, 0), self._close, self._key(message))
+
+    def _close(self, key: tuple[int, int]) -> None:
+        burst = self._bursts.pop(key)
+        task = asyncio.create_task(self._dispatch(burst))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, burst: _Burst) -> None:
+        try:
+            await self.dispatch(burst.message, "\n".join(burst.parts))
+        except Exception as e:
+            logger.exception(f"Error dispatching merged mentions: {e}")
+
+    async def stop(self) -> None:
+        """Drop the open bursts and wait for the dispatches already started.
+
+        Bursts are dropped rather than flushed: the bot is closed by the
+        time this runs, so their replies could not be sent anyway.
+        """
+        for burst in self._bursts.values():
+            if burst.timer is not None:
+                burst.timer.cancel()
+        if self._bursts:
+            logger.warning(
+                f"Dropping {len(self._bursts)} unanswered mention burst(s) on shutdown"
+            )
+        self._bursts.clear()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -1,10 +1,9 @@
 from discord import ChannelType
-from sqlalchemy import select
 
 from src.bot.bot import bot
 from src.core.database import AsyncSessionLocal
 from src.core.logging import logger
-from src.models import Channel, Guild
+from src.utils.identity import resolve_channels, resolve_guilds
 
 
 @bot.event
@@ -19,43 +18,20 @@ async def on_guild_join(guild):
     # Save guild and text channels to database
     async with AsyncSessionLocal() as session:
         try:
-            result = await session.execute(
-                select(Guild).where(Guild.discord_guild_id == str(guild.id))
-            )
-            existing_guild = result.scalar_one_or_none()
-
-            if existing_guild:
-                logger.info(f"Guild {guild.name} already exists in database")
-                db_guild = existing_guild
-            else:
-                db_guild = Guild(discord_guild_id=str(guild.id), name=guild.name)
-                session.add(db_guild)
-                await session.commit()
-                await session.refresh(db_guild)
-                logger.info(f"Created guild {guild.name} in database")
+            guild_ids = await resolve_guilds(session, {str(guild.id): guild.name})
+            guild_id = guild_ids[str(guild.id)]
 
             text_channels = [c for c in guild.channels if c.type == ChannelType.text]
-            for channel in text_channels:
-                result = await session.execute(
-                    select(Channel).where(Channel.discord_channel_id == str(channel.id))
+            if text_channels:
+                await resolve_channels(
+                    session,
+                    {str(c.id): (c.name, guild_id) for c in text_channels},
                 )
-                existing_channel = result.scalar_one_or_none()
-
-                if existing_channel:
-                    logger.info(f"Channel {channel.name} already exists in database")
-                    continue
-
-                # Create channel
-                db_channel = Channel(
-                    discord_channel_id=str(channel.id),
-                    name=channel.name,
-                    guild_id=db_guild.id,
-                )
-                session.add(db_channel)
-                logger.info(f"Created channel {channel.name} in database")
 
             await session.commit()
-            logger.info("Successfully saved guild and text channels to database")
+            logger.info(
+                f"Saved guild {guild.name} and {len(text_channels)} text channels to database"
+            )
 
         except Exception as e:
             await session.rollback()
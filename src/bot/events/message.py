@@ -1,13 +1,23 @@
-from discord import Message as DiscordMessageContext
+import uuid
+
+from discord import (
+    Message as DiscordMessageContext,
+    RawMessageDeleteEvent,
+    RawMessageUpdateEvent,
+)
 from discord.channel import DMChannel
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
 
 from src.agent.factory import create_agent
 from src.bot.bot import bot
-from src.core.database import AsyncSessionLocal
+from src.bot.debounce import MentionDebouncer
+from src.bot.scheduler import agent_scheduler
 from src.core.logging import logger
-from src.models import Channel, Guild, Message, User
+from src.utils.embedding import content_hash
+from src.utils.ingestion import PendingMessage, ingestion_buffer
+from src.utils.instruction import get_admin_instruction
+from src.utils.recent_messages import recent_messages
+
+BUSY_NOTICE = "I'm handling a lot of requests right now, please try again in a moment."
 
 
 @bot.event
@@ -17,6 +27,9 @@ async def on_message(message: DiscordMessageContext):
             await bot.process_commands(message)
             return
 
+        # Every message with text, the bot's own replies included
+        recent_messages.add(message)
+
         # Only respond when the bot is mentioned
         if bot.user.mentioned_in(message):
             content_without_mention = message.content.replace(
@@ -28,21 +41,15 @@ async def on_message(message: DiscordMessageContext):
                 return
 
             await save_message_to_db(message)
-
-            agent = create_agent(message_ctx=message)
-            response = await agent.ainvoke(
-                user_request=content_without_mention,
-                user_id=str(message.author.id) if message.author else None,
-                instruction=await get_admin_instruction(
-                    str(message.guild.id), channel_id=str(message.channel.id)
-                ),
-            )
-            logger.debug(f"response: {response}")
+            await mention_debouncer.add_mention(message, content_without_mention)
 
             await bot.process_commands(message)
             return
 
         await save_message_to_db(message)
+        if not message.content.startswith(bot.command_prefix):
+            # Follow-up lines of a mention that is still being debounced
+            mention_debouncer.add_follow_up(message, message.content.strip())
         await bot.process_commands(message)
     except Exception as e:
         logger.exception(f"Error handling message: {e}")
@@ -55,104 +62,71 @@ async def on_message(message: DiscordMessageContext):
             logger.exception(f"Error sending error message: {send_error}")
 
 
-async def get_admin_instruction(guild_id: str, channel_id: str) -> str:
-    if not guild_id and not channel_id:
-        return ""
-    async with AsyncSessionLocal() as session:
-        try:
-            result = await session.execute(
-                select(Channel)
-                .where(
-                    Channel.discord_channel_id == channel_id,
-                    Channel.guild.has(Guild.discord_guild_id == guild_id),
-                )
-                .options(selectinload(Channel.agent))
-            )
-            db_channel = result.scalar_one_or_none()
+@bot.event
+async def on_raw_message_edit(payload: RawMessageUpdateEvent):
+    # Raw, so edits of messages missing from discord.py's cache arrive too
+    content = payload.data.get("content")
+    if content is not None:
+        recent_messages.update(payload.message_id, content)
 
-            if db_channel and db_channel.agent and db_channel.agent.instruction:
-                return db_channel.agent.instruction or ""
-        except Exception as e:
-            logger.exception(
-                f"Error retrieving admin instruction for guild {guild_id}: {e}"
-            )
-    return ""
 
+@bot.event
+async def on_raw_message_delete(payload: RawMessageDeleteEvent):
+    recent_messages.remove(payload.message_id)
 
-async def save_message_to_db(message: DiscordMessageContext):
-    # Save message to database
-    async with AsyncSessionLocal() as session:
-        try:
-            result = await session.execute(
-                select(User).where(User.discord_user_id == str(message.author.id))
-            )
-            db_user = result.scalar_one_or_none()
-
-            if not db_user:
-                db_user = User(
-                    discord_user_id=str(message.author.id), username=message.author.name
-                )
-                session.add(db_user)
-                await session.commit()
-                await session.refresh(db_user)
-                logger.info(f"Created user {message.author.name} in database")
-
-            # Skip DM messages - they don't belong to a guild
-            if isinstance(message.channel, DMChannel):
-                await bot.process_commands(message)
-                return
 
-            # Get or create guild
-            result = await session.execute(
-                select(Guild).where(Guild.discord_guild_id == str(message.guild.id))
-            )
-            db_guild = result.scalar_one_or_none()
-
-            if not db_guild:
-                db_guild = Guild(
-                    discord_guild_id=str(message.guild.id), name=message.guild.name
-                )
-                session.add(db_guild)
-                await session.commit()
-                await session.refresh(db_guild)
-                logger.info(f"Created guild {message.guild.name} in database")
-
-            # Get or create channel
-            result = await session.execute(
-                select(Channel).where(
-                    Channel.discord_channel_id == str(message.channel.id)
-                )
-            )
-            db_channel = result.scalar_one_or_none()
-
-            if not db_channel:
-                db_channel = Channel(
-                    discord_channel_id=str(message.channel.id),
-                    name=message.channel.name,
-                    guild_id=db_guild.id,
-                )
-                session.add(db_channel)
-                await session.commit()
-                await session.refresh(db_channel)
-                logger.info(f"Created channel {message.channel.name} in database")
-
-            # Save message
-            db_message = Message(
-                discord_message_id=str(message.id),
-                discord_user_id=str(message.author.id),
-                content=message.content,
-                channel_id=db_channel.id,
-                user_id=db_user.id,
-                embedding=None,
-            )
-            session.add(db_message)
-            await session.commit()
-            await session.refresh(db_message)
+async def schedule_agent_run(message: DiscordMessageContext, user_request: str):
+    accepted = agent_scheduler.submit(
+        guild_id=str(message.guild.id) if message.guild else None,
+        channel_id=str(message.channel.id),
+        run=lambda: run_agent(message, user_request),
+    )
+    if not accepted:
+        await message.channel.send(BUSY_NOTICE)
+
+
+mention_debouncer = MentionDebouncer(dispatch=schedule_agent_run)
 
-            logger.info(
-                f"Saved message from {message.author.name} in channel {message.channel.name}"
+
+async def run_agent(message: DiscordMessageContext, user_request: str):
+    try:
+        agent = create_agent()
+        response = await agent.ainvoke(
+            user_request=user_request,
+            user_id=str(message.author.id) if message.author else None,
+            message_ctx=message,
+            instruction=await get_admin_instruction(
+                str(message.guild.id) if message.guild else "",
+                channel_id=str(message.channel.id),
+            ),
+        )
+        logger.debug(f"response: {response}")
+    except Exception as e:
+        logger.exception(f"Error running agent: {e}")
+        try:
+            await message.channel.send(
+                "Sorry, an error occurred while processing your message."
             )
+        except Exception as send_error:
+            logger.exception(f"Error sending error message: {send_error}")
+
 
-        except Exception as e:
-            await session.rollback()
-            logger.exception(f"Error saving message to database: {e}")
+async def save_message_to_db(message: DiscordMessageContext):
+    # Hand the message to the write-behind buffer; it is written with others
+    # in a single transaction a few milliseconds from now
+    is_dm = isinstance(message.channel, DMChannel)
+    await ingestion_buffer.submit(
+        PendingMessage(
+            id=uuid.uuid4(),
+            discord_message_id=str(message.id),
+            discord_user_id=str(message.author.id),
+            username=message.author.name,
+            discord_guild_id=None if is_dm else str(message.guild.id),
+            guild_name=None if is_dm else message.guild.name,
+            discord_channel_id=None if is_dm else str(message.channel.id),
+            channel_name=None if is_dm else message.channel.name,
+            content=message.content,
+            content_hash=content_hash(message.content),
+            created_at=message.created_at,
+        )
+    )
@@ -0,0 +1,143 @@
+import asyncio
+from collections import deque
+from collections.abc import Awaitable, Callable
+import time
+from typing import NamedTuple
+
+from src.core.config import settings
+from src.core.logging import logger
+from src.core.metrics import metrics
+
+AgentRun = Callable[[], Awaitable[None]]
+
+
+class _Job(NamedTuple):
+    guild_id: str
+    channel_id: str
+    run: AgentRun
+    enqueued_at: float
+
+
+class AgentScheduler:
+    """Runs agent invocations under a global concurrency limit.
+
+    Each channel has a FIFO queue and at most one run in flight, so replies
+    in a channel come out in the order they were asked for. Free slots are
+    handed out round-robin across guilds, then across the channels of a
+    guild, so one busy guild can't starve the others. ``submit`` refuses new
+    runs once the channel's queue or the total backlog is full.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = settings.AGENT_MAX_CONCURRENCY,
+        max_queued_per_channel: int = settings.AGENT_MAX_QUEUED_PER_CHANNEL,
+        max_queued: int = settings.AGENT_MAX_QUEUED,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queued_per_channel = max_queued_per_channel
+        self.max_queued = max_queued
+        self._queues: dict[str, deque[_Job]] = {}
+        # Guilds with queued runs in turn order, each with its channels
+        self._guilds: deque[str] = deque()
+        self._guild_channels: dict[str, deque[str]] = {}
+        self._busy_channels: set[str] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._queued = 0
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    @property
+    def active(self) -> int:
+        return len(self._tasks)
+
+    def submit(self, guild_id: str | None, channel_id: str, run: AgentRun) -> bool:
+        """Queue ``run``; returns False if the queues are full and it was dropped."""
+        guild_id = guild_id or "dm"
+        queue = self._queues.get(channel_id)
+        if self._queued >= self.max_queued or (
+            queue is not None and len(queue) >= self.max_queued_per_channel
+        ):
+            metrics.increment("agent_runs_rejected")
+            return False
+
+        if queue is None:
+            queue = self._queues[channel_id] = deque()
+            channels = self._guild_channels.get(guild_id)
+            if channels is None:
+                channels = self._guild_channels[guild_id] = deque()
+                self._guilds.append(guild_id)
+            channels.append(channel_id)
+
+        queue.append(_Job(guild_id, channel_id, run, time.monotonic()))
+        self._queued += 1
+        self._dispatch()
+        return True
+
+    def _next_job(self) -> _Job | None:
+        for _ in range(len(self._guilds)):
+            guild_id = self._guilds[0]
+            self._guilds.rotate(-1)
+
+            channels = self._guild_channels[guild_id]
+            for _ in range(len(channels)):
+                channel_id = channels[0]
+                channels.rotate(-1)
+                if channel_id in self._busy_channels:
+                    continue
+
+                queue = self._queues[channel_id]
+                job = queue.popleft()
+                if not queue:
+                    del self._queues[channel_id]
+                    channels.remove(channel_id)
+                    if not channels:
+                        del self._guild_channels[guild_id]
+                        self._guilds.remove(guild_id)
+                return job
+        return None
+
+    def _dispatch(self) -> None:
+        while len(self._tasks) < self.max_concurrency:
+            job = self._next_job()
+            if job is None:
+                break
+
+            self._queued -= 1
+            self._busy_channels.add(job.channel_id)
+            wait = time.monotonic() - job.enqueued_at
+            metrics.increment("agent_runs_started")
+            metrics.increment("agent_queue_wait_seconds_total", wait)
+            metrics.set_gauge("agent_queue_wait_seconds_last", wait)
+
+            task = asyncio.create_task(self._run(job))
+            self._tasks.add(task)
+
+        metrics.set_gauge("agent_queue_depth", self._queued)
+        metrics.set_gauge("agent_runs_active", len(self._tasks))
+
+    async def _run(self, job: _Job) -> None:
+        try:
+            await job.run()
+        except Exception as e:
+            logger.exception(f"Error in agent run for channel {job.channel_id}: {e}")
+        finally:
+            self._tasks.discard(asyncio.current_task())
+            self._busy_channels.discard(job.channel_id)
+            self._dispatch()
+
+    async def stop(self) -> None:
+        """Drop queued runs and cancel the ones in flight."""
+        self._queues.clear()
+        self._guilds.clear()
+        self._guild_channels.clear()
+        self._queued = 0
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+agent_scheduler = AgentScheduler()
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -14,6 +16,78 @@ class Settings(BaseSettings):
     LANGSMITH_PROJECT: str = "discord-agentic-bot"
     GOOGLE_CLIENT_SECRET: str
 
+    EMBEDDING_MAX_BATCH_SIZE: int = 100
+    EMBEDDING_MIN_BATCH_SIZE: int = 8
+    EMBEDDING_CONCURRENCY: int = 4
+    EMBEDDING_WORKERS: int = 1
+    EMBEDDING_LEASE_SECONDS: int = 120
+    EMBEDDING_COALESCE_SECONDS: float = 0.05
+    EMBEDDING_SAFETY_SCAN_SECONDS: float = 60
+    EMBEDDING_MAX_ATTEMPTS: int = 5
+    EMBEDDING_RETRY_BASE_SECONDS: float = 30
+    EMBEDDING_RETRY_MAX_SECONDS: float = 3600
+
+    INGEST_MAX_BATCH_SIZE: int = 500
+    INGEST_FLUSH_SECONDS: float = 0.02
+    INGEST_MAX_PENDING: int = 10_000
+
+    IDENTITY_CACHE_SIZE: int = 100_000
+    IDENTITY_CACHE_TTL_SECONDS: float = 3600
+    INSTRUCTION_CACHE_SIZE: int = 10_000
+    INSTRUCTION_CACHE_TTL_SECONDS: float = 24 * 3600
+
+    SEARCH_EXACT_MAX_ROWS: int = 10_000
+    SEARCH_ITERATIVE_SCAN: bool = True
+    SEARCH_SCOPE_CACHE_TTL_SECONDS: float = 3600
+    SEARCH_HYBRID_CANDIDATES: int = 20
+    HOT_TIER_SIZE: int = 2_000
+    HOT_TIER_GUILDS: int = 100
+    HOT_TIER_TTL_SECONDS: float = 3600
+
+    MESSAGE_PARTITIONS_AHEAD: int = 3
+    MESSAGE_RETENTION_DAYS: int | None = None
+    MESSAGE_ARCHIVE_SCHEMA: str | None = None
+    MESSAGE_PURGE_BATCH_SIZE: int = 5000
+    MESSAGE_PARTITION_CHECK_SECONDS: float = 3600
+
+    VECTOR_INDEX_METHOD: Literal["auto", "ivfflat", "hnsw"] = "auto"
+    VECTOR_INDEX_MIN_ROWS: int = 10_000
+    VECTOR_INDEX_HNSW_MIN_ROWS: int = 1_000_000
+    VECTOR_INDEX_HNSW_M: int = 16
+    VECTOR_INDEX_HNSW_EF_CONSTRUCTION: int = 64
+    VECTOR_INDEX_EF_SEARCH: int = 100
+    VECTOR_INDEX_QUANTIZATION: Literal["none", "halfvec", "binary"] = "none"
+    SEARCH_RERANK_FACTOR: int = 5
+    VECTOR_INDEX_MAINTENANCE_WORK_MEM: str = "1GB"
+    VECTOR_INDEX_CHECK_SECONDS: float = 3600
+
+    FIND_CACHE_TTL_SECONDS: float = 3600
+    FIND_CACHE_MAX_DISTANCE: float = 0.05
+    FIND_CACHE_MAX_NEW_MESSAGES: int = 50
+
+    AGENT_SPECULATIVE_EXECUTION: bool = True
+    AGENT_STREAM_REPLIES: bool = True
+    REPLY_EDIT_INTERVAL_SECONDS: float = 1.0
+    AGENT_CHECKPOINTER: Literal["memory", "postgres"] = "memory"
+    AGENT_MAX_THREADS: int = 10_000
+    AGENT_MAX_CHECKPOINT_BYTES: int = 256 * 1024 * 1024
+    AGENT_THREAD_TTL_SECONDS: float = 7 * 24 * 3600
+    AGENT_CHECKPOINT_PRUNE_SECONDS: float = 600
+    AGENT_CONTEXT_KEEP_TURNS: int = 6
+    AGENT_CONTEXT_MAX_TURNS: int = 12
+    AGENT_CONTEXT_TOKEN_BUDGET: int = 6000
+    AGENT_MAX_CONCURRENCY: int = 8
+    AGENT_MAX_QUEUED_PER_CHANNEL: int = 5
+    AGENT_MAX_QUEUED: int = 200
+    MENTION_DEBOUNCE_SECONDS: float = 0.3
+    MENTION_DEBOUNCE_MAX_SECONDS: float = 2
+    RECENT_MESSAGES_PER_CHANNEL: int = 50
+    RECENT_MESSAGES_CHANNELS: int = 1_000
+    RECENT_MESSAGES_MAX_CHARS: int = 500
+
+    MODERATION_CACHE_SIZE: int = 10_000
+    MODERATION_CACHE_TTL_SECONDS: float = 3600
+
     model_config = SettingsConfigDict(env_file="./.env")
 
 
@@ -1,4 +1,5 @@
 from sqlalchemy import MetaData
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 
@@ -12,6 +13,12 @@ engine = create_async_engine(SQLALCHEMY_DATABASE_URL)
 AsyncSessionLocal = async_sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
 
+def libpq_dsn() -> str:
+    """``DATABASE_URL`` as a plain libpq URL for direct psycopg connections."""
+    url = make_url(settings.DATABASE_URL).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
 convention = {
     "ix": "ix_%(column_0_label)s",
     "uq": "uq_%(table_name)s_%(column_0_name)s",
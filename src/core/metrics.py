@@ -0,0 +1,24 @@
+from collections import defaultdict
+
+
+class Metrics:
+    """Process-local counters and gauges, exposed on the ``/metrics`` endpoint."""
+
+    def __init__(self):
+        self._counters: defaultdict[str, float] = defaultdict(float)
+        self._gauges: dict[str, float] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        self._gauges[name] = value
+
+    def get(self, name: str) -> float:
+        return self._gauges.get(name, self._counters.get(name, 0))
+
+    def snapshot(self) -> dict[str, float]:
+        return {**self._counters, **self._gauges}
+
+
+metrics = Metrics()
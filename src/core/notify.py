@@ -0,0 +1,87 @@
+import asyncio
+from collections import defaultdict
+from collections.abc import Callable
+import uuid
+
+import psycopg
+from psycopg import sql
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.database import libpq_dsn
+from src.core.logging import logger
+
+# Identifies this process so it can ignore the notifications it sent itself
+INSTANCE_ID = uuid.uuid4().hex
+
+RECONNECT_DELAY_SECONDS = 5
+
+
+async def notify(session: AsyncSession, channel: str, payload: str) -> None:
+    """Queue a NOTIFY on ``channel``; Postgres delivers it when ``session`` commits."""
+    await session.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": channel, "payload": f"{INSTANCE_ID}|{payload}"},
+    )
+
+
+class PgListener:
+    """Dispatches Postgres notifications to local handlers.
+
+    Notifications sent through ``notify`` by this process are skipped, since
+    the sender has already applied the change locally.
+
+    Handlers are plain callables taking the payload string and must not block.
+    They should be subscribed before ``run`` starts. Notifications sent while
+    the listener is disconnected are lost, so ``on_connect`` callbacks run
+    after every (re)connect to let subscribers resynchronise.
+    """
+
+    def __init__(self):
+        self._handlers: defaultdict[str, list[Callable[[str], None]]] = defaultdict(
+            list
+        )
+        self._connect_callbacks: list[Callable[[], None]] = []
+
+    def subscribe(self, channel: str, handler: Callable[[str], None]) -> None:
+        self._handlers[channel].append(handler)
+
+    def on_connect(self, callback: Callable[[], None]) -> None:
+        self._connect_callbacks.append(callback)
+
+    def _dispatch(self, channel: str, raw_payload: str) -> None:
+        origin, _, payload = raw_payload.partition("|")
+        if origin == INSTANCE_ID:
+            return
+
+        for handler in self._handlers.get(channel, []):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.exception(f"Error handling notification on {channel}: {e}")
+
+    async def run(self) -> None:
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    libpq_dsn(), autocommit=True
+                ) as conn:
+                    for channel in self._handlers:
+                        await conn.execute(
+                            sql.SQL("LISTEN {}").format(sql.Identifier(channel))
+                        )
+                    logger.info(f"Listening on {', '.join(self._handlers)}")
+
+                    for callback in self._connect_callbacks:
+                        callback()
+
+                    async for notification in conn.notifies():
+                        self._dispatch(notification.channel, notification.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification listener disconnected: {e}")
+                await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+
+pg_listener = PgListener()
@@ -3,10 +3,18 @@ import asyncio
 from fastapi import FastAPI
 from fastapi.concurrency import asynccontextmanager
 
+from src.agent.checkpoint import close_checkpointer, run_checkpoint_pruner
 from src.bot import bot, commands, events  # noqa: F401
+from src.bot.events.message import mention_debouncer
+from src.bot.scheduler import agent_scheduler
 from src.core.config import settings
 from src.core.logging import logger
+from src.core.metrics import metrics
+from src.core.notify import pg_listener
 from src.utils.embedding import generate_embeddings
+from src.utils.ingestion import ingestion_buffer
+from src.utils.partitions import run_partition_maintenance
+from src.utils.vector_index import run_vector_index_manager
 
 
 @asynccontextmanager
@@ -15,16 +23,35 @@ async def lifespan(app: FastAPI):
     if token:
         # Start the bot in the background without awaiting
         logger.info("Starting Discord bot...")
+        ingestion_buffer.start()
         bot_task = asyncio.create_task(bot.start(token))
 
-        global embedding_task
-        embedding_task = asyncio.create_task(generate_embeddings(batch_size=50))
+        global embedding_task, listener_task, pruner_task, index_task
+        global partition_task
+        embedding_task = asyncio.create_task(generate_embeddings())
+        listener_task = asyncio.create_task(pg_listener.run())
+        pruner_task = asyncio.create_task(run_checkpoint_pruner())
+        index_task = asyncio.create_task(run_vector_index_manager())
+        partition_task = asyncio.create_task(run_partition_maintenance())
     else:
         logger.error("DISCORD_BOT_TOKEN not found")
 
     yield
 
     # Clean up on shutdown
+    if "bot_task" in locals() and not bot_task.done():
+        await bot.close()
+        bot_task.cancel()
+        try:
+            await bot_task
+        except asyncio.CancelledError:
+            pass
+
+    # No more messages arrive once the bot is closed; write out what's buffered
+    await mention_debouncer.stop()
+    await agent_scheduler.stop()
+    await ingestion_buffer.stop()
+
     if embedding_task:
         embedding_task.cancel()
         try:
@@ -32,14 +59,36 @@ async def lifespan(app: FastAPI):
         except asyncio.CancelledError:
             pass
 
-    if "bot_task" in locals() and not bot_task.done():
-        await bot.close()
-        bot_task.cancel()
+    if listener_task:
+        listener_task.cancel()
         try:
-            await bot_task
+            await listener_task
+        except asyncio.CancelledError:
+            pass
+
+    if pruner_task:
+        pruner_task.cancel()
+        try:
+            await pruner_task
+        except asyncio.CancelledError:
+            pass
+
+    if partition_task:
+        partition_task.cancel()
+        try:
+            await partition_task
         except asyncio.CancelledError:
             pass
 
+    if index_task:
+        index_task.cancel()
+        try:
+            await index_task
+        except asyncio.CancelledError:
+            pass
+
+    await close_checkpointer()
+
 
 app = FastAPI(
     title="Discord Agentic Bot",
@@ -53,3 +102,8 @@ app = FastAPI(
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
@@ -2,14 +2,19 @@ import uuid
 
 from pgvector.sqlalchemy import Vector
 from sqlalchemy import (
+    Computed,
     DateTime,
     ForeignKey,
     Index,
+    Integer,
+    PrimaryKeyConstraint,
     String,
     Text,
+    UniqueConstraint,
     func,
+    text,
 )
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .core.database import Base
@@ -19,7 +24,7 @@ class SharedModel(Base):
     __abstract__ = True
 
     id: Mapped[UUID] = mapped_column(
-        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
     )
     created_at: Mapped[DateTime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
@@ -44,15 +49,49 @@ class User(SharedModel):
 class Message(SharedModel):
     __tablename__ = "messages"
 
+    # Partition key, so part of the primary key and of every unique constraint.
+    # Ingestion sets it to the Discord message's timestamp.
+    created_at: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), primary_key=True
+    )
     discord_message_id: Mapped[str] = mapped_column(String, nullable=False)
     discord_user_id: Mapped[str] = mapped_column(String, nullable=False)
     content: Mapped[str] = mapped_column(Text, nullable=False)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True)
+    # 'simple' keeps words as written: no stemming, no stop words, so error
+    # codes, names and version strings match exactly
+    content_tsv: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed("to_tsvector('simple', content)", persisted=True),
+        nullable=True,
+        deferred=True,
+    )
     embedding: Mapped[Vector] = mapped_column(Vector(768), nullable=True, unique=False)
+    embedding_leased_until: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    embedding_lease_owner: Mapped[str] = mapped_column(String, nullable=True)
+    embedding_attempts: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    embedding_last_error: Mapped[str] = mapped_column(Text, nullable=True)
+    embedding_next_attempt_at: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    embedding_dead_lettered_at: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
     channel_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
         ForeignKey("channels.id", ondelete="CASCADE"),
         nullable=False,
     )
+    # Denormalized from the channel so searches can filter on it directly
+    guild_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("guilds.id", ondelete="CASCADE"),
+        nullable=False,
+    )
     user_id: Mapped[UUID] = mapped_column(
         UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
@@ -60,29 +99,62 @@ class Message(SharedModel):
     user: Mapped["User"] = relationship(back_populates="messages")
     channel: Mapped["Channel"] = relationship(back_populates="messages")
 
+    # Range-partitioned by month; src.utils.partitions creates the partitions
+    # and src.utils.vector_index the vector index on each of them
     __table_args__ = (
+        # id first, so lookups by id alone can still use the index
+        PrimaryKeyConstraint("id", "created_at"),
+        UniqueConstraint("discord_message_id", "created_at"),
+        Index("ix_messages_channel_id_created_at", "channel_id", "created_at"),
+        Index("ix_messages_guild_id_created_at", "guild_id", "created_at"),
+        Index("ix_messages_content_tsv", "content_tsv", postgresql_using="gin"),
         Index(
-            "ix_messages_embedding_vector_cosine",
-            embedding,
-            postgresql_using="ivfflat",
-            postgresql_with={"lists": 100},
-            postgresql_ops={"embedding_vector": "vector_cosine_ops"},
-        ),
-        Index(
-            "ix_messages_embedding_vector_l2",
-            embedding,
-            postgresql_using="ivfflat",
-            postgresql_with={"lists": 100},
-            postgresql_ops={"embedding_vector": "vector_l2_ops"},
+            "ix_messages_embedding_pending",
+            "created_at",
+            postgresql_where=text(
+                "embedding IS NULL AND embedding_dead_lettered_at IS NULL"
+            ),
         ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+
+class EmbeddingCache(SharedModel):
+    __tablename__ = "embedding_cache"
+
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
+    embedding: Mapped[Vector] = mapped_column(Vector(768), nullable=False)
+
+
+class FindCache(SharedModel):
+    __tablename__ = "find_cache"
+
+    guild_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("guilds.id", ondelete="CASCADE"), nullable=False
+    )
+    # Set when the search was limited to one channel
+    channel_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("channels.id", ondelete="CASCADE"),
+        nullable=True,
+    )
+    query_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    query_embedding: Mapped[Vector] = mapped_column(Vector(768), nullable=False)
+    summary: Mapped[str] = mapped_column(Text, nullable=False)
+
+    __table_args__ = (
+        Index("ix_find_cache_guild_id_query_hash", "guild_id", "query_hash"),
+        Index("ix_find_cache_guild_id_created_at", "guild_id", "created_at"),
     )
 
 
 class Guild(SharedModel):
     __tablename__ = "guilds"
 
-    discord_guild_id: Mapped[str] = mapped_column(String, nullable=False)
+    discord_guild_id: Mapped[str] = mapped_column(String, nullable=False, unique=True)
     name: Mapped[str] = mapped_column(String, nullable=True)
+    # Days of messages to keep; MESSAGE_RETENTION_DAYS applies when unset
+    retention_days: Mapped[int] = mapped_column(Integer, nullable=True)
 
     agents: Mapped[list["Agent"]] = relationship(back_populates="guild")
     channels: Mapped[list["Channel"]] = relationship(back_populates="guild")
@@ -91,7 +163,7 @@ class Guild(SharedModel):
 class Channel(SharedModel):
     __tablename__ = "channels"
 
-    discord_channel_id: Mapped[str] = mapped_column(String, nullable=False)
+    discord_channel_id: Mapped[str] = mapped_column(String, nullable=False, unique=True)
     name: Mapped[str] = mapped_column(String, nullable=True)
     guild_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
@@ -106,6 +178,8 @@ class Channel(SharedModel):
     guild: Mapped["Guild"] = relationship(back_populates="channels")
     messages: Mapped[list["Message"]] = relationship(back_populates="channel")
 
+    __table_args__ = (Index("ix_channels_guild_id", "guild_id"),)
+
 
 class Agent(SharedModel):
     __tablename__ = "agents"
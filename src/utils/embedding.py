@@ -1,106 +1,585 @@
 import asyncio
-from collections.abc import Sequence
+from collections.abc import Iterable, Sequence
+from datetime import datetime, timedelta
+import hashlib
+import math
+import os
+import random
+import socket
+import time
+from typing import NamedTuple
+import unicodedata
+import uuid
 
 from google import genai
-from google.genai.types import ContentEmbedding, EmbedContentConfig
-from sqlalchemy import select
+from google.genai.errors import ClientError
+from google.genai.types import EmbedContentConfig
+import numpy as np
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import (
+    UUID,
+    Boolean,
+    DateTime,
+    Interval,
+    String,
+    bindparam,
+    case,
+    cast,
+    column,
+    func,
+    or_,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.core import logger
 from src.core.config import settings
 from src.core.database import AsyncSessionLocal
-from src.models import Message
+from src.core.metrics import metrics
+from src.core.notify import notify, pg_listener
+from src.models import EmbeddingCache, Message
+from src.utils.hot_tier import announce_embedded, hot_tier
+
+EMBEDDING_MODEL = "gemini-embedding-001"
+EMBEDDING_DIMENSIONS = 768
+
+EMBEDDING_CHANNEL = "embedding_backlog"
+NOTIFY_IDS_PER_PAYLOAD = 200
 
 client = genai.Client(api_key=settings.GEMINI_API_KEY)
 
+messages_table = Message.__table__
+
+
+class EmbeddingResult(NamedTuple):
+    vector: list[float] | None
+    error: str | None
+
+
+class ClaimedMessage(NamedTuple):
+    id: uuid.UUID
+    content: str
+    attempts: int
+    content_hash: str | None
+    guild_id: uuid.UUID
+    channel_id: uuid.UUID
+    created_at: datetime
+
+    @property
+    def digest(self) -> str:
+        # Rows saved before content hashing was introduced are hashed lazily
+        return self.content_hash or content_hash(self.content)
+
+
+def normalize_content(text: str) -> str:
+    """Fold case, Unicode forms and whitespace so trivially equal texts match."""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(normalize_content(text).encode()).hexdigest()
+
+
+class EmbeddingEngine:
+    """Embeds texts through the async Gemini client.
+
+    Texts are split into multi-text requests that run concurrently, bounded by
+    a semaphore. The request size adapts to the size of the work handed in: a
+    shallow backlog is spread thinly across the concurrent slots for latency,
+    a deep one fills every request up to the API batch limit for throughput.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = settings.EMBEDDING_MAX_BATCH_SIZE,
+        min_batch_size: int = settings.EMBEDDING_MIN_BATCH_SIZE,
+        concurrency: int = settings.EMBEDDING_CONCURRENCY,
+    ):
+        self.max_batch_size = max_batch_size
+        self.min_batch_size = min(min_batch_size, max_batch_size)
+        self.concurrency = concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    @property
+    def capacity(self) -> int:
+        """Number of texts that can be in flight at once."""
+        return self.max_batch_size * self.concurrency
+
+    def batch_size_for(self, backlog: int) -> int:
+        per_request = math.ceil(backlog / self.concurrency)
+        return max(self.min_batch_size, min(self.max_batch_size, per_request))
+
+    async def _embed_chunk(self, texts: list[str]) -> list[EmbeddingResult]:
+        async with self._semaphore:
+            try:
+                result = await client.aio.models.embed_content(
+                    model=EMBEDDING_MODEL,
+                    contents=texts,
+                    config=EmbedContentConfig(
+                        output_dimensionality=EMBEDDING_DIMENSIONS
+                    ),
+                )
+            except ClientError as e:
+                error = e
+            except Exception as e:
+                logger.error(f"Error generating embeddings for {len(texts)} texts: {e}")
+                return [EmbeddingResult(None, str(e))] * len(texts)
+            else:
+                error = None
+
+        if error is not None:
+            # A bad request fails the whole batch; bisect to isolate the
+            # offending texts instead of failing their neighbours with them
+            if error.code == 400 and len(texts) > 1:
+                middle = len(texts) // 2
+                halves = await asyncio.gather(
+                    self._embed_chunk(texts[:middle]),
+                    self._embed_chunk(texts[middle:]),
+                )
+                return [result for half in halves for result in half]
+
+            logger.error(f"Error generating embeddings for {len(texts)} texts: {error}")
+            return [EmbeddingResult(None, str(error))] * len(texts)
+
+        embeddings = result.embeddings or []
+        if len(embeddings) != len(texts):
+            error = f"Expected {len(texts)} embeddings, got {len(embeddings)}"
+            logger.error(f"{error} - discarding batch")
+            return [EmbeddingResult(None, error)] * len(texts)
+
+        return [EmbeddingResult(embedding.values, None) for embedding in embeddings]
+
+    async def embed_results(self, texts: list[str]) -> list[EmbeddingResult]:
+        """Embed ``texts``, returning a vector or an error per text in input order."""
+        if not texts:
+            return []
+
+        batch_size = self.batch_size_for(len(texts))
+        chunks = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+        results = await asyncio.gather(*(self._embed_chunk(c) for c in chunks))
+        return [result for chunk in results for result in chunk]
+
+    async def embed(self, texts: list[str]) -> list[list[float] | None]:
+        """Embed ``texts``, returning vectors in input order (``None`` on failure)."""
+        return [result.vector for result in await self.embed_results(texts)]
 
-def get_embedding(text: str) -> ContentEmbedding | None:
-    try:
-        result = client.models.embed_content(
-            model="gemini-embedding-001",
-            contents=text,
-            config=genai.types.EmbedContentConfig(output_dimensionality=768),
-        )
 
-        [embedding_obj] = result.embeddings
-        # embedding_length = len(embedding_obj.values)
+embedding_engine = EmbeddingEngine()
 
-        return embedding_obj
 
-    except Exception as e:
-        logger.error(f"Error generating embedding: {e}")
-        return None
+async def get_embedding(text: str) -> list[float] | None:
+    [embedding] = await embedding_engine.embed([text])
+    return embedding
 
 
-async def get_embeddings_batch(
-    texts: list[str], sleep_between_requests: float = 0.0
-) -> list[list[float]]:
-    embeddings = []
+async def get_embeddings_batch(texts: list[str]) -> list[list[float] | None]:
+    return await embedding_engine.embed(texts)
 
-    for text in texts:
+
+def _worker_id(index: int) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+class EmbeddingTrigger:
+    """Wakes embedding workers as soon as new messages are saved.
+
+    Message ids are pushed by the ingestion path in this process and by the
+    Postgres listener for messages saved by other processes. Workers coalesce
+    whatever arrives within a short window into a single claim.
+    """
+
+    def __init__(self, maxsize: int = 10_000):
+        self._queue: asyncio.Queue[uuid.UUID] = asyncio.Queue(maxsize=maxsize)
+
+    def push(self, message_ids: Iterable[uuid.UUID]) -> None:
+        for message_id in message_ids:
+            try:
+                self._queue.put_nowait(message_id)
+            except asyncio.QueueFull:
+                # The safety-net scan picks up whatever does not fit
+                return
+
+    async def next_batch(
+        self, max_items: int, window: float, timeout: float
+    ) -> list[uuid.UUID]:
+        """Wait up to ``timeout`` for an arrival, then gather more for ``window``."""
         try:
-            result = client.models.embed_content(
-                model="gemini-embedding-001",
-                contents=text,
-                config=EmbedContentConfig(output_dimensionality=768),
+            batch = [await asyncio.wait_for(self._queue.get(), timeout)]
+        except TimeoutError:
+            return []
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + window
+        while len(batch) < max_items:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except TimeoutError:
+                break
+
+        return batch
+
+
+embedding_trigger = EmbeddingTrigger()
+
+
+def _on_embedding_notify(payload: str) -> None:
+    embedding_trigger.push(uuid.UUID(message_id) for message_id in payload.split(","))
+
+
+pg_listener.subscribe(EMBEDDING_CHANNEL, _on_embedding_notify)
+
+
+async def announce_new_messages(
+    session: AsyncSession, message_ids: Sequence[uuid.UUID]
+) -> None:
+    """Tell other processes about ``message_ids`` once ``session`` commits.
+
+    Local workers are woken separately through ``embedding_trigger.push``
+    after the commit, since the listener ignores this process's own
+    notifications.
+    """
+    # NOTIFY payloads are capped at 8000 bytes
+    for i in range(0, len(message_ids), NOTIFY_IDS_PER_PAYLOAD):
+        chunk = message_ids[i : i + NOTIFY_IDS_PER_PAYLOAD]
+        await notify(session, EMBEDDING_CHANNEL, ",".join(str(m) for m in chunk))
+
+
+async def claim_messages(
+    worker_id: str,
+    limit: int,
+    message_ids: Sequence[uuid.UUID] | None = None,
+    lease_seconds: int = settings.EMBEDDING_LEASE_SECONDS,
+) -> list[ClaimedMessage]:
+    """Lease up to ``limit`` unembedded messages to ``worker_id``.
+
+    ``FOR UPDATE SKIP LOCKED`` lets concurrent workers, in this process or any
+    other, claim disjoint rows without waiting on each other. Rows whose lease
+    has expired (e.g. their worker crashed) become claimable again, while rows
+    backing off after a failure or dead-lettered are skipped. Passing
+    ``message_ids`` restricts the claim to those rows.
+    """
+    claimable = (
+        select(Message.id)
+        .where(
+            Message.embedding.is_(None),
+            Message.embedding_dead_lettered_at.is_(None),
+            or_(
+                Message.embedding_next_attempt_at.is_(None),
+                Message.embedding_next_attempt_at <= func.now(),
+            ),
+            or_(
+                Message.embedding_leased_until.is_(None),
+                Message.embedding_leased_until < func.now(),
+            ),
+        )
+        .order_by(Message.created_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if message_ids is not None:
+        claimable = claimable.where(Message.id.in_(message_ids))
+    async with AsyncSessionLocal.begin() as session:
+        result = await session.execute(
+            update(messages_table)
+            .where(messages_table.c.id.in_(claimable))
+            .values(
+                embedding_leased_until=func.now() + timedelta(seconds=lease_seconds),
+                embedding_lease_owner=worker_id,
+            )
+            .returning(
+                messages_table.c.id,
+                messages_table.c.content,
+                messages_table.c.embedding_attempts,
+                messages_table.c.content_hash,
+                messages_table.c.guild_id,
+                messages_table.c.channel_id,
+                messages_table.c.created_at,
+            )
+        )
+        return [ClaimedMessage(*row) for row in result]
+
+
+async def lookup_cached_embeddings(hashes: Iterable[str]) -> dict[str, list[float]]:
+    """Fetch cached vectors for the given content hashes in one query."""
+    hashes = set(hashes)
+    if not hashes:
+        return {}
+
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(EmbeddingCache.content_hash, EmbeddingCache.embedding).where(
+                EmbeddingCache.content_hash.in_(hashes)
             )
-            # Usually a single embedding per text
-            [embedding_obj] = result.embeddings
-            embeddings.append(embedding_obj.values)
+        )
+        return {row.content_hash: row.embedding for row in result}
 
-        except Exception as e:
-            logger.error(f"Error generating embedding for text: {text[:50]}... | {e}")
-            embeddings.append([])
 
-        if sleep_between_requests > 0:
-            await asyncio.sleep(sleep_between_requests)
-        else:
-            await asyncio.sleep(0)
+async def store_embeddings(
+    worker_id: str,
+    embeddings: list[tuple[ClaimedMessage, list[float]]],
+    new_cache_entries: dict[str, list[float]],
+) -> None:
+    """Write vectors back and release the lease, skipping rows re-leased elsewhere.
 
-    return embeddings
+    Freshly computed vectors are added to the embedding cache in the same
+    transaction. The rows actually written go to the hot tier, here and,
+    through NOTIFY, in other processes.
+    """
+    if not embeddings:
+        return
 
+    async with AsyncSessionLocal.begin() as session:
+        if new_cache_entries:
+            await session.execute(
+                insert(EmbeddingCache)
+                .values(
+                    [
+                        {"content_hash": digest, "embedding": vector}
+                        for digest, vector in new_cache_entries.items()
+                    ]
+                )
+                .on_conflict_do_nothing(index_elements=["content_hash"])
+            )
 
-async def generate_embeddings(batch_size: int = 50, sleep_seconds: int = 5) -> None:
-    while True:
-        async with AsyncSessionLocal.begin() as session:
-            # Fetch messages without embeddings
-            result = await session.execute(
-                select(Message)
-                .where(Message.embedding.is_(None), Message.content.is_not(None))
-                .limit(batch_size)
+        embedded = values(
+            column("message_id", UUID(as_uuid=True)),
+            column("created_at", DateTime(timezone=True)),
+            column("vector", Vector(EMBEDDING_DIMENSIONS)),
+            column("digest", String),
+            name="embedded",
+        ).data(
+            [
+                (message.id, message.created_at, vector, message.digest)
+                for message, vector in embeddings
+            ]
+        )
+        result = await session.execute(
+            update(messages_table)
+            .where(
+                messages_table.c.id == embedded.c.message_id,
+                messages_table.c.created_at == embedded.c.created_at,
+                messages_table.c.embedding_lease_owner == worker_id,
+            )
+            .values(
+                embedding=cast(embedded.c.vector, Vector(EMBEDDING_DIMENSIONS)),
+                content_hash=embedded.c.digest,
+                embedding_next_attempt_at=None,
+                embedding_leased_until=None,
+                embedding_lease_owner=None,
             )
-            messages_to_embed = result.scalars().all()
+            .returning(messages_table.c.id)
+        )
+        stored = set(result.scalars())
+        await announce_embedded(session, list(stored))
 
-            if not messages_to_embed:
-                await asyncio.sleep(sleep_seconds)
-                continue
+    # Rows re-leased elsewhere in the meantime were left alone
+    for message, vector in embeddings:
+        if message.id in stored:
+            hot_tier.add(
+                message.guild_id,
+                message.channel_id,
+                message.id,
+                message.created_at,
+                vector,
+            )
 
-            # Extract message content
-            texts = [msg.content for msg in messages_to_embed]
 
-            # Generate embeddings in batch
-            vectors = await get_embeddings_batch(texts)
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff with jitter after ``attempts`` failed attempts."""
+    delay = min(
+        settings.EMBEDDING_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+        settings.EMBEDDING_RETRY_MAX_SECONDS,
+    )
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
 
-            # Update messages
-            for msg, vec in zip(messages_to_embed, vectors):
-                msg.embedding = vec  # type: ignore
 
-            logger.info(f"Embedded {len(messages_to_embed)} messages in this batch.")
+async def store_failures(
+    worker_id: str, failures: list[tuple[ClaimedMessage, str]]
+) -> None:
+    """Record failed attempts, scheduling a retry or dead-lettering each row."""
+    if not failures:
+        return
 
+    params = []
+    for message, error in failures:
+        attempts = message.attempts + 1
+        dead_letter = attempts >= settings.EMBEDDING_MAX_ATTEMPTS
+        if dead_letter:
+            logger.warning(
+                f"Dead-lettering message {message.id} after {attempts} attempts: {error}"
+            )
+        params.append(
+            {
+                "message_id": message.id,
+                "attempts": attempts,
+                "error": error,
+                "retry_delay": retry_delay(attempts),
+                "dead_letter": dead_letter,
+            }
+        )
 
-async def find_similar_messages(query: str, top_k: int = 5) -> Sequence[Message]:
-    query_embedding = get_embedding(query)
-    if not query_embedding:
-        return []
+    async with AsyncSessionLocal.begin() as session:
+        await session.execute(
+            update(messages_table)
+            .where(
+                messages_table.c.id == bindparam("message_id"),
+                messages_table.c.embedding_lease_owner == worker_id,
+            )
+            .values(
+                embedding_attempts=bindparam("attempts"),
+                embedding_last_error=bindparam("error"),
+                embedding_next_attempt_at=func.now()
+                + bindparam("retry_delay", type_=Interval),
+                embedding_dead_lettered_at=case(
+                    (bindparam("dead_letter", type_=Boolean), func.now()),
+                    else_=None,
+                ),
+                embedding_leased_until=None,
+                embedding_lease_owner=None,
+            ),
+            params,
+        )
 
-    async with AsyncSessionLocal() as session:
+
+async def requeue_dead_letters() -> int:
+    """Give every dead-lettered message a fresh set of attempts."""
+    async with AsyncSessionLocal.begin() as session:
         result = await session.execute(
-            select(Message)
-            .where(Message.embedding.is_not(None))
-            .order_by(Message.embedding.cosine_distance(query_embedding.values))
-            .limit(top_k)
+            update(messages_table)
+            .where(messages_table.c.embedding_dead_lettered_at.is_not(None))
+            .values(
+                embedding_attempts=0,
+                embedding_next_attempt_at=None,
+                embedding_dead_lettered_at=None,
+            )
+            .returning(messages_table.c.id)
         )
-        similar_messages = result.scalars().all()
-        logger.info(f"Found {len(similar_messages)} similar messages:")
-        for i, msg in enumerate(similar_messages, start=1):
-            logger.info(f"  {i}. {msg.content}")
-        return similar_messages
+        message_ids = list(result.scalars())
+        await announce_new_messages(session, message_ids)
+
+    embedding_trigger.push(message_ids)
+    return len(message_ids)
+
+
+async def _embed_claimed(
+    engine: EmbeddingEngine, worker_id: str, claimed: list[ClaimedMessage]
+) -> None:
+    cached = await lookup_cached_embeddings(message.digest for message in claimed)
+
+    # Identical texts within the batch only cost one API call
+    texts_by_digest: dict[str, str] = {}
+    for message in claimed:
+        if message.digest not in cached:
+            texts_by_digest.setdefault(message.digest, message.content)
+
+    # No transaction is held while the embedding requests are in flight
+    results = dict(
+        zip(
+            texts_by_digest,
+            await engine.embed_results(list(texts_by_digest.values())),
+        )
+    )
+    new_cache_entries = {
+        digest: result.vector
+        for digest, result in results.items()
+        if result.vector is not None
+    }
+
+    embedded = []
+    failures = []
+    for message in claimed:
+        vector = cached.get(message.digest)
+        if vector is None:
+            vector = new_cache_entries.get(message.digest)
+        if vector is not None:
+            embedded.append((message, vector))
+        else:
+            failures.append((message, results[message.digest].error or "Unknown"))
+
+    await store_embeddings(worker_id, embedded, new_cache_entries)
+    await store_failures(worker_id, failures)
+
+    cache_hits = len(claimed) - len(texts_by_digest)
+    metrics.increment("embedding_cache_hits", cache_hits)
+    metrics.increment("embedding_cache_misses", len(texts_by_digest))
+    lookups = metrics.get("embedding_cache_hits") + metrics.get(
+        "embedding_cache_misses"
+    )
+    metrics.set_gauge(
+        "embedding_cache_hit_rate", metrics.get("embedding_cache_hits") / lookups
+    )
+
+    logger.info(
+        f"[{worker_id}] Embedded {len(embedded)}/{len(claimed)} messages in this batch "
+        f"({cache_hits} served without an API call)."
+    )
+
+
+async def _embedding_worker(worker_id: str, safety_scan_seconds: float) -> None:
+    # Each worker owns its request slots so throughput grows with worker count
+    engine = EmbeddingEngine()
+    # Start with a scan to drain anything saved while no worker was running
+    last_scan = -math.inf
+
+    while True:
+        try:
+            # Triggers miss expired leases, retries whose backoff ran out,
+            # ids dropped from a full queue and NOTIFYs lost while
+            # reconnecting, so scan on schedule however busy the guild is
+            if time.monotonic() - last_scan >= safety_scan_seconds:
+                last_scan = time.monotonic()
+                while claimed := await claim_messages(worker_id, engine.capacity):
+                    await _embed_claimed(engine, worker_id, claimed)
+
+            message_ids = await embedding_trigger.next_batch(
+                max_items=engine.capacity,
+                window=settings.EMBEDDING_COALESCE_SECONDS,
+                timeout=max(0.0, last_scan + safety_scan_seconds - time.monotonic()),
+            )
+            if message_ids:
+                claimed = await claim_messages(
+                    worker_id, len(message_ids), message_ids=message_ids
+                )
+                if claimed:
+                    await _embed_claimed(engine, worker_id, claimed)
+        except Exception as e:
+            logger.exception(f"[{worker_id}] Embedding worker error: {e}")
+            await asyncio.sleep(safety_scan_seconds)
+            last_scan = -math.inf
+
+
+async def generate_embeddings(
+    workers: int = settings.EMBEDDING_WORKERS,
+    safety_scan_seconds: float = settings.EMBEDDING_SAFETY_SCAN_SECONDS,
+) -> None:
+    await asyncio.gather(
+        *(_embedding_worker(_worker_id(i), safety_scan_seconds) for i in range(workers))
+    )
+
+
+async def get_query_embedding(text: str) -> list[float] | np.ndarray | None:
+    """Embed a search query, reusing the embedding cache for repeated queries.
+
+    A cached vector comes back as the ndarray pgvector loads, a fresh one
+    as a list.
+    """
+    digest = content_hash(text)
+    cached = await lookup_cached_embeddings([digest])
+    if digest in cached:
+        return cached[digest]
+
+    embedding = await get_embedding(text)
+    if embedding is not None:
+        async with AsyncSessionLocal.begin() as session:
+            await session.execute(
+                insert(EmbeddingCache)
+                .values(content_hash=digest, embedding=embedding)
+                .on_conflict_do_nothing(index_elements=["content_hash"])
+            )
+    return embedding
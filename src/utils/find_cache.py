@@ -0,0 +1,120 @@
+from datetime import timedelta
+from typing import NamedTuple
+import uuid
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.core.database import AsyncSessionLocal
+from src.core.metrics import metrics
+from src.models import FindCache, Message
+from src.utils.embedding import content_hash, get_query_embedding
+
+
+class CachedAnswer(NamedTuple):
+    summary: str | None
+    query_embedding: list[float] | None
+
+
+def _expiry_cutoff():
+    return func.now() - timedelta(seconds=settings.FIND_CACHE_TTL_SECONDS)
+
+
+def _fresh_entries(guild_id: uuid.UUID, channel_id: uuid.UUID | None):
+    return select(FindCache.summary, FindCache.created_at).where(
+        FindCache.guild_id == guild_id,
+        FindCache.channel_id.is_not_distinct_from(channel_id),
+        FindCache.created_at > _expiry_cutoff(),
+    )
+
+
+async def _is_stale(
+    session: AsyncSession, guild_id: uuid.UUID, channel_id: uuid.UUID | None, since
+) -> bool:
+    """Whether ``FIND_CACHE_MAX_NEW_MESSAGES`` messages landed in the scope since."""
+    recent = select(Message.id).where(
+        Message.guild_id == guild_id, Message.created_at > since
+    )
+    if channel_id is not None:
+        recent = recent.where(Message.channel_id == channel_id)
+    recent = recent.limit(settings.FIND_CACHE_MAX_NEW_MESSAGES).subquery()
+    count = await session.scalar(select(func.count()).select_from(recent))
+    return count >= settings.FIND_CACHE_MAX_NEW_MESSAGES
+
+
+async def lookup_answer(
+    guild_id: uuid.UUID, query: str, channel_id: uuid.UUID | None = None
+) -> CachedAnswer:
+    """Find a cached ``/find`` answer for ``query`` in the guild or channel.
+
+    The same (normalized) question is matched by hash before anything is
+    embedded. Otherwise the query embedding, itself cached by content hash,
+    is compared with earlier questions and the closest one within
+    ``FIND_CACHE_MAX_DISTANCE`` (cosine) is used. Answers expire after
+    ``FIND_CACHE_TTL_SECONDS`` or once enough new messages make them stale.
+    The embedding is returned on a miss so the search can reuse it.
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            _fresh_entries(guild_id, channel_id)
+            .where(FindCache.query_hash == content_hash(query))
+            .order_by(FindCache.created_at.desc())
+            .limit(1)
+        )
+        entry = result.first()
+        if entry is not None and not await _is_stale(
+            session, guild_id, channel_id, entry.created_at
+        ):
+            metrics.increment("find_cache_exact_hits")
+            return CachedAnswer(entry.summary, None)
+
+    query_embedding = await get_query_embedding(query)
+    if query_embedding is None:
+        return CachedAnswer(None, None)
+
+    async with AsyncSessionLocal() as session:
+        distance = FindCache.query_embedding.cosine_distance(query_embedding)
+        result = await session.execute(
+            _fresh_entries(guild_id, channel_id)
+            .add_columns(distance.label("distance"))
+            .order_by(distance)
+            .limit(1)
+        )
+        entry = result.first()
+        if (
+            entry is not None
+            and entry.distance <= settings.FIND_CACHE_MAX_DISTANCE
+            and not await _is_stale(session, guild_id, channel_id, entry.created_at)
+        ):
+            metrics.increment("find_cache_semantic_hits")
+            return CachedAnswer(entry.summary, query_embedding)
+
+    metrics.increment("find_cache_misses")
+    return CachedAnswer(None, query_embedding)
+
+
+async def store_answer(
+    guild_id: uuid.UUID,
+    query: str,
+    query_embedding: list[float],
+    summary: str,
+    channel_id: uuid.UUID | None = None,
+) -> None:
+    async with AsyncSessionLocal.begin() as session:
+        # Expired answers of the guild are never read again
+        await session.execute(
+            delete(FindCache).where(
+                FindCache.guild_id == guild_id,
+                FindCache.created_at <= _expiry_cutoff(),
+            )
+        )
+        session.add(
+            FindCache(
+                guild_id=guild_id,
+                channel_id=channel_id,
+                query_hash=content_hash(query),
+                query_embedding=query_embedding,
+                summary=summary,
+            )
+        )
@@ -0,0 +1,373 @@
+import asyncio
+from collections.abc import Sequence
+from datetime import UTC, datetime
+import math
+from typing import NamedTuple
+import uuid
+
+import numpy as np
+import psycopg
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.core.database import AsyncSessionLocal
+from src.core.logging import logger
+from src.core.metrics import metrics
+from src.core.notify import INSTANCE_ID, notify, pg_listener
+from src.models import Message
+from src.utils.cache import TTLCache
+from src.utils.identity import IDENTITY_CHANNEL
+
+EMBEDDED_CHANNEL = "message_embedded"
+EVICTION_CHANNEL = "hot_tier_eviction"
+NOTIFY_IDS_PER_PAYLOAD = 200
+
+# Rows allocated the first time a guild's matrix is used; doubled as it fills
+INITIAL_ROWS = 256
+
+
+class HotResults(NamedTuple):
+    # (cosine distance, message id), closest first
+    ranked: list[tuple[float, uuid.UUID]]
+    # Messages created after this are all held in memory; None if every
+    # embedded message of the guild is
+    covered_after: datetime | None
+
+
+class GuildVectors:
+    """The most recent embedded messages of one guild, as rows of a matrix.
+
+    Rows are unit vectors, so a single matrix-vector product scores every
+    message by cosine similarity. Once full, a new message replaces the
+    oldest one, and ``evicted_until`` records the newest creation time no
+    longer held, below which searches have to go to Postgres.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.vectors: np.ndarray | None = None
+        self.created = np.empty(0, dtype=np.float64)
+        self.channels = np.empty(0, dtype=np.int32)
+        self.ids: list[uuid.UUID] = []
+        self.slots: dict[uuid.UUID, int] = {}
+        self.channel_codes: dict[uuid.UUID, int] = {}
+        self.evicted_until = -math.inf
+        self.ready = False
+
+    @property
+    def covered_after(self) -> datetime | None:
+        if self.evicted_until == -math.inf:
+            return None
+        return datetime.fromtimestamp(self.evicted_until, UTC)
+
+    def _grow(self, dimensions: int) -> None:
+        rows = min(max(2 * len(self.created), INITIAL_ROWS), self.capacity)
+        vectors = np.empty((rows, dimensions), dtype=np.float32)
+        created = np.empty(rows, dtype=np.float64)
+        channels = np.empty(rows, dtype=np.int32)
+        count = len(self.ids)
+        if self.vectors is not None:
+            vectors[:count] = self.vectors[:count]
+            created[:count] = self.created[:count]
+            channels[:count] = self.channels[:count]
+        self.vectors, self.created, self.channels = vectors, created, channels
+
+    def add(
+        self,
+        message_id: uuid.UUID,
+        channel_id: uuid.UUID,
+        created_at: datetime,
+        vector: Sequence[float],
+    ) -> None:
+        row = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(row)
+        if not norm:
+            return
+        created = created_at.timestamp()
+
+        slot = self.slots.get(message_id)
+        if slot is None:
+            if created <= self.evicted_until:
+                # Older than what is held; Postgres serves that range
+                return
+            count = len(self.ids)
+            if count < self.capacity:
+                if count == len(self.created):
+                    self._grow(len(row))
+                slot = count
+                self.ids.append(message_id)
+            else:
+                slot = int(self.created.argmin())
+                oldest = float(self.created[slot])
+                if created <= oldest:
+                    self.evicted_until = max(self.evicted_until, created)
+                    return
+                self.evicted_until = max(self.evicted_until, oldest)
+                del self.slots[self.ids[slot]]
+                self.ids[slot] = message_id
+            self.slots[message_id] = slot
+
+        self.vectors[slot] = row / norm
+        self.created[slot] = created
+        self.channels[slot] = self.channel_codes.setdefault(
+            channel_id, len(self.channel_codes)
+        )
+
+    def evict(self, before: float, since: float = -math.inf) -> None:
+        """Drop the messages created in ``[since, before)``."""
+        count = len(self.ids)
+        if not count:
+            return
+        created = self.created[:count]
+        keep = np.flatnonzero((created < since) | (created >= before))
+        if len(keep) == count:
+            return
+        kept = len(keep)
+        self.vectors[:kept] = self.vectors[keep]
+        self.created[:kept] = created[keep]
+        self.channels[:kept] = self.channels[keep]
+        self.ids = [self.ids[slot] for slot in keep]
+        self.slots = {message_id: slot for slot, message_id in enumerate(self.ids)}
+
+    def search(
+        self,
+        channel_id: uuid.UUID | None,
+        query: np.ndarray,
+        k: int,
+        since: datetime | None = None,
+    ) -> list[tuple[float, uuid.UUID]]:
+        count = len(self.ids)
+        if not count or k <= 0:
+            return []
+
+        scores = self.vectors[:count] @ query
+        if channel_id is not None:
+            code = self.channel_codes.get(channel_id)
+            if code is None:
+                return []
+            scores[self.channels[:count] != code] = -np.inf
+        if since is not None:
+            scores[self.created[:count] < since.timestamp()] = -np.inf
+
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(1 - float(scores[i]), self.ids[i]) for i in top if scores[i] > -np.inf]
+
+
+class HotTier:
+    """In-memory vector search over the most recent messages of busy guilds.
+
+    A guild is loaded from Postgres the first time it is searched: its
+    ``size`` most recent embedded messages. From then on the embedding
+    workers add vectors as they store them, in this process directly and
+    in others through NOTIFY. Retention purges evict what they delete, and
+    deleting a user, channel or guild empties the tier. Searches confined
+    to the covered range never reach the database. At most ``guilds``
+    guilds are held, least recently used first out; each is reloaded
+    after ``ttl`` seconds.
+    """
+
+    def __init__(
+        self,
+        size: int = settings.HOT_TIER_SIZE,
+        guilds: int = settings.HOT_TIER_GUILDS,
+        ttl: float = settings.HOT_TIER_TTL_SECONDS,
+    ):
+        self.size = size
+        self.guilds: TTLCache[uuid.UUID, GuildVectors] = TTLCache(guilds, ttl)
+        self._loading: dict[uuid.UUID, asyncio.Task[GuildVectors]] = {}
+        self._pending: set[asyncio.Task] = set()
+
+    def add(
+        self,
+        guild_id: uuid.UUID,
+        channel_id: uuid.UUID,
+        message_id: uuid.UUID,
+        created_at: datetime,
+        vector: Sequence[float],
+    ) -> None:
+        """Hold a freshly stored vector if its guild is in memory."""
+        vectors = self.guilds.get(guild_id)
+        if vectors is not None:
+            vectors.add(message_id, channel_id, created_at, vector)
+
+    def evict(
+        self,
+        guild_id: uuid.UUID | None,
+        before: datetime,
+        since: datetime | None = None,
+    ) -> None:
+        """Drop the messages of a guild, or of all, created in ``[since, before)``."""
+        guild_ids = self.guilds.keys() if guild_id is None else [guild_id]
+        for held_id in guild_ids:
+            vectors = self.guilds.get(held_id)
+            if vectors is None:
+                continue
+            if not vectors.ready:
+                # The load may have read the rows before they were deleted
+                self.guilds.pop(held_id)
+                continue
+            vectors.evict(before.timestamp(), since.timestamp() if since else -math.inf)
+
+    def clear(self) -> None:
+        self.guilds.clear()
+
+    async def _load(self, guild_id: uuid.UUID) -> GuildVectors:
+        # Held before loading so vectors stored meanwhile aren't missed
+        vectors = GuildVectors(self.size)
+        self.guilds.set(guild_id, vectors)
+        async with AsyncSessionLocal() as session:
+            rows = (
+                await session.execute(
+                    select(
+                        Message.id,
+                        Message.channel_id,
+                        Message.created_at,
+                        Message.embedding,
+                    )
+                    .where(Message.guild_id == guild_id, Message.embedding.is_not(None))
+                    .order_by(Message.created_at.desc())
+                    .limit(self.size)
+                )
+            ).all()
+        for message_id, channel_id, created_at, embedding in reversed(rows):
+            vectors.add(message_id, channel_id, created_at, embedding)
+        if len(rows) == self.size:
+            # Older messages of the guild weren't loaded
+            vectors.evicted_until = max(
+                vectors.evicted_until, rows[-1].created_at.timestamp()
+            )
+        vectors.ready = True
+        metrics.increment("hot_tier_loads")
+        logger.info(f"Loaded {len(rows)} recent vectors of guild {guild_id}")
+        return vectors
+
+    async def _ready(self, guild_id: uuid.UUID) -> GuildVectors:
+        vectors = self.guilds.get(guild_id)
+        if vectors is not None and vectors.ready:
+            return vectors
+        task = self._loading.get(guild_id)
+        if task is None:
+            task = asyncio.create_task(self._load(guild_id))
+            self._loading[guild_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(guild_id, None))
+        return await asyncio.shield(task)
+
+    async def search(
+        self,
+        guild_id: uuid.UUID,
+        channel_id: uuid.UUID | None,
+        query_embedding: Sequence[float],
+        k: int,
+        since: datetime | None = None,
+    ) -> HotResults | None:
+        """The ``k`` held messages closest to ``query_embedding``.
+
+        Returns ``None`` when the hot tier is disabled or the guild couldn't
+        be loaded, leaving the search to Postgres.
+        """
+        if self.size <= 0:
+            return None
+        try:
+            vectors = await self._ready(guild_id)
+        except Exception as e:
+            logger.exception(f"Error loading guild {guild_id} into the hot tier: {e}")
+            return None
+
+        # A copy: the caller's array goes on to the find cache unchanged
+        query = np.array(query_embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1
+        return HotResults(
+            vectors.search(channel_id, query, k, since), vectors.covered_after
+        )
+
+    async def _fetch(self, message_ids: list[uuid.UUID]) -> None:
+        guild_ids = self.guilds.keys()
+        if not guild_ids:
+            return
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(
+                    Message.guild_id,
+                    Message.channel_id,
+                    Message.id,
+                    Message.created_at,
+                    Message.embedding,
+                ).where(
+                    Message.id.in_(message_ids),
+                    Message.guild_id.in_(guild_ids),
+                    Message.embedding.is_not(None),
+                )
+            )
+            for row in result:
+                self.add(*row)
+
+    def fetch_later(self, message_ids: list[uuid.UUID]) -> None:
+        """Load vectors stored by another process, if their guilds are held."""
+        if not self.guilds:
+            return
+        task = asyncio.create_task(self._fetch(message_ids))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+
+hot_tier = HotTier()
+
+
+async def announce_embedded(
+    session: AsyncSession, message_ids: Sequence[uuid.UUID]
+) -> None:
+    """Tell other processes' hot tiers about vectors stored in ``session``."""
+    for i in range(0, len(message_ids), NOTIFY_IDS_PER_PAYLOAD):
+        chunk = message_ids[i : i + NOTIFY_IDS_PER_PAYLOAD]
+        await notify(session, EMBEDDED_CHANNEL, ",".join(str(m) for m in chunk))
+
+
+async def announce_eviction(
+    conn: psycopg.AsyncConnection,
+    guild_id: uuid.UUID | None,
+    before: datetime,
+    since: datetime | None = None,
+) -> None:
+    """Evict purged messages here and, through NOTIFY, in other processes.
+
+    ``guild_id`` ``None`` stands for every guild. ``conn`` is expected to
+    be in autocommit mode, so the notification goes out right away.
+    """
+    hot_tier.evict(guild_id, before, since)
+    payload = ",".join(
+        (str(guild_id or "*"), since.isoformat() if since else "", before.isoformat())
+    )
+    await conn.execute(
+        "SELECT pg_notify(%s, %s)", (EVICTION_CHANNEL, f"{INSTANCE_ID}|{payload}")
+    )
+
+
+def _on_embedded_notify(payload: str) -> None:
+    hot_tier.fetch_later([uuid.UUID(message_id) for message_id in payload.split(",")])
+
+
+def _on_eviction_notify(payload: str) -> None:
+    guild_id, since, before = payload.split(",")
+    hot_tier.evict(
+        None if guild_id == "*" else uuid.UUID(guild_id),
+        datetime.fromisoformat(before),
+        datetime.fromisoformat(since) if since else None,
+    )
+
+
+def _on_identity_deleted(payload: str) -> None:
+    # Deleting a user, channel or guild cascades to its messages, and the
+    # payload only names the Discord id; such deletes are rare
+    kind, _, _ = payload.partition(":")
+    if kind in ("users", "guilds", "channels"):
+        hot_tier.clear()
+
+
+pg_listener.subscribe(EMBEDDED_CHANNEL, _on_embedded_notify)
+pg_listener.subscribe(EVICTION_CHANNEL, _on_eviction_notify)
+pg_listener.subscribe(IDENTITY_CHANNEL, _on_identity_deleted)
+# Notifications missed while disconnected would leave gaps; reload instead
+pg_listener.on_connect(hot_tier.clear)
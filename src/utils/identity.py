@@ -0,0 +1,176 @@
+from collections.abc import Sequence
+from typing import Literal
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.core.logging import logger
+from src.core.notify import pg_listener
+from src.models import Channel, Guild, User
+from src.utils.cache import TTLCache
+
+IDENTITY_CHANNEL = "identity_invalidation"
+
+IdentityKind = Literal["users", "guilds", "channels"]
+
+
+class IdentityCache:
+    """Maps Discord user, guild and channel ids to their row UUIDs.
+
+    These mappings only change when a row is deleted, so entries live for a
+    long TTL and are dropped early by the delete triggers on each table,
+    which also fire for rows removed by ``ON DELETE CASCADE``.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = settings.IDENTITY_CACHE_SIZE,
+        ttl: float = settings.IDENTITY_CACHE_TTL_SECONDS,
+    ):
+        self.users: TTLCache[str, uuid.UUID] = TTLCache(maxsize, ttl)
+        self.guilds: TTLCache[str, uuid.UUID] = TTLCache(maxsize, ttl)
+        self.channels: TTLCache[str, uuid.UUID] = TTLCache(maxsize, ttl)
+
+    def invalidate(self, kind: IdentityKind, discord_id: str) -> None:
+        getattr(self, kind).pop(discord_id)
+
+    def clear(self) -> None:
+        self.users.clear()
+        self.guilds.clear()
+        self.channels.clear()
+
+
+identity_cache = IdentityCache()
+
+
+async def _upsert_identities(
+    session: AsyncSession,
+    cache: TTLCache[str, uuid.UUID],
+    model: type[User] | type[Guild] | type[Channel],
+    key: str,
+    rows: dict[str, dict],
+    update_columns: Sequence[str],
+) -> dict[str, uuid.UUID]:
+    """Resolve ``rows`` (keyed by Discord id) to UUIDs, creating missing ones.
+
+    Cached ids are served without touching the database; the rest are
+    resolved with a single ``INSERT ... ON CONFLICT DO UPDATE ... RETURNING``,
+    which returns both the freshly created and the already existing rows.
+    """
+    ids = {
+        discord_id: row_id
+        for discord_id in rows
+        if (row_id := cache.get(discord_id)) is not None
+    }
+    missing = [
+        {key: discord_id, **values}
+        for discord_id, values in rows.items()
+        if discord_id not in ids
+    ]
+    if not missing:
+        return ids
+
+    stmt = insert(model).values(missing)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[key],
+        set_={column: stmt.excluded[column] for column in update_columns},
+    ).returning(getattr(model, key), model.id)
+
+    result = await session.execute(stmt)
+    for discord_id, row_id in result.tuples():
+        ids[discord_id] = row_id
+        cache.set(discord_id, row_id)
+
+    return ids
+
+
+async def resolve_users(
+    session: AsyncSession, users: dict[str, str | None]
+) -> dict[str, uuid.UUID]:
+    """Map ``{discord_user_id: username}`` to user UUIDs, creating missing users."""
+    return await _upsert_identities(
+        session,
+        identity_cache.users,
+        User,
+        "discord_user_id",
+        {discord_id: {"username": name} for discord_id, name in users.items()},
+        update_columns=["username"],
+    )
+
+
+async def resolve_guilds(
+    session: AsyncSession, guilds: dict[str, str | None]
+) -> dict[str, uuid.UUID]:
+    """Map ``{discord_guild_id: name}`` to guild UUIDs, creating missing guilds."""
+    return await _upsert_identities(
+        session,
+        identity_cache.guilds,
+        Guild,
+        "discord_guild_id",
+        {discord_id: {"name": name} for discord_id, name in guilds.items()},
+        update_columns=["name"],
+    )
+
+
+async def resolve_channels(
+    session: AsyncSession, channels: dict[str, tuple[str | None, uuid.UUID]]
+) -> dict[str, uuid.UUID]:
+    """Map ``{discord_channel_id: (name, guild_id)}`` to channel UUIDs."""
+    return await _upsert_identities(
+        session,
+        identity_cache.channels,
+        Channel,
+        "discord_channel_id",
+        {
+            discord_id: {"name": name, "guild_id": guild_id}
+            for discord_id, (name, guild_id) in channels.items()
+        },
+        update_columns=["name"],
+    )
+
+
+async def resolve_guild_id(
+    session: AsyncSession, discord_guild_id: str
+) -> uuid.UUID | None:
+    guild_id = identity_cache.guilds.get(discord_guild_id)
+    if guild_id is None:
+        result = await session.execute(
+            select(Guild.id).where(Guild.discord_guild_id == discord_guild_id)
+        )
+        guild_id = result.scalar_one_or_none()
+        if guild_id is not None:
+            identity_cache.guilds.set(discord_guild_id, guild_id)
+    return guild_id
+
+
+async def resolve_channel_id(
+    session: AsyncSession, discord_channel_id: str
+) -> uuid.UUID | None:
+    channel_id = identity_cache.channels.get(discord_channel_id)
+    if channel_id is None:
+        result = await session.execute(
+            select(Channel.id).where(Channel.discord_channel_id == discord_channel_id)
+        )
+        channel_id = result.scalar_one_or_none()
+        if channel_id is not None:
+            identity_cache.channels.set(discord_channel_id, channel_id)
+    return channel_id
+
+
+def _on_identity_deleted(payload: str) -> None:
+    kind, _, discord_id = payload.partition(":")
+    if kind in ("users", "guilds", "channels"):
+        identity_cache.invalidate(kind, discord_id)  # type: ignore[arg-type]
+
+
+def _on_listener_connected() -> None:
+    # Deletes may have happened while we weren't listening
+    logger.info("Clearing identity cache after listener (re)connect")
+    identity_cache.clear()
+
+
+pg_listener.subscribe(IDENTITY_CHANNEL, _on_identity_deleted)
+pg_listener.on_connect(_on_listener_connected)
@@ -0,0 +1,197 @@
+import asyncio
+from datetime import datetime
+from typing import NamedTuple
+import uuid
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError, IntegrityError
+
+from src.core.config import settings
+from src.core.database import AsyncSessionLocal
+from src.core.logging import logger
+from src.core.metrics import metrics
+from src.models import Message
+from src.utils.embedding import announce_new_messages, embedding_trigger
+from src.utils.identity import (
+    identity_cache,
+    resolve_channels,
+    resolve_guilds,
+    resolve_users,
+)
+from src.utils.partitions import ensure_months, forget_known_months, month_start
+
+
+class PendingMessage(NamedTuple):
+    """Snapshot of a Discord message waiting to be written to the database."""
+
+    id: uuid.UUID
+    discord_message_id: str
+    discord_user_id: str
+    username: str
+    discord_guild_id: str | None
+    guild_name: str | None
+    discord_channel_id: str | None
+    channel_name: str | None
+    content: str
+    content_hash: str
+    created_at: datetime
+
+
+_STOP = object()
+
+
+async def write_messages(batch: list[PendingMessage]) -> None:
+    """Write a batch of messages, and any missing parents, in one transaction."""
+    async with AsyncSessionLocal.begin() as session:
+        user_ids = await resolve_users(
+            session, {m.discord_user_id: m.username for m in batch}
+        )
+
+        # DM messages don't belong to a guild, only their author is stored
+        guild_messages = [m for m in batch if m.discord_guild_id is not None]
+        if not guild_messages:
+            return
+
+        guild_ids = await resolve_guilds(
+            session, {m.discord_guild_id: m.guild_name for m in guild_messages}
+        )
+        channel_ids = await resolve_channels(
+            session,
+            {
+                m.discord_channel_id: (m.channel_name, guild_ids[m.discord_guild_id])
+                for m in guild_messages
+            },
+        )
+
+        # Gateway replays deliver messages we already stored; skip them. The
+        # timestamp comes from the message's snowflake, so a replay has the
+        # same one and hits the same partition.
+        result = await session.execute(
+            insert(Message)
+            .values(
+                [
+                    {
+                        "id": m.id,
+                        "created_at": m.created_at,
+                        "discord_message_id": m.discord_message_id,
+                        "discord_user_id": m.discord_user_id,
+                        "content": m.content,
+                        "content_hash": m.content_hash,
+                        "channel_id": channel_ids[m.discord_channel_id],
+                        "guild_id": guild_ids[m.discord_guild_id],
+                        "user_id": user_ids[m.discord_user_id],
+                    }
+                    for m in guild_messages
+                ]
+            )
+            .on_conflict_do_nothing(index_elements=["discord_message_id", "created_at"])
+            .returning(Message.id)
+        )
+        message_ids = list(result.scalars())
+        await announce_new_messages(session, message_ids)
+
+    embedding_trigger.push(message_ids)
+
+
+class IngestionBuffer:
+    """Write-behind buffer that turns a stream of messages into batched inserts.
+
+    Messages are collected until ``max_batch_size`` rows are pending or
+    ``flush_seconds`` have passed since the first one arrived, then written in
+    a single transaction. ``submit`` blocks once ``max_pending`` messages are
+    waiting, pushing back on the gateway instead of growing without bound.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = settings.INGEST_MAX_BATCH_SIZE,
+        flush_seconds: float = settings.INGEST_FLUSH_SECONDS,
+        max_pending: int = settings.INGEST_MAX_PENDING,
+    ):
+        self.max_batch_size = max_batch_size
+        self.flush_seconds = flush_seconds
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything submitted so far and stop the writer."""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def submit(self, message: PendingMessage) -> None:
+        await self._queue.put(message)
+
+    async def _write(self, batch: list[PendingMessage]) -> None:
+        months = {
+            month_start(m.created_at) for m in batch if m.discord_guild_id is not None
+        }
+        await ensure_months(months)
+        try:
+            await write_messages(batch)
+        except IntegrityError:
+            # A cached parent row may have been deleted, or a partition
+            # retired, before we heard of it; resolve everything afresh once
+            logger.warning("Integrity error while saving messages, retrying")
+            identity_cache.clear()
+            forget_known_months()
+            await ensure_months(months)
+            await write_messages(batch)
+
+    async def _flush(self, batch: list[PendingMessage]) -> None:
+        try:
+            await self._write(batch)
+            logger.info(f"Saved {len(batch)} messages to database")
+        except DBAPIError as e:
+            if e.connection_invalidated:
+                # The database went away; no single row is to blame
+                logger.exception(f"Lost {len(batch)} messages, connection dropped: {e}")
+                return
+            if len(batch) == 1:
+                logger.error(
+                    f"Skipping message {batch[0].discord_message_id} "
+                    f"that can't be saved: {e}"
+                )
+                metrics.increment("messages_ingest_skipped")
+                return
+            # Usually one bad row; halve the batch until only it is left out
+            logger.warning(f"Error saving {len(batch)} messages, splitting: {e}")
+            middle = len(batch) // 2
+            await self._flush(batch[:middle])
+            await self._flush(batch[middle:])
+        except Exception as e:
+            logger.exception(f"Error saving {len(batch)} messages to database: {e}")
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.flush_seconds
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+
+ingestion_buffer = IngestionBuffer()
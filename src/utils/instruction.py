@@ -0,0 +1,104 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.core.database import AsyncSessionLocal
+from src.core.logging import logger
+from src.core.metrics import metrics
+from src.core.notify import notify, pg_listener
+from src.models import Agent, Channel
+from src.utils.cache import TTLCache
+from src.utils.identity import resolve_channel_id
+
+INSTRUCTION_CHANNEL = "instruction_invalidation"
+
+
+class InstructionCache:
+    """Admin instructions keyed by Discord (guild id, channel id).
+
+    Channels without an agent are cached as an empty instruction too. The
+    ``/instruction`` command drops the entry it changes, here and, through
+    NOTIFY, in every other process.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = settings.INSTRUCTION_CACHE_SIZE,
+        ttl: float = settings.INSTRUCTION_CACHE_TTL_SECONDS,
+    ):
+        self.entries: TTLCache[tuple[str, str], str] = TTLCache(maxsize, ttl)
+        # Bumped on every invalidation, so a lookup that raced with one
+        # doesn't put the old instruction back
+        self.generation = 0
+
+    def invalidate(self, guild_id: str, channel_id: str) -> None:
+        self.generation += 1
+        self.entries.pop((guild_id, channel_id))
+
+    def clear(self) -> None:
+        self.generation += 1
+        self.entries.clear()
+
+
+instruction_cache = InstructionCache()
+
+
+async def get_admin_instruction(guild_id: str, channel_id: str) -> str:
+    if not guild_id and not channel_id:
+        return ""
+
+    key = (guild_id, channel_id)
+    instruction = instruction_cache.entries.get(key)
+    if instruction is not None:
+        metrics.increment("instruction_cache_hits")
+        return instruction
+
+    generation = instruction_cache.generation
+    async with AsyncSessionLocal() as session:
+        try:
+            # Discord channel ids are globally unique, so the channel alone
+            # identifies the row
+            db_channel_id = await resolve_channel_id(session, channel_id)
+            instruction = ""
+            if db_channel_id is not None:
+                result = await session.execute(
+                    select(Agent.instruction)
+                    .join(Channel, Channel.agent_id == Agent.id)
+                    .where(Channel.id == db_channel_id)
+                )
+                instruction = result.scalar_one_or_none() or ""
+        except Exception as e:
+            logger.exception(
+                f"Error retrieving admin instruction for guild {guild_id}: {e}"
+            )
+            return ""
+
+    metrics.increment("instruction_cache_misses")
+    if generation == instruction_cache.generation:
+        instruction_cache.entries.set(key, instruction)
+    return instruction
+
+
+async def announce_instruction_change(
+    session: AsyncSession, guild_id: str, channel_id: str
+) -> None:
+    """Tell the other processes to drop the instruction once ``session`` commits.
+
+    The caller drops its own entry with ``instruction_cache.invalidate``
+    after the commit, so no lookup in between can cache the old value again.
+    """
+    await notify(session, INSTRUCTION_CHANNEL, f"{guild_id}:{channel_id}")
+
+
+def _on_instruction_changed(payload: str) -> None:
+    guild_id, _, channel_id = payload.partition(":")
+    instruction_cache.invalidate(guild_id, channel_id)
+
+
+def _on_listener_connected() -> None:
+    # Instructions may have changed while we weren't listening
+    instruction_cache.clear()
+
+
+pg_listener.subscribe(INSTRUCTION_CHANNEL, _on_instruction_changed)
+pg_listener.on_connect(_on_listener_connected)
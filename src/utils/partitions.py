@@ -0,0 +1,289 @@
+import asyncio
+from collections.abc import Iterable
+from datetime import UTC, date, datetime, timedelta
+import re
+import uuid
+
+import psycopg
+from psycopg import sql
+
+from src.core.config import settings
+from src.core.database import libpq_dsn
+from src.core.logging import logger
+from src.core.metrics import metrics
+from src.utils.hot_tier import announce_eviction
+
+# messages is range-partitioned by month on created_at, one partition per
+# month named messages_pYYYY_MM. There is no default partition, which
+# would rule out detaching partitions concurrently; inserts create the
+# partitions they miss instead (see ensure_months).
+PARTITION_PATTERN = re.compile(r"^messages_p(\d{4})_(\d{2})$")
+
+# Months this process knows to have a partition, so inserts skip the check
+_known_months: set[date] = set()
+
+# Only one replica runs maintenance at a time
+MAINTENANCE_LOCK_KEY = 0x7061_7274  # "part"
+
+
+def is_partition(table_name: str) -> bool:
+    return bool(PARTITION_PATTERN.match(table_name))
+
+
+def month_start(moment: datetime | date) -> date:
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"messages_p{month.year:04d}_{month.month:02d}"
+
+
+def _bound(month: date) -> datetime:
+    return datetime(month.year, month.month, 1, tzinfo=UTC)
+
+
+async def _partitions(conn: psycopg.AsyncConnection) -> dict[date, str]:
+    cursor = await conn.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'messages'::regclass
+        """
+    )
+    partitions = {}
+    for (name,) in await cursor.fetchall():
+        if match := PARTITION_PATTERN.match(name):
+            partitions[date(int(match[1]), int(match[2]), 1)] = name
+    return partitions
+
+
+async def _create_partition(conn: psycopg.AsyncConnection, month: date) -> None:
+    await conn.execute(
+        sql.SQL(
+            "CREATE TABLE IF NOT EXISTS {} PARTITION OF messages "
+            "FOR VALUES FROM ({}) TO ({})"
+        ).format(
+            sql.Identifier(partition_name(month)),
+            sql.Literal(_bound(month)),
+            sql.Literal(_bound(add_months(month, 1))),
+        )
+    )
+    metrics.increment("message_partitions_created")
+    logger.info(f"Created message partition {partition_name(month)}")
+
+
+async def ensure_partitions(
+    conn: psycopg.AsyncConnection, ahead: int = settings.MESSAGE_PARTITIONS_AHEAD
+) -> None:
+    """Create the partitions of this month and the next ``ahead`` months."""
+    existing = await _partitions(conn)
+    this_month = month_start(datetime.now(UTC))
+    for offset in range(ahead + 1):
+        month = add_months(this_month, offset)
+        if month not in existing:
+            await _create_partition(conn, month)
+
+
+async def ensure_months(months: Iterable[date]) -> None:
+    """Create the partitions of ``months`` that are missing, before inserting.
+
+    Rows outside the months created ahead, from backfilled history, clock
+    skew or a maintenance loop that fell behind, would otherwise fail to
+    insert. Creating a partition briefly locks ``messages``, so it runs
+    outside the insert's transaction; in steady state nothing is queried.
+    """
+    missing = set(months) - _known_months
+    if not missing:
+        return
+    async with await psycopg.AsyncConnection.connect(
+        libpq_dsn(), autocommit=True
+    ) as conn:
+        existing = await _partitions(conn)
+        for month in sorted(missing - existing.keys()):
+            await _create_partition(conn, month)
+    _known_months.update(missing)
+
+
+def forget_known_months() -> None:
+    """Check again on the next insert, e.g. after another replica retired one."""
+    _known_months.clear()
+
+
+async def _retention_policies(
+    conn: psycopg.AsyncConnection,
+) -> list[tuple[uuid.UUID, int | None]]:
+    """Each guild's retention in days, ``None`` meaning forever."""
+    cursor = await conn.execute("SELECT id, retention_days FROM guilds")
+    return [
+        (guild_id, days if days is not None else settings.MESSAGE_RETENTION_DAYS)
+        for guild_id, days in await cursor.fetchall()
+    ]
+
+
+async def _archive_or_drop(conn: psycopg.AsyncConnection, name: str) -> None:
+    if settings.MESSAGE_ARCHIVE_SCHEMA:
+        await conn.execute(
+            sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(
+                sql.Identifier(settings.MESSAGE_ARCHIVE_SCHEMA)
+            )
+        )
+        await conn.execute(
+            sql.SQL("ALTER TABLE {} SET SCHEMA {}").format(
+                sql.Identifier(name), sql.Identifier(settings.MESSAGE_ARCHIVE_SCHEMA)
+            )
+        )
+        metrics.increment("message_partitions_archived")
+        logger.info(
+            f"Archived message partition {name} to {settings.MESSAGE_ARCHIVE_SCHEMA}"
+        )
+    else:
+        await conn.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+        metrics.increment("message_partitions_dropped")
+        logger.info(f"Dropped message partition {name}")
+
+
+async def _retire_partition(
+    conn: psycopg.AsyncConnection, name: str, month: date
+) -> None:
+    # CONCURRENTLY only takes a SHARE UPDATE EXCLUSIVE lock on messages, so
+    # reads and writes go on; it can't run inside a transaction block, which
+    # the autocommit connection guarantees
+    await conn.execute(
+        sql.SQL("ALTER TABLE messages DETACH PARTITION {} CONCURRENTLY").format(
+            sql.Identifier(name)
+        )
+    )
+    await _archive_or_drop(conn, name)
+    _known_months.discard(month)
+    await announce_eviction(
+        conn, None, _bound(add_months(month, 1)), since=_bound(month)
+    )
+
+
+async def _finish_interrupted_detaches(conn: psycopg.AsyncConnection) -> None:
+    """Complete concurrent detaches cut short, e.g. by a restart."""
+    cursor = await conn.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'messages'::regclass AND i.inhdetachpending
+        """
+    )
+    for (name,) in await cursor.fetchall():
+        await conn.execute(
+            sql.SQL("ALTER TABLE messages DETACH PARTITION {} FINALIZE").format(
+                sql.Identifier(name)
+            )
+        )
+        await _archive_or_drop(conn, name)
+        if match := PARTITION_PATTERN.match(name):
+            month = date(int(match[1]), int(match[2]), 1)
+            _known_months.discard(month)
+            await announce_eviction(
+                conn, None, _bound(add_months(month, 1)), since=_bound(month)
+            )
+
+
+async def _has_rows_of(
+    conn: psycopg.AsyncConnection, name: str, guild_ids: list[uuid.UUID]
+) -> bool:
+    if not guild_ids:
+        return False
+    # One probe of the (guild_id, created_at) index per guild
+    cursor = await conn.execute(
+        sql.SQL("SELECT EXISTS (SELECT 1 FROM {} WHERE guild_id = ANY(%s))").format(
+            sql.Identifier(name)
+        ),
+        (guild_ids,),
+    )
+    return (await cursor.fetchone())[0]
+
+
+async def _purge_rows(
+    conn: psycopg.AsyncConnection, guild_id: uuid.UUID, before: datetime
+) -> None:
+    # Batched so no single statement holds locks on many rows for long
+    stmt = sql.SQL(
+        "DELETE FROM messages WHERE (id, created_at) IN ("
+        "SELECT id, created_at FROM messages "
+        "WHERE guild_id = {} AND created_at < {} LIMIT {})"
+    ).format(
+        sql.Literal(guild_id),
+        sql.Literal(before),
+        sql.Literal(settings.MESSAGE_PURGE_BATCH_SIZE),
+    )
+    purged = 0
+    while True:
+        cursor = await conn.execute(stmt)
+        metrics.increment("messages_purged", cursor.rowcount)
+        purged += cursor.rowcount
+        if cursor.rowcount < settings.MESSAGE_PURGE_BATCH_SIZE:
+            break
+    if purged:
+        await announce_eviction(conn, guild_id, before)
+
+
+async def apply_retention(conn: psycopg.AsyncConnection) -> None:
+    """Drop, or archive, the partitions no guild keeps messages of anymore.
+
+    A month is retired, with a detach and a drop regardless of its size,
+    once none of the guilds that still keep any of it has messages in it.
+    Guilds keeping messages forever therefore only hold on to the months
+    they wrote in. Expired messages of other guilds in the months that
+    stay are deleted in batches.
+    """
+    await _finish_interrupted_detaches(conn)
+    policies = await _retention_policies(conn)
+    now = datetime.now(UTC)
+    cutoffs = {
+        guild_id: now - timedelta(days=days)
+        for guild_id, days in policies
+        if days is not None
+    }
+    keep_forever = [guild_id for guild_id, days in policies if days is None]
+
+    for month, name in sorted((await _partitions(conn)).items()):
+        end = _bound(add_months(month, 1))
+        if end > now:
+            break
+        keepers = keep_forever + [
+            guild_id for guild_id, cutoff in cutoffs.items() if cutoff < end
+        ]
+        if not await _has_rows_of(conn, name, keepers):
+            await _retire_partition(conn, name, month)
+
+    for guild_id, cutoff in cutoffs.items():
+        await _purge_rows(conn, guild_id, cutoff)
+
+
+async def maintain_partitions() -> None:
+    async with await psycopg.AsyncConnection.connect(
+        libpq_dsn(), autocommit=True
+    ) as conn:
+        cursor = await conn.execute(
+            "SELECT pg_try_advisory_lock(%s)", (MAINTENANCE_LOCK_KEY,)
+        )
+        if not (await cursor.fetchone())[0]:
+            return
+        try:
+            await ensure_partitions(conn)
+            await apply_retention(conn)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock(%s)", (MAINTENANCE_LOCK_KEY,))
+
+
+async def run_partition_maintenance(
+    interval: float = settings.MESSAGE_PARTITION_CHECK_SECONDS,
+) -> None:
+    """Create upcoming partitions and apply retention at startup and periodically."""
+    while True:
+        try:
+            await maintain_partitions()
+        except Exception as e:
+            logger.exception(f"Error maintaining message partitions: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,100 @@
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from discord import Message as DiscordMessageContext
+
+from src.core.config import settings
+
+
+class RecentMessage:
+    """One message as the agent needs to see it; slots keep it small."""
+
+    __slots__ = ("author", "content", "created_at", "is_bot", "message_id")
+
+    def __init__(
+        self,
+        message_id: int,
+        author: str,
+        content: str,
+        created_at: datetime,
+        is_bot: bool,
+    ):
+        self.message_id = message_id
+        self.author = author
+        self.content = content
+        self.created_at = created_at
+        self.is_bot = is_bot
+
+
+class RecentMessages:
+    """The last ``per_channel`` messages of each of the ``channels`` most
+    active channels, kept in memory as they arrive.
+
+    Each channel is a ring buffer, so memory stays bounded by
+    ``channels * per_channel`` messages of at most ``max_chars`` characters.
+    Only messages seen by this process since it started are held. Edited
+    messages, such as streamed replies, are kept current through ``update``
+    and deleted ones dropped through ``remove``.
+    """
+
+    def __init__(
+        self,
+        per_channel: int = settings.RECENT_MESSAGES_PER_CHANNEL,
+        channels: int = settings.RECENT_MESSAGES_CHANNELS,
+        max_chars: int = settings.RECENT_MESSAGES_MAX_CHARS,
+    ):
+        self.per_channel = per_channel
+        self.max_channels = channels
+        self.max_chars = max_chars
+        self._channels: OrderedDict[int, deque[RecentMessage]] = OrderedDict()
+        # Message id to its channel and record, for edits and deletions
+        self._by_id: dict[int, tuple[int, RecentMessage]] = {}
+
+    def add(self, message: DiscordMessageContext) -> None:
+        buffer = self._channels.get(message.channel.id)
+        if buffer is None:
+            buffer = deque(maxlen=self.per_channel)
+            self._channels[message.channel.id] = buffer
+            while len(self._channels) > self.max_channels:
+                _, dropped = self._channels.popitem(last=False)
+                for record in dropped:
+                    self._by_id.pop(record.message_id, None)
+        else:
+            self._channels.move_to_end(message.channel.id)
+
+        if len(buffer) == buffer.maxlen:
+            self._by_id.pop(buffer[0].message_id, None)
+        record = RecentMessage(
+            message_id=message.id,
+            author=message.author.display_name,
+            content=message.content[: self.max_chars],
+            created_at=message.created_at,
+            is_bot=message.author.bot,
+        )
+        buffer.append(record)
+        self._by_id[message.id] = (message.channel.id, record)
+
+    def update(self, message_id: int, content: str) -> None:
+        entry = self._by_id.get(message_id)
+        if entry is not None:
+            entry[1].content = content[: self.max_chars]
+
+    def remove(self, message_id: int) -> None:
+        entry = self._by_id.pop(message_id, None)
+        if entry is None:
+            return
+        channel_id, record = entry
+        buffer = self._channels.get(channel_id)
+        if buffer is not None:
+            buffer.remove(record)
+
+    def get(self, channel_id: int, limit: int | None = None) -> list[RecentMessage]:
+        """Up to ``limit`` of the channel's latest messages, oldest first."""
+        buffer = self._channels.get(channel_id)
+        if not buffer:
+            return []
+        messages = list(buffer)
+        return messages[-limit:] if limit else messages
+
+
+recent_messages = RecentMessages()
@@ -0,0 +1,289 @@
+import asyncio
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+from datetime import datetime
+import uuid
+
+from sqlalchemy import cast, func, select
+from sqlalchemy.dialects.postgresql import REGCONFIG, TSQUERY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core import logger
+from src.core.config import settings
+from src.core.database import AsyncSessionLocal
+from src.core.metrics import metrics
+from src.models import Message
+from src.utils.cache import TTLCache
+from src.utils.embedding import get_query_embedding
+from src.utils.hot_tier import hot_tier
+from src.utils.vector_index import ann_distance, vector_index_manager
+
+SearchScope = tuple[uuid.UUID, uuid.UUID | None]
+
+# Damps the weight of the top ranks in reciprocal rank fusion; 60 is the
+# value from the original paper and works well without tuning
+RRF_K = 60
+
+# Embedded message counts per (guild, channel), capped just above the exact
+# search limit; scopes only ever grow past it
+_scope_sizes: TTLCache[SearchScope, int] = TTLCache(
+    maxsize=10_000, ttl=settings.SEARCH_SCOPE_CACHE_TTL_SECONDS
+)
+
+
+def _scope_filter(guild_id: uuid.UUID, channel_id: uuid.UUID | None) -> list:
+    conditions = [Message.guild_id == guild_id, Message.embedding.is_not(None)]
+    if channel_id is not None:
+        conditions.append(Message.channel_id == channel_id)
+    return conditions
+
+
+async def _scope_size(
+    session: AsyncSession, guild_id: uuid.UUID, channel_id: uuid.UUID | None
+) -> int:
+    scope = (guild_id, channel_id)
+    size = _scope_sizes.get(scope)
+    if size is None:
+        rows = (
+            select(Message.id)
+            .where(*_scope_filter(guild_id, channel_id))
+            .limit(settings.SEARCH_EXACT_MAX_ROWS + 1)
+            .subquery()
+        )
+        size = await session.scalar(select(func.count()).select_from(rows))
+        _scope_sizes.set(scope, size)
+    return size
+
+
+def _time_filter(since: datetime | None, until: datetime | None) -> list:
+    conditions = []
+    if since is not None:
+        conditions.append(Message.created_at >= since)
+    if until is not None:
+        conditions.append(Message.created_at <= until)
+    return conditions
+
+
+async def _stored_candidates(
+    session: AsyncSession,
+    guild_id: uuid.UUID,
+    channel_id: uuid.UUID | None,
+    query_embedding: list[float],
+    limit: int,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> list[tuple[float, uuid.UUID]]:
+    """The ``limit`` messages in scope closest to ``query_embedding`` in Postgres.
+
+    Scopes with at most ``SEARCH_EXACT_MAX_ROWS`` embedded messages are
+    searched exactly, reading only their rows through the guild or channel
+    index. Larger ones use the vector index with an iterative scan
+    filtered to the scope, so either way the cost follows the size of the
+    guild rather than of the whole table. Index candidates are re-ranked by
+    their exact distance, which matters when the index is quantized.
+    """
+    scope = [*_scope_filter(guild_id, channel_id), *_time_filter(since, until)]
+    distance = Message.embedding.cosine_distance(query_embedding)
+    if await _scope_size(session, guild_id, channel_id) <= (
+        settings.SEARCH_EXACT_MAX_ROWS
+    ):
+        metrics.increment("search_exact")
+        # Adding zero keeps the planner off the vector index, which would
+        # have to filter its way through every other guild
+        stmt = (
+            select(distance, Message.id)
+            .where(*scope)
+            .order_by(distance + 0)
+            .limit(limit)
+        )
+    else:
+        metrics.increment("search_ann")
+        # A compact index only approximates the distance, so it yields a
+        # few times more candidates, re-ranked on their full vectors
+        candidate_limit = limit
+        if settings.VECTOR_INDEX_QUANTIZATION != "none":
+            candidate_limit *= settings.SEARCH_RERANK_FACTOR
+        await vector_index_manager.configure(session, candidate_limit)
+        approximate = ann_distance(query_embedding)
+        candidates = (
+            select(Message.id, Message.embedding)
+            .where(*scope)
+            .order_by(approximate)
+            .limit(candidate_limit)
+            .cte("candidates")
+            .prefix_with("MATERIALIZED")
+        )
+        exact = candidates.c.embedding.cosine_distance(query_embedding)
+        stmt = select(exact, candidates.c.id).order_by(exact).limit(limit)
+
+    return [
+        (distance, message_id) for distance, message_id in await session.execute(stmt)
+    ]
+
+
+async def _vector_candidates(
+    guild_id: uuid.UUID,
+    channel_id: uuid.UUID | None,
+    query_embedding: list[float],
+    limit: int,
+    since: datetime | None = None,
+) -> list[uuid.UUID]:
+    """Ids of the ``limit`` messages in scope closest to ``query_embedding``.
+
+    Recent messages are searched in the in-memory hot tier. Postgres is
+    only queried for the older range the hot tier doesn't cover, so a
+    search confined to recent messages (``since``) never leaves the process.
+    """
+    hot = await hot_tier.search(guild_id, channel_id, query_embedding, limit, since)
+    if hot is not None and (
+        hot.covered_after is None or (since is not None and since > hot.covered_after)
+    ):
+        metrics.increment("search_hot")
+        return [message_id for _, message_id in hot.ranked]
+
+    async with AsyncSessionLocal() as session:
+        stored = await _stored_candidates(
+            session,
+            guild_id,
+            channel_id,
+            query_embedding,
+            limit,
+            since,
+            hot.covered_after if hot is not None else None,
+        )
+    if hot is None:
+        return [message_id for _, message_id in stored]
+
+    # Messages created exactly at the boundary can be in both
+    distances: dict[uuid.UUID, float] = {}
+    for distance, message_id in [*hot.ranked, *stored]:
+        distances[message_id] = min(distance, distances.get(message_id, distance))
+    return sorted(distances, key=distances.__getitem__)[:limit]
+
+
+def _lexical_query(query: str):
+    # Any of the words may match, messages with more of them rank higher.
+    # The parser keeps URLs, hosts and version numbers as tokens of their own.
+    # The lexemes are already normalized, so they're quoted and OR-ed into a
+    # tsquery literal rather than parsed again by to_tsquery
+    lexeme = func.unnest(
+        func.tsvector_to_array(func.to_tsvector(cast("simple", REGCONFIG), query))
+    ).column_valued("lexeme")
+    quoted = "'" + func.replace(func.replace(lexeme, "\\", "\\\\"), "'", "''") + "'"
+    return cast(select(func.string_agg(quoted, " | ")).scalar_subquery(), TSQUERY)
+
+
+async def _lexical_candidates(
+    guild_id: uuid.UUID,
+    channel_id: uuid.UUID | None,
+    query: str,
+    limit: int,
+    since: datetime | None = None,
+) -> list[uuid.UUID]:
+    """Ids of the ``limit`` messages in scope matching ``query``'s words best.
+
+    Unlike the vector search this also finds messages that have not been
+    embedded yet.
+    """
+    tsquery = _lexical_query(query)
+    conditions = [Message.guild_id == guild_id, Message.content_tsv.op("@@")(tsquery)]
+    if channel_id is not None:
+        conditions.append(Message.channel_id == channel_id)
+    conditions.extend(_time_filter(since, None))
+
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(Message.id)
+            .where(*conditions)
+            .order_by(func.ts_rank_cd(Message.content_tsv, tsquery).desc())
+            .limit(limit)
+        )
+        return list(result.scalars())
+
+
+def reciprocal_rank_fusion(
+    rankings: Iterable[Sequence[uuid.UUID]], k: int = RRF_K
+) -> list[uuid.UUID]:
+    """Merge ranked id lists, scoring each id by the sum of 1 / (k + rank)."""
+    scores: defaultdict[uuid.UUID, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, message_id in enumerate(ranking, start=1):
+            scores[message_id] += 1 / (k + rank)
+    return sorted(scores, key=scores.__getitem__, reverse=True)
+
+
+async def _load_messages(message_ids: Sequence[uuid.UUID]) -> list[Message]:
+    if not message_ids:
+        return []
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(Message).where(Message.id.in_(message_ids))
+        )
+        by_id = {message.id: message for message in result.scalars()}
+    return [by_id[message_id] for message_id in message_ids if message_id in by_id]
+
+
+def _log_results(messages: Sequence[Message]) -> None:
+    logger.info(f"Found {len(messages)} similar messages:")
+    for i, msg in enumerate(messages, start=1):
+        logger.info(f"  {i}. {msg.content}")
+
+
+async def find_similar_messages(
+    query: str,
+    guild_id: uuid.UUID,
+    channel_id: uuid.UUID | None = None,
+    top_k: int = 5,
+    query_embedding: list[float] | None = None,
+    since: datetime | None = None,
+) -> Sequence[Message]:
+    """Return the ``top_k`` messages of a guild, or one of its channels,
+    semantically closest to ``query``, optionally only those sent ``since``."""
+    if query_embedding is None:
+        query_embedding = await get_query_embedding(query)
+    if query_embedding is None:
+        return []
+
+    message_ids = await _vector_candidates(
+        guild_id, channel_id, query_embedding, top_k, since
+    )
+    messages = await _load_messages(message_ids)
+    _log_results(messages)
+    return messages
+
+
+async def search_messages(
+    query: str,
+    guild_id: uuid.UUID,
+    channel_id: uuid.UUID | None = None,
+    top_k: int = 5,
+    query_embedding: list[float] | None = None,
+    since: datetime | None = None,
+) -> Sequence[Message]:
+    """Hybrid search: full-text and vector candidates merged by rank fusion.
+
+    Both candidate lists (``SEARCH_HYBRID_CANDIDATES`` each) are fetched
+    concurrently, the full-text one while the query is still being
+    embedded. Exact tokens such as error codes, usernames and URLs are
+    found by the full-text side even when their embeddings aren't close,
+    or don't exist yet. If the query can't be embedded, full-text results
+    are returned alone. ``since`` limits both to recent messages.
+    """
+    limit = max(settings.SEARCH_HYBRID_CANDIDATES, top_k)
+
+    async def vector_ranking() -> list[uuid.UUID]:
+        embedding = query_embedding
+        if embedding is None:
+            embedding = await get_query_embedding(query)
+        if embedding is None:
+            return []
+        return await _vector_candidates(guild_id, channel_id, embedding, limit, since)
+
+    lexical, semantic = await asyncio.gather(
+        _lexical_candidates(guild_id, channel_id, query, limit, since),
+        vector_ranking(),
+    )
+    metrics.increment("search_hybrid")
+    messages = await _load_messages(reciprocal_rank_fusion([lexical, semantic])[:top_k])
+    _log_results(messages)
+    return messages
@@ -0,0 +1,380 @@
+import asyncio
+from collections.abc import Iterable
+import math
+import re
+import time
+from typing import Literal, NamedTuple
+
+from pgvector.sqlalchemy import BIT, HALFVEC, Vector
+import psycopg
+from psycopg import sql
+from sqlalchemy import cast, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.core.database import libpq_dsn
+from src.core.logging import logger
+from src.core.metrics import metrics
+from src.models import Message
+from src.utils.embedding import EMBEDDING_DIMENSIONS
+
+VectorIndexMethod = Literal["ivfflat", "hnsw"]
+Quantization = Literal["none", "halfvec", "binary"]
+
+# The manager owns every ivfflat/hnsw index on the messages partitions
+INDEX_SUFFIX = "_embedding_ann"
+BUILD_INDEX_SUFFIX = "_embedding_ann_build"
+
+# Only one replica builds at a time
+BUILD_LOCK_KEY = 0x7665_6374  # "vect"
+
+# An ivfflat index is re-clustered once the table has grown or shrunk so much
+# that the planned number of lists is this far off the built one
+IVFFLAT_RECLUSTER_FACTOR = 2
+
+# First pgvector release with hnsw.iterative_scan and ivfflat.iterative_scan
+ITERATIVE_SCAN_VERSION = (0, 8)
+
+
+class IndexPlan(NamedTuple):
+    method: VectorIndexMethod | None
+    options: dict[str, int]
+    quantization: Quantization = "none"
+
+
+class VectorIndex(NamedTuple):
+    table: str
+    name: str
+    method: VectorIndexMethod
+    options: dict[str, int]
+    quantization: Quantization
+    valid: bool
+
+
+def index_element(
+    quantization: Quantization, dimensions: int = EMBEDDING_DIMENSIONS
+) -> sql.Composable:
+    """The indexed expression and operator class for a representation.
+
+    ``halfvec`` stores 2-byte floats, halving the index. ``binary`` keeps
+    one bit per dimension (its sign) and compares by Hamming distance,
+    making the index 32 times smaller than full precision. Either way the
+    table keeps the full vectors, which the search re-ranks with.
+    """
+    if quantization == "halfvec":
+        return sql.SQL("(embedding::halfvec({})) halfvec_cosine_ops").format(
+            sql.Literal(dimensions)
+        )
+    if quantization == "binary":
+        return sql.SQL("(binary_quantize(embedding)::bit({})) bit_hamming_ops").format(
+            sql.Literal(dimensions)
+        )
+    return sql.SQL("embedding vector_cosine_ops")
+
+
+def ann_distance(
+    query_embedding: list[float],
+    quantization: Quantization = settings.VECTOR_INDEX_QUANTIZATION,
+):
+    """Distance to order by so the planner can use the ``index_element`` index."""
+    if quantization == "halfvec":
+        return cast(Message.embedding, HALFVEC(EMBEDDING_DIMENSIONS)).cosine_distance(
+            query_embedding
+        )
+    if quantization == "binary":
+        return cast(
+            func.binary_quantize(Message.embedding), BIT(EMBEDDING_DIMENSIONS)
+        ).hamming_distance(
+            cast(
+                func.binary_quantize(
+                    literal(query_embedding, Vector(EMBEDDING_DIMENSIONS))
+                ),
+                BIT(EMBEDDING_DIMENSIONS),
+            )
+        )
+    return Message.embedding.cosine_distance(query_embedding)
+
+
+def _parse_quantization(indexdef: str) -> Quantization:
+    if "bit_hamming_ops" in indexdef:
+        return "binary"
+    if "halfvec_cosine_ops" in indexdef:
+        return "halfvec"
+    return "none"
+
+
+def plan_index(rows: int) -> IndexPlan:
+    """The vector index a ``messages`` partition should have at ``rows`` rows.
+
+    Small partitions are searched exactly. With ``VECTOR_INDEX_METHOD=auto``,
+    mid-sized ones get an ivfflat index, which is quick to build and is
+    re-clustered as the table grows; from ``VECTOR_INDEX_HNSW_MIN_ROWS``
+    on an HNSW index, which needs no re-clustering and keeps its recall as
+    rows are added.
+    """
+    if rows < settings.VECTOR_INDEX_MIN_ROWS:
+        return IndexPlan(None, {})
+    quantization = settings.VECTOR_INDEX_QUANTIZATION
+
+    method = settings.VECTOR_INDEX_METHOD
+    if method == "auto":
+        method = "hnsw" if rows >= settings.VECTOR_INDEX_HNSW_MIN_ROWS else "ivfflat"
+
+    if method == "hnsw":
+        return IndexPlan(
+            "hnsw",
+            {
+                "m": settings.VECTOR_INDEX_HNSW_M,
+                "ef_construction": settings.VECTOR_INDEX_HNSW_EF_CONSTRUCTION,
+            },
+            quantization,
+        )
+
+    # pgvector's guidance: rows / 1000 lists up to 1M rows, sqrt(rows) above
+    lists = rows // 1000 if rows <= 1_000_000 else int(math.sqrt(rows))
+    return IndexPlan("ivfflat", {"lists": max(lists, 10)}, quantization)
+
+
+def needs_rebuild(current: VectorIndex | None, plan: IndexPlan) -> bool:
+    if plan.method is None:
+        # Dropping an existing index wouldn't make anything faster
+        return False
+    if (
+        current is None
+        or not current.valid
+        or current.method != plan.method
+        or current.quantization != plan.quantization
+    ):
+        return True
+    if plan.method == "ivfflat":
+        built, planned = current.options.get("lists", 100), plan.options["lists"]
+        return (
+            planned >= built * IVFFLAT_RECLUSTER_FACTOR
+            or planned * IVFFLAT_RECLUSTER_FACTOR <= built
+        )
+    return current.options != plan.options
+
+
+def query_settings(indexes: Iterable[VectorIndex], top_k: int) -> dict[str, str]:
+    """Per-query scan settings for the indexes the planner will use.
+
+    One query scans the indexes of every partition with the same settings,
+    so probes follow the partition with the most lists.
+    """
+    lists = max(
+        (i.options.get("lists", 100) for i in indexes if i.method == "ivfflat"),
+        default=100,
+    )
+    return {
+        # pgvector's starting point for recall vs. speed
+        "ivfflat.probes": str(max(math.ceil(math.sqrt(lists)), 1)),
+        # HNSW can't return more rows than its candidate list holds
+        "hnsw.ef_search": str(max(settings.VECTOR_INDEX_EF_SEARCH, top_k)),
+    }
+
+
+def _parse_options(reloptions: list[str] | None) -> dict[str, int]:
+    options = {}
+    for option in reloptions or []:
+        key, _, value = option.partition("=")
+        options[key] = int(value)
+    return options
+
+
+class VectorIndexManager:
+    """Keeps a vector index on each ``messages`` partition fitted to its size.
+
+    ``reconcile`` compares each partition's index with ``plan_index`` for
+    the partition's row count and, when they differ, builds the planned one
+    under a temporary name with ``CREATE INDEX CONCURRENTLY``, drops the old
+    one and renames the new one into place. Writes and searches carry on
+    during the build. Past months stop changing, so in practice only the
+    current month's partition gets re-clustered. Every replica inspects the
+    indexes to pick its query settings; an advisory lock lets only one of
+    them build.
+    """
+
+    def __init__(self):
+        self.indexes: dict[str, VectorIndex] = {}
+        # Off until reconcile has seen the installed pgvector version
+        self.iterative_scan = False
+
+    async def _partitions(self, conn: psycopg.AsyncConnection) -> dict[str, int]:
+        # The planner's row estimates; exact counts would scan every partition
+        cursor = await conn.execute(
+            """
+            SELECT c.relname, c.reltuples::bigint
+            FROM pg_inherits h JOIN pg_class c ON c.oid = h.inhrelid
+            WHERE h.inhparent = 'messages'::regclass
+            """
+        )
+        return {name: max(rows, 0) for name, rows in await cursor.fetchall()}
+
+    async def _pgvector_version(self, conn: psycopg.AsyncConnection) -> tuple[int, ...]:
+        cursor = await conn.execute(
+            "SELECT extversion FROM pg_extension WHERE extname = 'vector'"
+        )
+        row = await cursor.fetchone()
+        if row is None:
+            return ()
+        return tuple(int(part) for part in re.findall(r"\d+", row[0]))
+
+    async def _inspect(self, conn: psycopg.AsyncConnection) -> list[VectorIndex]:
+        cursor = await conn.execute(
+            """
+            SELECT t.relname, c.relname, am.amname, c.reloptions,
+                   pg_get_indexdef(c.oid), i.indisvalid
+            FROM pg_inherits h
+            JOIN pg_index i ON i.indrelid = h.inhrelid
+            JOIN pg_class t ON t.oid = i.indrelid
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_am am ON am.oid = c.relam
+            WHERE h.inhparent = 'messages'::regclass
+              AND am.amname IN ('ivfflat', 'hnsw')
+            """
+        )
+        return [
+            VectorIndex(
+                table,
+                name,
+                method,
+                _parse_options(reloptions),
+                _parse_quantization(indexdef),
+                valid,
+            )
+            for table, name, method, reloptions, indexdef, valid in (
+                await cursor.fetchall()
+            )
+        ]
+
+    def _current(self, indexes: list[VectorIndex]) -> dict[str, VectorIndex]:
+        return {
+            i.table: i for i in indexes if i.name == i.table + INDEX_SUFFIX and i.valid
+        }
+
+    async def reconcile(self) -> None:
+        async with await psycopg.AsyncConnection.connect(
+            libpq_dsn(), autocommit=True
+        ) as conn:
+            # Older versions reserve the hnsw. and ivfflat. prefixes, so
+            # setting an option they don't know fails the whole search
+            self.iterative_scan = (
+                settings.SEARCH_ITERATIVE_SCAN
+                and await self._pgvector_version(conn) >= ITERATIVE_SCAN_VERSION
+            )
+            partitions = await self._partitions(conn)
+            indexes = await self._inspect(conn)
+            self.indexes = self._current(indexes)
+            metrics.set_gauge("vector_index_rows", sum(partitions.values()))
+
+            plans = {
+                table: plan
+                for table, rows in partitions.items()
+                if needs_rebuild(self.indexes.get(table), plan := plan_index(rows))
+            }
+            if not plans:
+                return
+
+            cursor = await conn.execute(
+                "SELECT pg_try_advisory_lock(%s)", (BUILD_LOCK_KEY,)
+            )
+            if not (await cursor.fetchone())[0]:
+                return
+            try:
+                await conn.execute(
+                    sql.SQL("SET maintenance_work_mem = {}").format(
+                        sql.Literal(settings.VECTOR_INDEX_MAINTENANCE_WORK_MEM)
+                    )
+                )
+                for table, plan in plans.items():
+                    await self._build(
+                        conn, table, plan, [i for i in indexes if i.table == table]
+                    )
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock(%s)", (BUILD_LOCK_KEY,))
+
+            self.indexes = self._current(await self._inspect(conn))
+
+    async def _build(
+        self,
+        conn: psycopg.AsyncConnection,
+        table: str,
+        plan: IndexPlan,
+        indexes: list[VectorIndex],
+    ) -> None:
+        build_name = table + BUILD_INDEX_SUFFIX
+        # Left behind by an interrupted build
+        if any(i.name == build_name for i in indexes):
+            await conn.execute(
+                sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(
+                    sql.Identifier(build_name)
+                )
+            )
+
+        logger.info(
+            f"Building {plan.method} index on {table} "
+            f"{plan.options} ({plan.quantization})"
+        )
+        started = time.monotonic()
+        await conn.execute(
+            sql.SQL(
+                "CREATE INDEX CONCURRENTLY {} ON {} USING {} ({}) WITH ({})"
+            ).format(
+                sql.Identifier(build_name),
+                sql.Identifier(table),
+                sql.SQL(plan.method),
+                index_element(plan.quantization),
+                sql.SQL(", ").join(
+                    sql.SQL("{} = {}").format(sql.SQL(key), sql.Literal(value))
+                    for key, value in plan.options.items()
+                ),
+            )
+        )
+
+        for index in indexes:
+            if index.name != build_name:
+                await conn.execute(
+                    sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(
+                        sql.Identifier(index.name)
+                    )
+                )
+        await conn.execute(
+            sql.SQL("ALTER INDEX {} RENAME TO {}").format(
+                sql.Identifier(build_name), sql.Identifier(table + INDEX_SUFFIX)
+            )
+        )
+
+        elapsed = time.monotonic() - started
+        metrics.increment("vector_index_builds")
+        metrics.set_gauge("vector_index_build_seconds_last", elapsed)
+        logger.info(f"Built {plan.method} index on {table} in {elapsed:.1f}s")
+
+    async def configure(self, session: AsyncSession, top_k: int) -> None:
+        """Apply the scan settings for a ``top_k`` search to ``session``'s transaction."""
+        options = query_settings(self.indexes.values(), top_k)
+        if self.iterative_scan:
+            # pgvector >= 0.8: keep scanning the index until enough rows pass
+            # the filter. Relaxed order can return rows slightly out of
+            # order, so the caller re-sorts them.
+            options["ivfflat.iterative_scan"] = "relaxed_order"
+            options["hnsw.iterative_scan"] = "relaxed_order"
+        await session.execute(
+            select(
+                *(func.set_config(key, value, True) for key, value in options.items())
+            )
+        )
+
+
+vector_index_manager = VectorIndexManager()
+
+
+async def run_vector_index_manager(
+    interval: float = settings.VECTOR_INDEX_CHECK_SECONDS,
+) -> None:
+    """Reconcile the vector indexes at startup and every ``interval`` seconds."""
+    while True:
+        try:
+            await vector_index_manager.reconcile()
+        except Exception as e:
+            logger.exception(f"Error managing the vector indexes: {e}")
+        await asyncio.sleep(interval)